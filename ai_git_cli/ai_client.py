@@ -1,39 +1,199 @@
 import openai
+import atexit
 import logging
-import time
-from typing import List, Dict
+import threading
+from typing import Iterator, List, Dict, Optional, Tuple
+from ai_git_cli.cache import ResponseCache, get_response_cache
+from ai_git_cli.providers import DEFAULT_PROVIDER, OpenAIProvider, Provider, create_provider
+from ai_git_cli.resilience import CircuitBreaker, RateLimiter, ResilienceMetrics, ResilientCaller, RetryPolicy
+from ai_git_cli.tokens import estimate_tokens
+from ai_git_cli.tracing import span
+
+def is_retryable_error(error: Exception) -> bool:
+    # APITimeoutError is a subclass of APIConnectionError
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    status_code = getattr(error, 'status_code', None)
+    return status_code in (408, 409) or (status_code is not None and status_code >= 500)
 
 class AIClient:
-    def __init__(self, api_key: str, model: str, max_retries: int = 3):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, model: str, max_retries: int = 3, pool_size: int = 10, timeout: float = 60.0,
+                 resilience: Optional[Dict] = None, provider: Optional[Provider] = None,
+                 provider_name: str = DEFAULT_PROVIDER, base_url: Optional[str] = None):
+        resilience = resilience or {}
+        self.timeout = timeout
+        self.provider = provider or OpenAIProvider(api_key, pool_size=pool_size, timeout=timeout)
         self.model = model
-        self.max_retries = max_retries
+        self.provider_name = provider_name
+        self.base_url = base_url
+        self.max_retries = resilience.get('max_retries', max_retries)
+        self.cache: Optional[ResponseCache] = None
+        self.metrics = ResilienceMetrics()
+        self.caller = ResilientCaller(
+            policy=RetryPolicy(
+                max_retries=self.max_retries,
+                base_delay=resilience.get('base_delay', 1.0),
+                max_delay=resilience.get('max_delay', 30.0)
+            ),
+            retryable=is_retryable_error,
+            rate_limiter=RateLimiter(
+                requests_per_minute=resilience.get('requests_per_minute', 0),
+                tokens_per_minute=resilience.get('tokens_per_minute', 0)
+            ),
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=resilience.get('circuit_breaker_threshold', 5),
+                reset_timeout=resilience.get('circuit_breaker_reset', 30.0)
+            ),
+            deadline=resilience.get('deadline', 120.0),
+            metrics=self.metrics
+        )
+
+    def _cached(self, messages: List[Dict[str, str]], temperature: float) -> Tuple[Optional[str], Optional[str]]:
+        if self.cache is None:
+            return None, None
+        cache_key = self.cache.make_key(self.provider_name, self.base_url, self.model, temperature, messages)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logging.debug(f"Using cached response for {cache_key[:12]}")
+        return cache_key, cached
+
+    def _store(self, cache_key: Optional[str], content: str):
+        # The cache is best-effort: a response already paid for is never lost to a disk error
+        if cache_key is None:
+            return
+        try:
+            self.cache.set(cache_key, content)
+        except OSError as e:
+            logging.warning(f"Could not cache response {cache_key[:12]}: {e}")
+
+    def _request_timeout(self, remaining: Optional[float]) -> float:
+        return self.timeout if remaining is None else min(self.timeout, remaining)
 
     def get_response(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
-        retries = 0
-        while retries < self.max_retries:
+        tokens = _message_tokens(messages)
+        with span('ai.request', model=self.model, prompt_tokens=tokens) as current:
+            cache_key, cached = self._cached(messages, temperature)
+            if cached is not None:
+                current.set(cache_hits=1, response_bytes=len(cached))
+                return cached
+
+            attempts = []
+
+            def request(remaining: Optional[float]) -> str:
+                attempts.append(remaining)
+                return self.provider.complete(self.model, messages, temperature, self._request_timeout(remaining))
+
+            try:
+                content = self.caller.call(request, tokens=tokens)
+            except openai.OpenAIError as e:
+                logging.error(f"OpenAI API error: {e}")
+                raise
+            finally:
+                current.set(retries=max(0, len(attempts) - 1))
+            current.set(response_bytes=len(content))
+            self._store(cache_key, content)
+            return content
+
+    def stream_response(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> Iterator[str]:
+        tokens = _message_tokens(messages)
+        # The span stays open until the caller has read the whole stream
+        with span('ai.request', model=self.model, prompt_tokens=tokens, stream=True) as current:
+            cache_key, cached = self._cached(messages, temperature)
+            if cached is not None:
+                current.set(cache_hits=1, response_bytes=len(cached))
+                yield cached
+                return
+
+            attempts = []
+
+            def request(remaining: Optional[float]) -> Iterator[str]:
+                attempts.append(remaining)
+                return self.provider.stream(self.model, messages, temperature, self._request_timeout(remaining))
+
+            # Only opening the stream is retried; a failure halfway through a
+            # response surfaces to the caller
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=temperature
-                )
-                return response.choices[0].message.content.strip()
-            except openai.RateLimitError:
-                wait_time = 2 ** retries
-                logging.warning(f"Rate limit exceeded. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-                retries += 1
+                stream = self.caller.call(request, tokens=tokens)
             except openai.OpenAIError as e:
                 logging.error(f"OpenAI API error: {e}")
-                raise e
-        raise Exception("Max retries exceeded for OpenAI API.")
+                raise
+            finally:
+                current.set(retries=max(0, len(attempts) - 1))
+            parts = []
+            for delta in stream:
+                parts.append(delta)
+                yield delta
+            content = "".join(parts).strip()
+            current.set(response_bytes=len(content))
+            self._store(cache_key, content)
+
+    async def aget_response(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
+        tokens = _message_tokens(messages)
+        with span('ai.request', model=self.model, prompt_tokens=tokens) as current:
+            cache_key, cached = self._cached(messages, temperature)
+            if cached is not None:
+                current.set(cache_hits=1, response_bytes=len(cached))
+                return cached
+
+            attempts = []
+
+            async def request(remaining: Optional[float]) -> str:
+                attempts.append(remaining)
+                return await self.provider.acomplete(self.model, messages, temperature, self._request_timeout(remaining))
+
+            try:
+                content = await self.caller.acall(request, tokens=tokens)
+            except openai.OpenAIError as e:
+                logging.error(f"OpenAI API error: {e}")
+                raise
+            finally:
+                current.set(retries=max(0, len(attempts) - 1))
+            current.set(response_bytes=len(content))
+            self._store(cache_key, content)
+            return content
 
     def set_model(self, model: str):
         self.model = model
 
+    def close(self):
+        self.provider.close()
+
+def _message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(message['content']) for message in messages)
+
+_clients: Dict[Tuple[str, str, str, Optional[str]], AIClient] = {}
+_clients_lock = threading.Lock()
+
 def get_ai_client(config: Dict) -> AIClient:
-    return AIClient(
-        api_key=config['ai_provider']['api_key'],
-        model=config['ai_provider']['model']
-    )
+    provider = config['ai_provider']
+    key = (provider.get('name', DEFAULT_PROVIDER), provider['model'], provider.get('api_key', ''), provider.get('base_url'))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = AIClient(
+                api_key=provider.get('api_key', ''),
+                model=provider['model'],
+                pool_size=provider.get('pool_size', 10),
+                timeout=provider.get('timeout', 60.0),
+                resilience=config.get('resilience', {}),
+                provider=create_provider(provider),
+                provider_name=key[0],
+                base_url=key[3]
+            )
+            _clients[key] = client
+    client.cache = get_response_cache(config)
+    return client
+
+def close_ai_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            metrics = client.metrics.snapshot()
+            if metrics['requests']:
+                logging.info(f"AI client {client.model}: {metrics}")
+            try:
+                client.close()
+            except Exception as e:
+                logging.warning(f"Failed to close AI client: {e}")
+        _clients.clear()
+
+atexit.register(close_ai_clients)
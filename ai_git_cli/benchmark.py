@@ -0,0 +1,206 @@
+"""End-to-end benchmarks on synthetic repositories.
+
+    python -m ai_git_cli.benchmark --scenario medium --latency 0 --output results.json
+
+Each run builds a throwaway git repository with a controlled number of
+files, hunks per file and changed lines per hunk, then runs the analyze
+(and optionally commit) pipeline against the fake AI provider. Wall time,
+peak RSS, API calls and prompt tokens are reported per phase.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+SCENARIOS = {
+    'small': {'files': 20, 'hunks': 2, 'lines': 5, 'directories': 4},
+    'medium': {'files': 200, 'hunks': 3, 'lines': 10, 'directories': 20},
+    'large': {'files': 2000, 'hunks': 3, 'lines': 20, 'directories': 100},
+}
+# Unchanged lines between hunks, more than git's three lines of context on each side
+HUNK_SPACING = 10
+IDENTITY = {'user_name': 'Benchmark', 'user_email': 'benchmark@example.com'}
+
+def _git(*args: str):
+    env = dict(os.environ, GIT_AUTHOR_NAME=IDENTITY['user_name'], GIT_AUTHOR_EMAIL=IDENTITY['user_email'],
+               GIT_COMMITTER_NAME=IDENTITY['user_name'], GIT_COMMITTER_EMAIL=IDENTITY['user_email'])
+    subprocess.run(['git'] + list(args), check=True, capture_output=True, env=env)
+
+def _file_lines(index: int, hunks: int, lines: int, changed: bool) -> List[str]:
+    content = []
+    for hunk in range(hunks):
+        content += [f"context {index} {hunk} {i}" for i in range(HUNK_SPACING)]
+        content += [f"{'changed' if changed else 'value'} {index} {hunk} {i} = {i * index}" for i in range(lines)]
+    content += [f"context {index} end {i}" for i in range(HUNK_SPACING)]
+    return content
+
+def create_repo(directory: str, files: int, hunks: int, lines: int, directories: int = 10):
+    """Commit files spread over directories, then change every file in
+    `hunks` places of `lines` lines each, leaving the changes unstaged."""
+    paths = [os.path.join(f"pkg{i % max(1, directories)}", f"module{i}.py") for i in range(files)]
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        _git('init', '-q')
+        for index, path in enumerate(paths):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write("\n".join(_file_lines(index, hunks, lines, False)) + "\n")
+        _git('add', '-A')
+        _git('commit', '-q', '-m', 'initial')
+        for index, path in enumerate(paths):
+            with open(path, 'w') as f:
+                f.write("\n".join(_file_lines(index, hunks, lines, True)) + "\n")
+    finally:
+        os.chdir(cwd)
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+@contextmanager
+def _phase(name: str, phases: Dict, client):
+    before = client.metrics.snapshot()
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    after = client.metrics.snapshot()
+    phases[name] = {
+        'wall_seconds': round(elapsed, 4),
+        # High-water mark of the process so far, so a phase shows up when it raises it
+        'peak_rss_mb': peak_rss_mb(),
+        'api_calls': after['requests'] - before['requests'],
+        'prompt_tokens': after['tokens'] - before['tokens'],
+    }
+
+def benchmark_config(latency: float = 0.0, strategy: str = 'hybrid', granularity: str = 'file', max_concurrency: int = 8,
+                     generation_mode: str = 'concurrent') -> Dict:
+    return {
+        'ai_provider': {'name': 'fake', 'model': 'fake', 'latency': latency},
+        'commit_style': {'format': 'conventional', 'conventional_prefixes': {'chore': 'Chores'}, 'temperature': 0.7},
+        'grouping': {'strategy': strategy, 'granularity': granularity, 'max_files_per_commit': 5,
+                     'combine_similar_changes': True, 'shard_size': 200},
+        'custom_instructions': {'user_feedback': ''},
+        'git': IDENTITY,
+        'advanced': {'token_limit': 4000, 'max_concurrency': max_concurrency, 'generation_mode': generation_mode},
+        # Every run must reach the provider, not replay the previous run
+        'cache': {'enabled': False},
+    }
+
+def run_benchmark(files: int, hunks: int, lines: int, directories: int = 10, mode: str = 'analyze',
+                  config: Optional[Dict] = None) -> Dict:
+    """Run the pipeline once on a fresh synthetic repository and return the
+    per-phase measurements."""
+    from rich.console import Console
+    from ai_git_cli.ai_client import close_ai_clients, get_ai_client
+    from ai_git_cli.commit_execution import execute_commits
+    from ai_git_cli.commit_message import generate_commit_message
+    from ai_git_cli.diff_analysis import get_unstaged_changes
+    from ai_git_cli.grouping import group_changes
+    from ai_git_cli.main import build_commit_table
+
+    config = config or benchmark_config()
+    # A fresh client so its metrics only count this run
+    close_ai_clients()
+    client = get_ai_client(config)
+    phases = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='ai-git-cli-bench-') as tmpdir:
+        create_repo(tmpdir, files, hunks, lines, directories)
+        os.chdir(tmpdir)
+        try:
+            start = time.perf_counter()
+            with _phase('diff_extraction', phases, client):
+                changes = get_unstaged_changes(config)
+            with _phase('grouping', phases, client):
+                groups = group_changes(changes, config)
+            with _phase('generation', phases, client):
+                commits = generate_commit_message(groups, config)
+            with _phase('rendering', phases, client):
+                Console(file=io.StringIO(), width=160).print(build_commit_table(commits, changes))
+            if mode == 'commit':
+                with _phase('commit_execution', phases, client):
+                    execute_commits(commits, config)
+            total = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+            close_ai_clients()
+
+    return {
+        'parameters': {'files': files, 'hunks': hunks, 'lines': lines, 'directories': directories, 'mode': mode,
+                       'latency': config['ai_provider'].get('latency', 0.0), 'strategy': config['grouping']['strategy'],
+                       'granularity': config['grouping']['granularity']},
+        'changes': len(changes),
+        'commits': len(commits),
+        'total_seconds': round(total, 4),
+        'phases': phases,
+    }
+
+def _median_run(runs: List[Dict]) -> Dict:
+    # Report the run with the median total so phases stay consistent with each other
+    ordered = sorted(runs, key=lambda run: run['total_seconds'])
+    result = dict(ordered[len(ordered) // 2])
+    result['runs'] = [run['total_seconds'] for run in runs]
+    return result
+
+def _version() -> str:
+    try:
+        # importlib.metadata is Python 3.8+; PackageNotFoundError is an ImportError too
+        from importlib.metadata import version
+        return version('ai-git-cli')
+    except ImportError:
+        return 'unknown'
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark ai-git-cli on synthetic repositories")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Preset size; repeat for several (default: small)')
+    parser.add_argument('--files', type=int, help='Changed files (overrides --scenario)')
+    parser.add_argument('--hunks', type=int, default=2, help='Hunks per file with --files')
+    parser.add_argument('--lines', type=int, default=5, help='Changed lines per hunk with --files')
+    parser.add_argument('--directories', type=int, default=10, help='Directories the files are spread over with --files')
+    parser.add_argument('--mode', choices=['analyze', 'commit'], default='analyze', help='Stop after rendering or also create the commits')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the fake provider waits per request')
+    parser.add_argument('--strategy', choices=['hybrid', 'local', 'ai'], default='hybrid')
+    parser.add_argument('--granularity', choices=['file', 'hunk'], default='file')
+    parser.add_argument('--generation-mode', choices=['concurrent', 'batch'], default='concurrent')
+    parser.add_argument('--max-concurrency', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario; the median is reported')
+    parser.add_argument('--output', type=str, help='Write results as JSON to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.files:
+        scenarios = {'custom': {'files': args.files, 'hunks': args.hunks, 'lines': args.lines, 'directories': args.directories}}
+    else:
+        scenarios = {name: SCENARIOS[name] for name in args.scenario or ['small']}
+    config = benchmark_config(args.latency, args.strategy, args.granularity, args.max_concurrency, args.generation_mode)
+
+    results = {
+        'version': _version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'scenarios': {},
+    }
+    for name, size in scenarios.items():
+        runs = [run_benchmark(mode=args.mode, config=config, **size) for _ in range(max(1, args.repeat))]
+        results['scenarios'][name] = _median_run(runs)
+        print(f"{name}: {results['scenarios'][name]['total_seconds']:.3f}s", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from typing import List, Dict, Optional
+
+class ResponseCache:
+    def __init__(self, directory: str, ttl_seconds: float = 604800, max_entries: int = 1000):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(provider: str, base_url: Optional[str], model: str, temperature: float, messages: List[Dict[str, str]]) -> str:
+        # Different backends can serve models of the same name
+        payload = json.dumps({'provider': provider, 'base_url': base_url, 'model': model, 'temperature': temperature,
+                              'messages': messages}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        if time.time() - entry.get('created', 0) > self.ttl_seconds:
+            self._remove(path)
+            return None
+
+        # The file's mtime doubles as the last-access time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry['response']
+
+    def set(self, key: str, response: str):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._entry_path(key)
+        # A unique temp file per writer, so threads storing the same key never share one
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{key}.", suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'created': time.time(), 'response': response}, file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self._evict()
+
+    def clear(self):
+        for path in self._entry_paths():
+            self._remove(path)
+
+    def _entry_paths(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names if name.endswith('.json')]
+
+    def _evict(self):
+        paths = self._entry_paths()
+        if len(paths) <= self.max_entries:
+            return
+        by_access = []
+        for path in paths:
+            try:
+                by_access.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        by_access.sort()
+        for _, path in by_access[:len(by_access) - self.max_entries]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def default_cache_dir() -> str:
+    # Prefer a per-repository cache so it is discarded along with the clone
+    if os.path.isdir('.git'):
+        return os.path.join('.git', 'ai-git-cli', 'cache')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ai-git-cli')
+
+def get_response_cache(config: Dict) -> Optional[ResponseCache]:
+    cache_config = config.get('cache', {})
+    if not cache_config.get('enabled', True):
+        return None
+    return ResponseCache(
+        directory=cache_config.get('directory') or default_cache_dir(),
+        ttl_seconds=cache_config.get('ttl_seconds', 604800),
+        max_entries=cache_config.get('max_entries', 1000)
+    )
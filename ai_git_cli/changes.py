@@ -0,0 +1,122 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+
+class Change:
+    """One changed file, or one hunk of a file at hunk granularity, with the
+    budgeted diff text that goes into prompts."""
+
+    __slots__ = ('path', 'change_type', 'diff', 'binary', 'truncated', 'hunk', 'hunk_count', '_additions', '_deletions')
+
+    def __init__(self, path: str, change_type: str = 'M', diff: str = '', additions: Optional[int] = None,
+                 deletions: Optional[int] = None, binary: bool = False, truncated: bool = False,
+                 hunk: Optional[int] = None, hunk_count: int = 1):
+        self.path = path
+        self.change_type = change_type
+        self.diff = diff
+        self.binary = binary
+        self.truncated = truncated
+        # 0-based position of the hunk in the file's diff, None for whole files
+        self.hunk = hunk
+        self.hunk_count = hunk_count
+        self._additions = additions
+        self._deletions = deletions
+
+    @property
+    def id(self) -> str:
+        # What prompts and model responses use: the path, or "path#2" for hunks
+        return self.path if self.hunk is None else f"{self.path}#{self.hunk + 1}"
+
+    @property
+    def additions(self) -> int:
+        # --numstat fills these in; counting the diff is for changes built without it
+        if self._additions is None:
+            self._count_lines()
+        return self._additions
+
+    @property
+    def deletions(self) -> int:
+        if self._deletions is None:
+            self._count_lines()
+        return self._deletions
+
+    def _count_lines(self):
+        additions = deletions = 0
+        for line in self.diff.split('\n'):
+            if line.startswith('+') and not line.startswith('+++'):
+                additions += 1
+            elif line.startswith('-') and not line.startswith('---'):
+                deletions += 1
+        self._additions, self._deletions = additions, deletions
+
+    def to_dict(self) -> Dict:
+        """Compact form for the daemon protocol: defaults are left out."""
+        data = {'path': self.path, 'diff': self.diff, 'additions': self.additions, 'deletions': self.deletions}
+        if self.change_type != 'M':
+            data['change_type'] = self.change_type
+        for name in ('binary', 'truncated'):
+            if getattr(self, name):
+                data[name] = True
+        if self.hunk is not None:
+            data['hunk'], data['hunk_count'] = self.hunk, self.hunk_count
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Change':
+        return cls(**data)
+
+    def __repr__(self) -> str:
+        return f"Change({self.id!r}, {self.change_type!r}, +{self.additions} -{self.deletions})"
+
+class ChangeSet:
+    """The changes of one run in diff order, with lookups by id and path
+    built on first use."""
+
+    __slots__ = ('changes', '_by_id', '_by_path')
+
+    def __init__(self, changes: Iterable[Change] = ()):
+        self.changes = list(changes)
+        self._by_id = None
+        self._by_path = None
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def __iter__(self) -> Iterator[Change]:
+        return iter(self.changes)
+
+    def __getitem__(self, index):
+        return self.changes[index]
+
+    def get(self, change_id: str) -> Optional[Change]:
+        if self._by_id is None:
+            self._by_id = {change.id: change for change in self.changes}
+        return self._by_id.get(change_id)
+
+    def ids(self) -> List[str]:
+        return [change.id for change in self.changes]
+
+    def for_path(self, path: str) -> List[Change]:
+        # Commits list file paths, so look changes up by path instead of scanning
+        if self._by_path is None:
+            self._by_path = {}
+            for change in self.changes:
+                self._by_path.setdefault(change.path, []).append(change)
+        return self._by_path.get(path, [])
+
+    def to_list(self) -> List[Dict]:
+        return [change.to_dict() for change in self.changes]
+
+    @classmethod
+    def from_list(cls, data: List[Dict]) -> 'ChangeSet':
+        return cls(Change.from_dict(item) for item in data)
+
+def group_files(group: List[Change]) -> List[str]:
+    return list(dict.fromkeys(change.path for change in group))
+
+def group_hunks(group: List[Change]) -> Dict[str, List[int]]:
+    """Hunk indices per file for files only partly included in the group."""
+    selected, totals = {}, {}
+    for change in group:
+        if change.hunk is not None:
+            selected.setdefault(change.path, []).append(change.hunk)
+            totals[change.path] = change.hunk_count
+    return {path: sorted(hunks) for path, hunks in selected.items() if len(hunks) < totals[path]}
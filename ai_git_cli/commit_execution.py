@@ -1,22 +1,202 @@
 import git
-from typing import List, Dict
+import os
+import shutil
+import tempfile
+from typing import List, Dict, Optional
 import subprocess
 import logging
 from rich.console import Console
+from ai_git_cli.hunks import apply_hunks, parse_patch
+from ai_git_cli.tracing import span
 
-def execute_commits(commit_messages: List[Dict], config: Dict):
+# git commit-tree runs none of these and never signs, so either one means
+# commits have to go through git commit
+COMMIT_HOOKS = ('pre-commit', 'prepare-commit-msg', 'commit-msg', 'post-commit')
+
+def _literal_pathspecs() -> Dict[str, str]:
+    # File names like '*.py' or '[ab].txt' must not be expanded as globs
+    return dict(os.environ, GIT_LITERAL_PATHSPECS='1')
+
+def _run_git(args: List[str], env: Optional[Dict[str, str]] = None, input: Optional[str] = None) -> str:
+    with span(f'git.{args[0]}', input_bytes=len(input or '')) as current:
+        result = subprocess.run(['git'] + args, env=env, input=input, capture_output=True, text=True, check=True)
+        current.set(output_bytes=len(result.stdout))
+    return result.stdout.strip()
+
+def _run_git_bytes(args: List[str], env: Optional[Dict[str, str]] = None, input: Optional[bytes] = None) -> bytes:
     try:
-        repo = git.Repo('.')
-        repo.config_writer().set_value("user", "name", config['git']['user_name']).release()
-        repo.config_writer().set_value("user", "email", config['git']['user_email']).release()
-        
-        for commit in commit_messages:
-            repo.git.add(commit['files'])
-            repo.git.commit('-m', commit['message'])
+        with span(f'git.{args[0]}', input_bytes=len(input or b'')) as current:
+            output = subprocess.run(['git'] + args, env=env, input=input, capture_output=True, check=True).stdout
+            current.set(output_bytes=len(output))
+        return output
+    except subprocess.CalledProcessError as e:
+        e.stderr = e.stderr.decode(errors='replace')
+        raise
+
+def _read_blobs(shas: List[str]) -> Dict[str, bytes]:
+    # One cat-file process for all blobs instead of one per file
+    output = _run_git_bytes(['cat-file', '--batch'], input="".join(f"{sha}\n" for sha in shas).encode())
+    blobs, pos = {}, 0
+    while pos < len(output):
+        header_end = output.index(b'\n', pos)
+        sha, _, size = output[pos:header_end].decode().split()
+        start = header_end + 1
+        blobs[sha] = output[start:start + int(size)]
+        pos = start + int(size) + 1
+    return blobs
+
+class _PartialStager:
+    """Stages selected hunks of files that are split across commits.
+
+    Every partial file's blob is rebuilt from its original index content plus
+    all hunks committed so far, so later groups build on earlier ones."""
+
+    def __init__(self, paths: List[str]):
+        self.modes, self.originals, self.hunks = {}, {}, {}
+        self.applied = {path: set() for path in paths}
+        if not paths:
+            return
+        entries = {}
+        for entry in _run_git_bytes(['ls-files', '-s', '-z', '--'] + paths, _literal_pathspecs()).split(b'\0'):
+            if entry:
+                info, path = entry.split(b'\t', 1)
+                mode, sha, _ = info.decode().split()
+                entries[path.decode('utf-8', errors='surrogateescape')] = (mode, sha)
+        blobs = _read_blobs(sorted({sha for _, sha in entries.values()}))
+        for path, (mode, sha) in entries.items():
+            self.modes[path] = mode
+            self.originals[path] = blobs[sha]
+        # Same diff options as the analysis so hunk numbers line up
+        self.hunks = parse_patch(_run_git_bytes(['diff', '--no-color', '--no-ext-diff', '--no-renames', '--'] + paths,
+                                                _literal_pathspecs()))
+
+    def stage(self, selected: Dict[str, List[int]], env: Dict[str, str]) -> Dict[str, set]:
+        """Write the partial blobs for one commit into the index at env and
+        return the new applied-hunk sets, to be kept only if the commit succeeds."""
+        applied, index_info = {}, []
+        for path, indices in selected.items():
+            if path not in self.originals or path not in self.hunks:
+                raise ValueError(f"{path} has no unstaged hunks to commit")
+            hunks = self.hunks[path]
+            applied[path] = self.applied[path] | set(indices)
+            if max(applied[path]) >= len(hunks):
+                raise ValueError(f"{path} has only {len(hunks)} hunks; the diff changed since it was analyzed")
+            content = apply_hunks(self.originals[path], [hunks[i] for i in sorted(applied[path])], path)
+            sha = _run_git_bytes(['hash-object', '-w', '--stdin'], input=content).decode().strip()
+            index_info.append(f"{self.modes[path]} {sha}\t{path}\0")
+        if index_info:
+            _run_git(['update-index', '-z', '--index-info'], env, input="".join(index_info))
+        return applied
+
+def _rev_parse(revision: str) -> Optional[str]:
+    try:
+        return _run_git(['rev-parse', '--verify', '-q', revision])
+    except subprocess.CalledProcessError:
+        return None  # Unborn branch
+
+def _porcelain_required() -> bool:
+    try:
+        if _run_git(['config', '--bool', '--get', 'commit.gpgsign']) == 'true':
+            return True
+    except subprocess.CalledProcessError:
+        pass  # Not set
+    hooks = _run_git(['rev-parse', '--git-path', 'hooks'])
+    return any(os.access(os.path.join(hooks, hook), os.X_OK) for hook in COMMIT_HOOKS)
+
+def execute_commits(commit_messages: List[Dict], config: Dict) -> List[str]:
+    """Create one commit per group without touching the real index until the
+    end. Each group's tree is built in a temporary index with update-index /
+    write-tree / commit-tree, and HEAD is moved once after all groups.
+    Files listed under a commit's 'hunks' get only those hunks staged.
+
+    When commit hooks or commit.gpgsign are configured, each group is
+    committed from the temporary index with git commit instead, so hooks run
+    and commits are signed; HEAD then moves once per group."""
+    try:
+        identity = {
+            'GIT_AUTHOR_NAME': config['git']['user_name'],
+            'GIT_AUTHOR_EMAIL': config['git']['user_email'],
+            'GIT_COMMITTER_NAME': config['git']['user_name'],
+            'GIT_COMMITTER_EMAIL': config['git']['user_email'],
+        }
     except KeyError as e:
         raise ValueError(f"Missing configuration: {str(e)}") from e
-    except git.GitCommandError as e:
-        raise RuntimeError(f"Git command failed: {str(e)}") from e
+
+    try:
+        old_head = _rev_parse('HEAD')
+        index_path = _run_git(['rev-parse', '--git-path', 'index'])
+        partial = _PartialStager(sorted({path for commit in commit_messages for path in commit.get('hunks', {})}))
+        porcelain = _porcelain_required()
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Git command failed: {e.stderr.strip()}") from e
+
+    if porcelain:
+        logging.info("Commit hooks or signing configured; committing each group with git commit")
+    created, committed_paths, failures = [], [], []
+    parent = old_head
+    with tempfile.TemporaryDirectory(prefix='ai-git-cli-') as tmpdir:
+        env = dict(os.environ, GIT_INDEX_FILE=os.path.join(tmpdir, 'index'), **identity)
+        try:
+            # Start from the real index so already-staged work and stat data carry over.
+            # copy2 keeps the index mtime, which git's racy-clean check compares
+            # file mtimes against; a fresh mtime would make same-second edits look clean
+            if os.path.exists(index_path):
+                shutil.copy2(index_path, env['GIT_INDEX_FILE'])
+            elif old_head:
+                _run_git(['read-tree', old_head], env)
+            tree = _run_git(['write-tree'], env)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise RuntimeError(f"Git command failed: {getattr(e, 'stderr', None) or e}") from e
+
+        for commit in commit_messages:
+            selected = commit.get('hunks', {})
+            whole_files = [path for path in commit['files'] if path not in selected]
+            try:
+                with span('commit.group', files=len(commit['files']), partial_files=len(selected)):
+                    if whole_files:
+                        _run_git(['update-index', '--add', '--remove', '-z', '--stdin'], env, input="\0".join(whole_files) + "\0")
+                    applied = partial.stage(selected, env)
+                    new_tree = _run_git(['write-tree'], env)
+                    if new_tree == tree:
+                        raise ValueError("no changes to commit")
+                    if porcelain:
+                        # git commit reads GIT_INDEX_FILE, so hooks see the group's tree
+                        _run_git(['commit', '-q', '-F', '-'], env, input=commit['message'])
+                        parent = _run_git(['rev-parse', 'HEAD'], env)
+                    else:
+                        parents = ['-p', parent] if parent else []
+                        parent = _run_git(['commit-tree', new_tree] + parents + ['-F', '-'], env, input=commit['message'])
+            except (ValueError, subprocess.CalledProcessError) as e:
+                error = e.stderr.strip() if isinstance(e, subprocess.CalledProcessError) else str(e)
+                logging.error(f"Failed to commit {commit['files']}: {error}")
+                failures.append(f"{', '.join(commit['files'])}: {error}")
+                # Roll the temporary index back so the group leaves nothing behind
+                try:
+                    _run_git(['read-tree', tree], env)
+                except subprocess.CalledProcessError as rollback_error:
+                    # Later groups would build on a half-staged index, so stop here
+                    logging.error(f"Failed to roll back the temporary index: {rollback_error.stderr.strip()}")
+                    failures.append(f"rolling back the temporary index failed, remaining groups skipped: {rollback_error.stderr.strip()}")
+                    break
+                continue
+            partial.applied.update(applied)
+            tree = new_tree
+            created.append(parent)
+            committed_paths.extend(commit['files'])
+
+    try:
+        if created:
+            if not porcelain:
+                _run_git(['update-ref', '-m', 'ai-git-cli: commit', 'HEAD', created[-1], old_head or ''])
+            # Bring the real index in line with the new HEAD for the committed paths only
+            _run_git(['reset', '-q', '--pathspec-from-file=-', '--pathspec-file-nul'], _literal_pathspecs(),
+                     input="\0".join(committed_paths) + "\0")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Git command failed: {e.stderr.strip()}") from e
+
+    if failures:
+        raise RuntimeError(f"{len(commit_messages) - len(created)} of {len(commit_messages)} commits failed: " + "; ".join(failures))
+    return created
 
 def amend_commit_history(repo_path: str, num_commits: int):
     console = Console()
@@ -1,42 +1,204 @@
-from typing import List, Dict
-from ai_git_cli.ai_client import get_ai_client
+from typing import Callable, List, Dict, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from ai_git_cli.ai_client import AIClient, get_ai_client
 from ai_git_cli.config import load_config
-from ai_git_cli.prompts import create_commit_message_prompt
+from ai_git_cli.changes import Change, ChangeSet, group_files, group_hunks
+from ai_git_cli.prompts import create_commit_message_prompt, create_batch_commit_message_prompt
+from ai_git_cli.tokens import count_tokens
+from ai_git_cli.tracing import span
 import json
+import logging
+import re
 
 # // Test
 
-def generate_commit_message(groups: List[List[Dict]], config: Dict) -> List[Dict]:
-    ai_client = get_ai_client(config)
-    temperature = config['commit_style'].get('temperature', 0.7)
-    user_feedback = config['custom_instructions'].get('user_feedback', "")
-    commit_style = config['commit_style']
-    commit_messages = []
+SYSTEM_PROMPT = "You are a helpful assistant that generates Git commit messages in JSON format."
 
-    for group in groups:
-        prompt = create_commit_message_prompt(group, user_feedback, commit_style)
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that generates Git commit messages in JSON format."},
-            {"role": "user", "content": prompt}
-        ]
-        response = ai_client.get_response(messages, temperature=temperature)
-        
+# Called with (group index, message text, finished) as messages stream in
+UpdateCallback = Callable[[int, str, bool], None]
+
+PARTIAL_FIELD_PATTERN = re.compile(r'"(type|subject)"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+def format_commit_message(commit_data: Dict) -> str:
+    message = f"{commit_data['type']}: {commit_data['subject']}"
+    if commit_data.get('body'):
+        message += f"\n\n{commit_data['body']}"
+    return message
+
+def strip_code_fence(response: str) -> str:
+    return response.strip().replace('```json\n', '').replace('\n```', '')
+
+def parse_commit_response(response: str) -> str:
+    with span('parse.response', kind='commit', bytes=len(response)):
         try:
             commit_data = json.loads(response.strip())
-            message = f"{commit_data['type']}: {commit_data['subject']}"
+            message = format_commit_message(commit_data)
         except json.JSONDecodeError:
             # Fallback if AI does not return valid JSON
-            message = response.strip().replace('```json\n', '').replace('\n```', '')
+            message = strip_code_fence(response)
             if message.startswith('{') and message.endswith('}'):
                 try:
                     commit_data = json.loads(message)
-                    message = f"{commit_data['type']}: {commit_data['subject']}"
+                    message = format_commit_message(commit_data)
                 except json.JSONDecodeError:
                     pass  # Keep the stripped message as is
+    return message
+
+def preview_commit_message(partial: str) -> str:
+    # Show "type: subject" while the JSON object is still incomplete
+    fields = dict(PARTIAL_FIELD_PATTERN.findall(partial))
+    if 'type' in fields:
+        return f"{fields['type']}: {fields.get('subject', '')}"
+    return strip_code_fence(partial)
+
+def parse_batch_response(response: str, group_ids: Set[int]) -> Dict[int, str]:
+    try:
+        with span('parse.response', kind='batch', bytes=len(response)):
+            entries = json.loads(strip_code_fence(response))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    messages = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            group_id = int(entry.get('group_id'))
+        except (TypeError, ValueError):
+            continue
+        if group_id not in group_ids or not isinstance(entry.get('type'), str):
+            continue
+        if not isinstance(entry.get('subject'), str) or not entry['subject'].strip():
+            continue
+        messages[group_id] = format_commit_message(entry)
+    return messages
+
+def fallback_commit_message(group: List[Change]) -> str:
+    return f"chore: update {', '.join(group_files(group))}"
+
+def make_commit(message: str, group: List[Change]) -> Dict:
+    commit = {'message': message, 'files': group_files(group)}
+    hunks = group_hunks(group)
+    if hunks:
+        # Files only partly in this commit, with the 0-based hunks to stage
+        commit['hunks'] = hunks
+    return commit
+
+def commit_changes(commit: Dict, changes: ChangeSet) -> List[Change]:
+    selected = []
+    for path in commit['files']:
+        hunks = commit.get('hunks', {}).get(path)
+        hunks = set(hunks) if hunks is not None else None
+        selected.extend(change for change in changes.for_path(path) if hunks is None or change.hunk in hunks)
+    return selected
 
-        commit_messages.append({
-            'message': message,
-            'files': [change['path'] for change in group]
-        })
+def format_commit_files(commit: Dict) -> str:
+    hunks = commit.get('hunks', {})
+    return ", ".join(
+        f"{path} (hunks {', '.join(str(index + 1) for index in hunks[path])})" if path in hunks else path
+        for path in commit['files']
+    )
+
+def _generate_group_message(ai_client: AIClient, group: List[Change], user_feedback: str, commit_style: Dict, temperature: float,
+                            on_update: Optional[UpdateCallback] = None, index: int = 0, token_limit: Optional[int] = None) -> str:
+    prompt = create_commit_message_prompt(group, user_feedback, commit_style, token_limit)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    if on_update is None:
+        return parse_commit_response(ai_client.get_response(messages, temperature=temperature))
+
+    response = ""
+    for delta in ai_client.stream_response(messages, temperature=temperature):
+        response += delta
+        on_update(index, preview_commit_message(response), False)
+    return parse_commit_response(response)
+
+def _generate_group_message_or_fallback(ai_client: AIClient, group: List[Change], user_feedback: str, commit_style: Dict,
+                                        temperature: float, on_update: Optional[UpdateCallback] = None, index: int = 0,
+                                        token_limit: Optional[int] = None) -> str:
+    # One group's failure must not take down the others
+    try:
+        message = _generate_group_message(ai_client, group, user_feedback, commit_style, temperature, on_update, index, token_limit)
+    except Exception as e:
+        logging.error(f"Failed to generate commit message for {[change.id for change in group]}: {e}")
+        message = fallback_commit_message(group)
+    if on_update is not None:
+        on_update(index, message, True)
+    return message
+
+def _generate_batch_messages(ai_client: AIClient, batch: List[Tuple[int, List[Change]]], user_feedback: str, commit_style: Dict, temperature: float,
+                             token_limit: Optional[int] = None) -> Dict[int, str]:
+    prompt = create_batch_commit_message_prompt(batch, user_feedback, commit_style, token_limit)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    response = ai_client.get_response(messages, temperature=temperature)
+    return parse_batch_response(response, {group_id for group_id, _ in batch})
+
+def split_batches(groups: List[List[Change]], token_limit: int, max_groups: int) -> List[List[Tuple[int, List[Change]]]]:
+    # Group ids are 1-based so they read naturally in the prompt
+    batches, current, used = [], [], 0
+    for group_id, group in enumerate(groups, 1):
+        cost = sum(count_tokens(change.id) + count_tokens(change.diff) for change in group)
+        if current and (used + cost > token_limit or len(current) >= max_groups):
+            batches.append(current)
+            current, used = [], 0
+        current.append((group_id, group))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def generate_commit_message(groups: List[List[Change]], config: Dict, on_update: Optional[UpdateCallback] = None) -> List[Dict]:
+    ai_client = get_ai_client(config)
+    temperature = config['commit_style'].get('temperature', 0.7)
+    user_feedback = config['custom_instructions'].get('user_feedback', "")
+    commit_style = config['commit_style']
+    advanced = config.get('advanced', {})
+    max_concurrency = advanced.get('max_concurrency', 8)
+    token_limit = advanced.get('token_limit', 4000)
+    messages: Dict[int, str] = {}
+
+    if not groups:
+        return []
+
+    with span('generate.messages', groups=len(groups)), ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(groups)))) as executor:
+        if advanced.get('generation_mode', 'concurrent') == 'batch':
+            batches = split_batches(groups, token_limit, advanced.get('batch_size', 20))
+            futures = [
+                executor.submit(_generate_batch_messages, ai_client, batch, user_feedback, commit_style, temperature, token_limit)
+                for batch in batches
+            ]
+            for batch, future in zip(batches, futures):
+                try:
+                    batch_messages = future.result()
+                except Exception as e:
+                    logging.error(f"Batched commit message request for {len(batch)} groups failed: {e}")
+                    continue
+                messages.update(batch_messages)
+                if on_update is not None:
+                    for group_id, message in batch_messages.items():
+                        on_update(group_id - 1, message, True)
+
+        # Every group not answered by a batch is an independent round trip,
+        # so send them all at once and collect the results in group order.
+        pending = [group_id for group_id in range(1, len(groups) + 1) if group_id not in messages]
+        if pending and len(pending) < len(groups):
+            logging.warning(f"Falling back to per-group requests for {len(pending)} groups")
+        futures = [
+            executor.submit(_generate_group_message_or_fallback, ai_client, groups[group_id - 1], user_feedback, commit_style,
+                            temperature, on_update, group_id - 1, token_limit)
+            for group_id in pending
+        ]
+        for group_id, future in zip(pending, futures):
+            messages[group_id] = future.result()
 
-    return commit_messages
+    return [
+        make_commit(messages[group_id], group)
+        for group_id, group in enumerate(groups, 1)
+    ]
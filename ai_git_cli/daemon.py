@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import subprocess
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from ai_git_cli.changes import Change, ChangeSet
+
+# The client half of this module is used by every CLI run, so the analysis
+# pipeline (and with it openai, rich and yaml) is only imported by the daemon.
+
+SOCKET_NAME = 'ai-git-cli/daemon.sock'
+DEFAULT_POLL_INTERVAL = 2.0
+CLIENT_TIMEOUT = 600.0
+
+# (changes, config) -> commit messages
+Planner = Callable[[List[Change], Dict], List[Dict]]
+
+def default_socket_path() -> Optional[str]:
+    # One daemon per repository; the socket lives next to the response cache
+    result = subprocess.run(['git', 'rev-parse', '--git-path', SOCKET_NAME], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return os.path.abspath(result.stdout.strip())
+
+def request(command: str, socket_path: Optional[str] = None, timeout: float = CLIENT_TIMEOUT, **fields) -> Optional[Dict]:
+    """Send one command, with any extra fields, to the daemon. Returns None
+    when no daemon is running so callers can fall back to analyzing
+    in-process; raises RuntimeError when the daemon answers with an error."""
+    socket_path = socket_path or default_socket_path()
+    if not socket_path or not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(socket_path)
+            client.sendall(json.dumps(dict(fields, command=command)).encode() + b'\n')
+            with client.makefile('rb') as reader:
+                line = reader.readline()
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None  # Stale socket left by a daemon that did not shut down cleanly
+    except OSError as e:
+        logging.warning(f"Daemon request failed, analyzing locally: {e}")
+        return None
+    if not line:
+        return None
+    response = json.loads(line)
+    if 'error' in response:
+        raise RuntimeError(f"Daemon error: {response['error']}")
+    return response
+
+def config_digest(config: Dict) -> str:
+    # Lets a client tell whether the daemon plans with the configuration it loaded
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+def fingerprint(change: Change) -> str:
+    # Identical rendered diffs get identical prompts, so earlier results still apply
+    key = [change.id, change.change_type, change.additions, change.deletions, change.diff]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+def worktree_signature() -> str:
+    """Cheap fingerprint of the unstaged state: which tracked files differ
+    from the index, plus their size and mtime and the index's own mtime.
+    A file edited again while already modified changes its stat data."""
+    status = subprocess.run(
+        ['git', 'status', '--porcelain=v1', '-z', '--untracked-files=no', '--no-renames'],
+        capture_output=True, check=True
+    ).stdout
+    digest = hashlib.sha256(status)
+    index_path = subprocess.run(['git', 'rev-parse', '--git-path', 'index'], capture_output=True, text=True, check=True).stdout.strip()
+    paths = [index_path] + [entry[3:].decode('utf-8', errors='surrogateescape') for entry in status.split(b'\0') if entry]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode('utf-8', errors='surrogateescape'))
+        except OSError:
+            digest.update(f"{path}\0missing\0".encode('utf-8', errors='surrogateescape'))
+    return digest.hexdigest()
+
+def plan_commits(changes: List[Change], config: Dict) -> List[Dict]:
+    from ai_git_cli.commit_message import generate_commit_message
+    from ai_git_cli.grouping import group_changes
+    from ai_git_cli.single_pass import group_and_generate
+
+    commit_messages = None
+    if config.get('advanced', {}).get('single_pass', False):
+        commit_messages = group_and_generate(changes, config)
+    if commit_messages is None:
+        commit_messages = generate_commit_message(group_changes(changes, config), config)
+    return commit_messages
+
+class ChangeIndex:
+    """Remembers the commits proposed for earlier states of the work tree,
+    keyed by the fingerprints of the changes in each commit. A commit is
+    reused while all of its changes are unchanged; everything else is
+    grouped and described again."""
+
+    def __init__(self, planner: Planner = plan_commits):
+        self.planner = planner
+        self.commits: List[Tuple[frozenset, str]] = []
+
+    def plan(self, changes: List[Change], config: Dict) -> List[Dict]:
+        from ai_git_cli.commit_message import commit_changes, make_commit
+
+        by_fingerprint = {fingerprint(change): change for change in changes}
+        reused, covered = [], set()
+        for fingerprints, message in self.commits:
+            if fingerprints <= by_fingerprint.keys() and not fingerprints & covered:
+                reused.append((fingerprints, message))
+                covered |= fingerprints
+
+        remaining = [change for key, change in by_fingerprint.items() if key not in covered]
+        generated = []
+        if remaining:
+            remaining = ChangeSet(remaining)
+            for commit in self.planner(remaining, config):
+                fingerprints = frozenset(fingerprint(change) for change in commit_changes(commit, remaining))
+                if fingerprints:
+                    generated.append((fingerprints, commit['message']))
+        logging.info(f"Daemon reused {len(reused)} commits and planned {len(remaining)} changes again")
+
+        self.commits = reused + generated
+        # Rebuild from the current changes: hunk numbers and counts may have moved
+        order = {key: position for position, key in enumerate(by_fingerprint)}
+        return [
+            make_commit(message, [by_fingerprint[key] for key in sorted(fingerprints, key=order.get)])
+            for fingerprints, message in self.commits
+        ]
+
+class AnalysisDaemon:
+    """Keeps the diff of the work tree and the proposed commits warm between
+    CLI runs. A polling thread re-reads the diff when the work tree changes;
+    requests only call the model for changes it has not seen before."""
+
+    def __init__(self, config: Dict, socket_path: str, planner: Planner = plan_commits):
+        self.config = config
+        self.config_digest = config_digest(config)
+        self.socket_path = socket_path
+        self.poll_interval = config.get('daemon', {}).get('poll_interval', DEFAULT_POLL_INTERVAL)
+        self.index = ChangeIndex(planner)
+        self.signature = None
+        self.changes = ChangeSet()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.server = None
+
+    def current_changes(self) -> ChangeSet:
+        from ai_git_cli.diff_analysis import get_unstaged_changes
+
+        with self.lock:
+            signature = worktree_signature()
+            if signature != self.signature:
+                self.changes = get_unstaged_changes(self.config)
+                self.signature = signature
+            return self.changes
+
+    def analyze(self) -> Dict:
+        changes = self.current_changes()
+        with self.lock:
+            commit_messages = self.index.plan(changes, self.config) if changes else []
+        return {'changes': changes.to_list(), 'commit_messages': commit_messages}
+
+    def handle(self, message: Dict) -> Dict:
+        command = message.get('command')
+        if command == 'analyze':
+            if message.get('config_digest', self.config_digest) != self.config_digest:
+                return {'error': "daemon was started with a different configuration; restart it with "
+                                 "'ai-git-cli daemon stop' and 'ai-git-cli daemon start --config PATH'"}
+            return self.analyze()
+        if command == 'status':
+            return {'pid': os.getpid(), 'changes': len(self.changes), 'commits': len(self.index.commits)}
+        if command == 'stop':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'stopping': True}
+        return {'error': f"Unknown command: {command}"}
+
+    def _watch(self):
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                self.current_changes()
+            except Exception as e:
+                logging.warning(f"Daemon failed to refresh changes: {e}")
+
+    def serve_forever(self):
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if not line:
+                    return
+                try:
+                    response = daemon.handle(json.loads(line))
+                except Exception as e:
+                    logging.exception("Daemon request failed")
+                    response = {'error': str(e)}
+                self.wfile.write(json.dumps(response).encode() + b'\n')
+
+        if os.path.exists(self.socket_path):
+            if request('status', self.socket_path, timeout=5.0) is not None:
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        watcher = threading.Thread(target=self._watch, daemon=True)
+        watcher.start()
+        logging.info(f"Daemon listening on {self.socket_path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stopped.set()
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
@@ -1,15 +1,315 @@
-import git
-from typing import List, Dict
+import logging
+import re
+import subprocess
+from typing import List, Dict, Iterator, Optional, Tuple
+from ai_git_cli.changes import Change, ChangeSet
+from ai_git_cli.tokens import tokens_to_chars
+from ai_git_cli.tracing import span
+
+# Lines longer than this (minified or generated files) are cut while streaming
+MAX_LINE_BYTES = 4096
+READ_SIZE = 1 << 16
+# Every file gets at least this many tokens so small edits are never starved
+MIN_FILE_TOKENS = 64
+# Rough token cost of one changed line, used to size budgets from --numstat
+TOKENS_PER_CHANGED_LINE = 12
+
+SIGNATURE_PATTERN = re.compile(
+    r'^\s*(def|class|async def|function|func|fn|interface|struct|enum|type|export|import|from|public|private|protected|package|module)\b'
+)
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]{2,}')
+
+class Hunk:
+    __slots__ = ('index', 'header', 'lines', 'chars', 'omitted_lines', 'score', 'identifiers', 'additions', 'deletions')
+
+    def __init__(self, index: int, header: str):
+        self.index = index
+        self.header = header
+        self.lines = []
+        self.chars = len(header) + 1
+        self.omitted_lines = 0
+        self.score = 0.0
+        self.identifiers = set()
+        self.additions = 0
+        self.deletions = 0
+        # Function context after the second @@ tells the model where the edit is
+        if header.count('@@') >= 2 and header.rsplit('@@', 1)[1].strip():
+            self.score += 3
+
+    def add_line(self, line: str, max_chars: int):
+        if line.startswith('+'):
+            self.additions += 1
+        elif line.startswith('-'):
+            self.deletions += 1
+        # Only the lines that fit are scored; the tail of a huge hunk is just counted
+        if self.omitted_lines or self.chars + len(line) + 1 > max_chars:
+            self.omitted_lines += 1
+            return
+        if line[:1] in ('+', '-'):
+            body = line[1:]
+            if SIGNATURE_PATTERN.match(body):
+                self.score += 2
+            if len(self.identifiers) < 64:
+                self.identifiers.update(IDENTIFIER_PATTERN.findall(body))
+        self.lines.append(line)
+        self.chars += len(line) + 1
+
+    def finish(self):
+        self.score += min(len(self.identifiers), 20) * 0.5
+
+    def render(self) -> str:
+        text = "\n".join([self.header] + self.lines)
+        if self.omitted_lines:
+            text += f"\n... {self.omitted_lines} more lines in this hunk"
+        return text
+
+class FileDiff:
+    def __init__(self, budget_tokens: int):
+        self.budget_chars = tokens_to_chars(budget_tokens)
+        self.headers = []
+        self.hunks = []
+        # (header, additions, deletions) for every hunk, including pruned ones
+        self.summaries = []
+        self.kept_chars = 0
+        self.omitted_hunks = 0
+        self.change_type = 'M'
+        self.binary = False
+        self._current = None
+        self._hunk_count = 0
+
+    def add_line(self, raw: bytes):
+        current = self._current
+        if raw.startswith(b'@@'):
+            self._close_hunk()
+            self._current = Hunk(self._hunk_count, raw.decode('utf-8', errors='ignore'))
+            self._hunk_count += 1
+        elif current is not None:
+            current.add_line(raw.decode('utf-8', errors='ignore'), self.budget_chars)
+        else:
+            line = raw.decode('utf-8', errors='ignore')
+            if line.startswith('new file mode'):
+                self.change_type = 'A'
+            elif line.startswith('deleted file mode'):
+                self.change_type = 'D'
+            elif line.startswith('Binary files'):
+                self.binary = True
+            self.headers.append(line)
+
+    @property
+    def skipping(self) -> bool:
+        return self._current is not None and self._current.omitted_lines > 0
+
+    def skip_lines(self, count: int, additions: int = 0, deletions: int = 0):
+        self._current.omitted_lines += count
+        self._current.additions += additions
+        self._current.deletions += deletions
+
+    def _close_hunk(self):
+        if self._current is None:
+            return
+        self._current.finish()
+        self.summaries.append((self._current.header, self._current.additions, self._current.deletions))
+        self.hunks.append(self._current)
+        self.kept_chars += self._current.chars
+        self._current = None
+        # Hold on to at most twice the budget while streaming
+        if self.kept_chars > 2 * self.budget_chars:
+            self._prune(self.budget_chars)
+
+    def _prune(self, max_chars: int):
+        kept, used = set(), 0
+        for hunk in sorted(self.hunks, key=lambda h: (-h.score, h.index)):
+            if used + hunk.chars <= max_chars:
+                kept.add(hunk.index)
+                used += hunk.chars
+        self.omitted_hunks += len(self.hunks) - len(kept)
+        self.hunks = [hunk for hunk in self.hunks if hunk.index in kept]
+        self.kept_chars = used
+
+    def render(self) -> Tuple[str, bool]:
+        self._close_hunk()
+        self._prune(self.budget_chars)
+        parts = ["\n".join(self.headers)] + [hunk.render() for hunk in self.hunks]
+        truncated = self.omitted_hunks > 0 or any(hunk.omitted_lines for hunk in self.hunks)
+        if self.omitted_hunks:
+            parts.append(f"... {self.omitted_hunks} less relevant hunks omitted")
+        return "\n".join(part for part in parts if part), truncated
+
+    def render_hunks(self) -> List[Tuple[str, bool]]:
+        # Call after render(); hunks pruned for budget keep only their header
+        kept = {hunk.index: hunk for hunk in self.hunks}
+        rendered = []
+        for index, (header, _, _) in enumerate(self.summaries):
+            hunk = kept.get(index)
+            if hunk is None:
+                rendered.append((f"{header}\n... hunk omitted", True))
+            else:
+                rendered.append((hunk.render(), hunk.omitted_lines > 0))
+        return rendered
+
+def _parse_numstat(output: bytes) -> List[Tuple[str, int, int]]:
+    stats = []
+    for record in output.decode('utf-8', errors='surrogateescape').split('\0'):
+        if not record:
+            continue
+        added, deleted, path = record.split('\t', 2)
+        # Binary files report '-' for both counts
+        stats.append((path, int(added) if added != '-' else 0, int(deleted) if deleted != '-' else 0))
+    return stats
+
+def allocate_budgets(needs: List[int], token_limit: int) -> List[int]:
+    """Split token_limit across files, giving small diffs what they need and
+    sharing the remainder evenly among the large ones."""
+    budgets = [0] * len(needs)
+    remaining = max(token_limit, MIN_FILE_TOKENS * len(needs))
+    order = sorted(range(len(needs)), key=lambda i: needs[i])
+    for position, index in enumerate(order):
+        share = remaining // (len(order) - position)
+        if needs[index] > share:
+            for index in order[position:]:
+                budgets[index] = max(share, MIN_FILE_TOKENS)
+            break
+        budgets[index] = max(needs[index], MIN_FILE_TOKENS)
+        remaining -= budgets[index]
+    return budgets
+
+def _next_boundary(buffer: bytes, start: int, end: int) -> int:
+    # Hunk and file headers always begin a line
+    if buffer.startswith((b'@@', b'diff --git '), start):
+        return start
+    candidates = [i + 1 for i in (buffer.find(b'\n@@', start, end), buffer.find(b'\ndiff --git ', start, end)) if i != -1]
+    return min(candidates) if candidates else -1
+
+def _read_numstat(stdout) -> Tuple[List[Tuple[str, int, int]], bytes]:
+    # With --numstat -z --patch the NUL-terminated stat records come first and
+    # an empty record separates them from the patch
+    buffer = b''
+    while True:
+        end = buffer.find(b'\0\0', max(0, len(buffer) - READ_SIZE - 1))
+        if end != -1:
+            return _parse_numstat(buffer[:end]), buffer[end + 2:]
+        chunk = stdout.read(READ_SIZE)
+        if not chunk:
+            return _parse_numstat(buffer), b''
+        buffer += chunk
+
+def unmerged_paths() -> List[str]:
+    output = subprocess.run(['git', 'diff', '--name-only', '-z', '--diff-filter=U'], capture_output=True).stdout
+    return [path for path in output.decode('utf-8', errors='surrogateescape').split('\0') if path]
+
+def stream_diffs(token_limit: int, paths: Optional[List[str]] = None) -> Iterator[Tuple[FileDiff, Tuple[str, int, int]]]:
+    """Diff the work tree once, sizing each file's budget from the stats at
+    the head of the output before its patch is read."""
+    # Mid-merge, conflicted files come out as a combined 'diff --cc' patch
+    # ahead of the stats; leave them to the user to resolve
+    conflicted = unmerged_paths()
+    if conflicted:
+        logging.warning(f"Skipping {len(conflicted)} files with unresolved conflicts: {', '.join(conflicted[:10])}")
+    process = subprocess.Popen(
+        ['git', 'diff', '--numstat', '-z', '--patch', '--no-color', '--no-ext-diff', '--no-renames', '--'] + (paths or [])
+        + [f":(exclude,literal){path}" for path in conflicted],
+        stdout=subprocess.PIPE
+    )
+    try:
+        stats, buffer = _read_numstat(process.stdout)
+        needs = [(added + deleted) * TOKENS_PER_CHANGED_LINE + MIN_FILE_TOKENS for _, added, deleted in stats]
+        yield from zip(_parse_file_diffs(process.stdout, allocate_budgets(needs, token_limit), buffer), stats)
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError("git diff failed")
+
+def _parse_file_diffs(stdout, budgets: List[int], buffer: bytes = b'') -> Iterator[FileDiff]:
+    file_diff = None
+    index = 0
+    in_long_line = False
+
+    def handle(line: bytes):
+        nonlocal file_diff, index
+        finished = None
+        if line.startswith(b'diff --git '):
+            finished = file_diff
+            file_diff = FileDiff(budgets[index] if index < len(budgets) else MIN_FILE_TOKENS)
+            index += 1
+        if file_diff is not None:
+            file_diff.add_line(line)
+        return finished
+
+    while True:
+        chunk = stdout.read(READ_SIZE)
+        buffer += chunk
+        pos = 0
+        while pos < len(buffer):
+            if in_long_line:
+                # Drop the rest of an overlong line without buffering it
+                end = buffer.find(b'\n', pos)
+                if end == -1:
+                    pos = len(buffer)
+                    break
+                pos, in_long_line = end + 1, False
+                continue
+            if file_diff is not None and file_diff.skipping:
+                # Count the lines of a hunk that is already over budget
+                # without splitting them out one by one
+                last = max(pos, buffer.rfind(b'\n', pos) + 1)
+                boundary = _next_boundary(buffer, pos, last)
+                stop = boundary if boundary != -1 else last
+                file_diff.skip_lines(
+                    buffer.count(b'\n', pos, stop),
+                    buffer.startswith(b'+', pos, stop) + buffer.count(b'\n+', pos, stop),
+                    buffer.startswith(b'-', pos, stop) + buffer.count(b'\n-', pos, stop)
+                )
+                pos = stop
+                if boundary == -1:
+                    if len(buffer) - pos > MAX_LINE_BYTES:
+                        file_diff.skip_lines(1)
+                        pos, in_long_line = len(buffer), True
+                    break
+            end = buffer.find(b'\n', pos)
+            if end == -1:
+                if len(buffer) - pos <= MAX_LINE_BYTES and chunk:
+                    break
+                end = min(len(buffer), pos + MAX_LINE_BYTES)
+                in_long_line = end < len(buffer) or bool(chunk)
+                finished = handle(buffer[pos:end] + (b' ...' if in_long_line else b''))
+                pos = end
+            else:
+                finished = handle(buffer[pos:end])
+                pos = end + 1
+            if finished is not None:
+                yield finished
+        buffer = buffer[pos:]
+        if not chunk:
+            break
+    if file_diff is not None:
+        yield file_diff
+
+def has_unstaged_changes() -> bool:
+    # 'git diff --quiet' exits 1 when there are changes. Errors (e.g. not a
+    # repository) also return True so the full pipeline can report them.
+    return subprocess.run(['git', 'diff', '--quiet', '--no-ext-diff'], capture_output=True).returncode != 0
+
+def _split_hunks(change: Change, file_diff: FileDiff) -> List[Change]:
+    header = "\n".join(file_diff.headers)
+    hunk_count = len(file_diff.summaries)
+    return [
+        Change(change.path, change.change_type, f"{header}\n{text}", additions, deletions,
+               change.binary, truncated, hunk=index, hunk_count=hunk_count)
+        for index, ((_, additions, deletions), (text, truncated)) in enumerate(zip(file_diff.summaries, file_diff.render_hunks()))
+    ]
+
+def get_unstaged_changes(config: Optional[Dict] = None) -> ChangeSet:
+    token_limit = (config or {}).get('advanced', {}).get('token_limit', 4000)
+    by_hunk = (config or {}).get('grouping', {}).get('granularity', 'file') == 'hunk'
 
-def get_unstaged_changes() -> List[Dict]:
-    repo = git.Repo('.')
-    diff = repo.index.diff(None)  # Unstaged changes
     changes = []
-    for item in diff:
-        change = {
-            'path': item.a_path,
-            'change_type': item.change_type,
-            'diff': item.diff.decode('utf-8', errors='ignore')
-        }
-        changes.append(change)
-    return changes
\ No newline at end of file
+    with span('diff.collect') as current:
+        for file_diff, (path, added, deleted) in stream_diffs(token_limit):
+            diff, truncated = file_diff.render()
+            change = Change(path, file_diff.change_type, diff, added, deleted, file_diff.binary, truncated)
+            if by_hunk and len(file_diff.summaries) > 1:
+                changes.extend(_split_hunks(change, file_diff))
+            else:
+                changes.append(change)
+        current.set(changes=len(changes), diff_bytes=sum(len(change.diff) for change in changes))
+    return ChangeSet(changes)
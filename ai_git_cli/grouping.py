@@ -1,16 +1,28 @@
-from typing import List, Dict
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
 import json
 import logging
 from ai_git_cli.ai_client import get_ai_client
-from ai_git_cli.prompts import create_grouping_prompt
+from ai_git_cli.changes import Change
+from ai_git_cli.local_grouping import cluster_changes, detect_language, group_leftovers
+from ai_git_cli.prompts import create_grouping_prompt, create_merge_prompt
+from ai_git_cli.tracing import span
 
-def group_changes(changes: List[Dict], config: Dict) -> List[List[Dict]]:
+MERGE_SYSTEM_PROMPT = "You are a helpful assistant that merges related groups of Git changes into logical commit sets."
+
+def _group_with_model(changes: List[Change], config: Dict) -> Optional[List[List[Change]]]:
     ai_client = get_ai_client(config)
     temperature = config['commit_style'].get('temperature', 0.7)
     user_feedback = config['custom_instructions'].get('user_feedback', "")
     grouping = config['grouping']
+    language_specific = config.get('language_specific', {})
+
+    languages = sorted({detect_language(change.path, language_specific) for change in changes} - {None})
+    instructions = [language_specific[language]['grouping_instructions'] for language in languages
+                    if language_specific[language].get('grouping_instructions')]
 
-    prompt = create_grouping_prompt(changes, user_feedback, grouping)
+    prompt = create_grouping_prompt(changes, user_feedback, grouping, instructions, config.get('advanced', {}).get('token_limit', 4000))
     messages = [
         {"role": "system", "content": "You are a helpful assistant that groups Git changes into logical commit sets."},
         {"role": "user", "content": prompt}
@@ -18,11 +30,152 @@ def group_changes(changes: List[Dict], config: Dict) -> List[List[Dict]]:
     response = ai_client.get_response(messages, temperature=temperature)
     
     try:
-        grouped_changes = json.loads(response)
-        return [
-            [change for change in changes if change['path'] in group]
-            for group in grouped_changes
-        ]
+        with span('parse.response', kind='grouping', bytes=len(response)):
+            grouped_ids = json.loads(response)
     except json.JSONDecodeError:
-        # Fallback to a single group if JSON parsing fails
+        return None
+    if not isinstance(grouped_ids, list) or not all(isinstance(group, list) for group in grouped_ids):
+        return None
+
+    positions = {change.id: position for position, change in enumerate(changes)}
+    assigned = set()
+    groups = []
+    for group in grouped_ids:
+        # A change the model lists twice stays in the first group it appears in
+        members = [positions[i] for i in dict.fromkeys(group) if isinstance(i, str) and i in positions and i not in assigned]
+        assigned.update(changes[position].id for position in members)
+        if members:
+            groups.append([changes[position] for position in sorted(members)])
+
+    missing = [change for change in changes if change.id not in assigned]
+    if missing:
+        logging.warning(f"Model left {len(missing)} changes out of every group: {', '.join(change.id for change in missing[:10])}")
+        groups.extend(group_leftovers(missing, grouping, language_specific))
+    return groups
+
+def shard_by_directory(changes: List[Change], shard_size: int, depth: int = 0) -> List[List[Change]]:
+    """Split changes into shards of at most shard_size, keeping directories
+    together and only descending the tree where a directory is too big."""
+    if len(changes) <= shard_size:
         return [changes]
+    buckets = defaultdict(list)
+    for change in changes:
+        parts = change.path.split('/')
+        # Files directly in the current directory share the '' bucket
+        buckets[parts[depth] if depth < len(parts) - 1 else ''].append(change)
+
+    shards, current = [], []
+    for key in sorted(buckets):
+        bucket = buckets[key]
+        if len(bucket) > shard_size:
+            if key:
+                shards.extend(shard_by_directory(bucket, shard_size, depth + 1))
+            else:
+                shards.extend(bucket[i:i + shard_size] for i in range(0, len(bucket), shard_size))
+            continue
+        # Small sibling directories share a shard
+        if len(current) + len(bucket) > shard_size:
+            shards.append(current)
+            current = []
+        current = current + bucket
+    if current:
+        shards.append(current)
+    return shards
+
+def _group_shard(shard: List[Change], config: Dict) -> List[List[Change]]:
+    # One shard's failure must not take down the others
+    try:
+        groups = _group_with_model(shard, config)
+    except Exception as e:
+        logging.error(f"Grouping request for a shard of {len(shard)} changes failed: {e}")
+        groups = None
+    if groups is None:
+        return group_leftovers(shard, config['grouping'], config.get('language_specific', {}))
+    # The merge pass only combines groups within the limit, so enforce it here too
+    max_files = config['grouping'].get('max_files_per_commit', 5)
+    return [group[i:i + max_files] for group in groups for i in range(0, len(group), max_files)]
+
+def _merge_groups(groups: List[List[Change]], config: Dict) -> List[List[Change]]:
+    """Reduce step: ask the model which shard-level groups belong together,
+    keeping every merged group within max_files_per_commit."""
+    grouping = config['grouping']
+    max_files = grouping.get('max_files_per_commit', 5)
+    # Only groups with room to spare can be combined with anything
+    candidates = {f"G{index + 1}": index for index, group in enumerate(groups) if len(group) < max_files}
+    if len(candidates) < 2:
+        return groups
+
+    prompt = create_merge_prompt([(group_id, groups[index]) for group_id, index in candidates.items()], grouping,
+                                 config.get('advanced', {}).get('token_limit', 4000))
+    messages = [
+        {"role": "system", "content": MERGE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    try:
+        response = get_ai_client(config).get_response(messages, temperature=config['commit_style'].get('temperature', 0.7))
+        with span('parse.response', kind='merge', bytes=len(response)):
+            merges = json.loads(response)
+    except Exception as e:
+        logging.warning(f"Merge pass failed, keeping shard groups as they are: {e}")
+        return groups
+    if not isinstance(merges, list):
+        return groups
+
+    merged, used = [], set()
+    for merge in merges:
+        if not isinstance(merge, list):
+            continue
+        indices = [candidates[group_id] for group_id in dict.fromkeys(merge)
+                   if isinstance(group_id, str) and group_id in candidates and candidates[group_id] not in used]
+        used.update(indices)
+        # Fill commits group by group so no group is split and none grows past the limit
+        current = []
+        for index in indices:
+            if current and len(current) + len(groups[index]) > max_files:
+                merged.append(current)
+                current = []
+            current = current + groups[index]
+        if current:
+            merged.append(current)
+    return merged + [group for index, group in enumerate(groups) if index not in used]
+
+def _group_in_shards(changes: List[Change], config: Dict) -> List[List[Change]]:
+    """Map-reduce grouping for change sets too large for one request: group
+    directory shards concurrently, then merge related groups across shards."""
+    shards = shard_by_directory(changes, config['grouping']['shard_size'])
+    max_concurrency = config.get('advanced', {}).get('max_concurrency', 8)
+    logging.info(f"Grouping {len(changes)} changes in {len(shards)} directory shards")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(shards)))) as executor:
+        shard_groups = list(executor.map(lambda shard: _group_shard(shard, config), shards))
+    return _merge_groups([group for groups in shard_groups for group in groups], config)
+
+def _group_with_model_at_scale(changes: List[Change], config: Dict) -> Optional[List[List[Change]]]:
+    shard_size = config['grouping'].get('shard_size', 0)
+    if shard_size and len(changes) > shard_size:
+        return _group_in_shards(changes, config)
+    return _group_with_model(changes, config)
+
+def group_changes(changes: List[Change], config: Dict) -> List[List[Change]]:
+    with span('group.changes', changes=len(changes)) as current:
+        groups = _group_changes(changes, config)
+        current.set(groups=len(groups))
+    return groups
+
+def _group_changes(changes: List[Change], config: Dict) -> List[List[Change]]:
+    grouping = config['grouping']
+    strategy = grouping.get('strategy', 'hybrid')
+
+    if strategy == 'ai':
+        # Fallback to a single group if JSON parsing fails
+        return _group_with_model_at_scale(changes, config) or [changes]
+
+    language_specific = config.get('language_specific', {})
+    clusters, ambiguous = cluster_changes(changes, grouping, language_specific)
+    logging.info(f"Local grouping produced {len(clusters)} clusters, {len(ambiguous)} ambiguous changes")
+
+    groups = None
+    if strategy == 'hybrid' and len(ambiguous) > 1:
+        groups = _group_with_model_at_scale(ambiguous, config)
+    if groups is None:
+        groups = group_leftovers(ambiguous, grouping, language_specific)
+    return clusters + groups
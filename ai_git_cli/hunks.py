@@ -0,0 +1,88 @@
+import codecs
+import re
+from typing import Dict, Iterable, List
+
+HUNK_HEADER_PATTERN = re.compile(rb'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+class PatchHunk:
+    __slots__ = ('old_start', 'old_count', 'new_start', 'new_count', 'lines')
+
+    def __init__(self, old_start: int, old_count: int, new_start: int, new_count: int):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.lines = []
+
+def _unquote_path(raw: bytes) -> str:
+    # git C-quotes paths with unusual characters: "a/caf\303\251.txt"
+    if raw.startswith(b'"') and raw.endswith(b'"'):
+        raw = codecs.escape_decode(raw[1:-1])[0]
+    return raw.decode('utf-8', errors='surrogateescape')
+
+def parse_patch(diff: bytes) -> Dict[str, List[PatchHunk]]:
+    """Parse full 'git diff' output into hunks per path. Hunks are numbered
+    by position, which matches the numbering used for hunk-level changes as
+    long as both come from 'git diff' with the same context settings."""
+    files = {}
+    hunks = None
+    old_path = None
+    in_header = False
+    for line in diff.splitlines(keepends=True):
+        if line.startswith(b'diff --git '):
+            hunks, old_path, in_header = None, None, True
+        elif in_header and line.startswith(b'--- '):
+            old_path = line[4:].rstrip(b'\r\n')
+        elif in_header and line.startswith(b'+++ '):
+            new_path = line[4:].rstrip(b'\r\n')
+            path = old_path if new_path == b'/dev/null' else new_path
+            # Strip the a/ or b/ prefix (inside the quotes for quoted paths)
+            path = path[:1] + path[3:] if path.startswith(b'"') else path[2:]
+            hunks = files.setdefault(_unquote_path(path), [])
+        elif line.startswith(b'@@') and hunks is not None:
+            in_header = False
+            match = HUNK_HEADER_PATTERN.match(line)
+            old_start, old_count, new_start, new_count = match.groups()
+            hunks.append(PatchHunk(
+                int(old_start), 1 if old_count is None else int(old_count),
+                int(new_start), 1 if new_count is None else int(new_count)
+            ))
+        elif hunks and not in_header:
+            hunks[-1].lines.append(line)
+    return files
+
+def apply_hunks(original: bytes, hunks: Iterable[PatchHunk], path: str = '') -> bytes:
+    """Apply a subset of a file's hunks to its original content in one pass.
+
+    Hunks must come from the same diff against `original`; unselected hunks
+    simply leave their region untouched. Raises ValueError if the content
+    no longer matches the diff."""
+    lines = original.splitlines(keepends=True)
+    output = []
+    position = 0
+    for hunk in sorted(hunks, key=lambda h: h.old_start):
+        # A hunk that only inserts lines starts after line old_start
+        start = hunk.old_start - 1 if hunk.old_count else hunk.old_start
+        if start < position:
+            raise ValueError(f"Overlapping hunks in {path}")
+        output.extend(lines[position:start])
+        position = start
+        last_tag = None
+        for line in hunk.lines:
+            tag = line[:1]
+            if tag in (b' ', b'-'):
+                if position >= len(lines) or lines[position].rstrip(b'\r\n') != line[1:].rstrip(b'\r\n'):
+                    raise ValueError(f"Patch for {path} does not apply; the file changed since it was analyzed")
+                if tag == b' ':
+                    output.append(lines[position])
+                position += 1
+            elif tag == b'+':
+                output.append(line[1:])
+            elif tag == b'\\':
+                # "\ No newline at end of file" refers to the line before it
+                if last_tag in (b'+', b' '):
+                    output[-1] = output[-1].rstrip(b'\r\n')
+                continue
+            last_tag = tag
+    output.extend(lines[position:])
+    return b''.join(output)
@@ -0,0 +1,191 @@
+import os
+import re
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
+from ai_git_cli.changes import Change
+
+LANGUAGE_EXTENSIONS = {
+    'python': ('.py', '.pyi'),
+    'typescript': ('.ts', '.tsx'),
+    'javascript': ('.js', '.jsx', '.mjs', '.cjs'),
+    'java': ('.java',),
+    'go': ('.go',),
+    'rust': ('.rs',),
+    'ruby': ('.rb',),
+}
+
+TEST_NAME_PATTERNS = [
+    re.compile(r'^test_(?P<stem>.+)$'),
+    re.compile(r'^(?P<stem>.+)_test$'),
+    re.compile(r'^(?P<stem>.+)\.(test|spec)$'),
+    re.compile(r'^(?P<stem>.+)Test$'),
+]
+IDENTIFIER_PATTERN = re.compile(r'\b[A-Za-z_][A-Za-z0-9_]{3,}\b')
+# Keywords and identifiers so common that removing one says nothing about a rename
+COMMON_IDENTIFIERS = frozenset("""
+    abstract assert async await boolean break case catch class const continue default defer delete elif else enum
+    except export extends false final finally float from func function global import impl interface lambda let
+    long match module native new none nonlocal null package pass print private protected public raise return self
+    static string struct super switch this throw throws true type typeof undefined unless until value void while
+    where with yield args kwargs data result name index item items key keys error config
+""".split())
+# A symbol removed from more files than this is too common to signal a rename
+MAX_RENAME_FANOUT = 200
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+def detect_language(path: str, language_specific: Dict) -> Optional[str]:
+    extension = os.path.splitext(path)[1].lower()
+    for language in language_specific:
+        if extension in LANGUAGE_EXTENSIONS.get(language, ()):
+            return language
+    return None
+
+def _split_stem(path: str) -> Tuple[str, bool]:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for pattern in TEST_NAME_PATTERNS:
+        match = pattern.match(stem)
+        if match:
+            return match.group('stem').lower(), True
+    is_test = any(part in ('test', 'tests', '__tests__', 'spec') for part in path.split('/')[:-1])
+    return stem.lower(), is_test
+
+def _language(path: str) -> str:
+    # Symbols only link files of one language; unknown ones go by extension
+    extension = os.path.splitext(path)[1].lower()
+    for language, extensions in LANGUAGE_EXTENSIONS.items():
+        if extension in extensions:
+            return language
+    return extension
+
+def _identifiers(line: str) -> set:
+    return {name for name in IDENTIFIER_PATTERN.findall(line) if name.lower() not in COMMON_IDENTIFIERS}
+
+def _changed_symbols(diff: str) -> Tuple[set, set, set]:
+    """Identifiers the diff drops, those it introduces, and (old, new) pairs
+    where a run of changed lines swaps exactly one identifier for another."""
+    removed, added, renames = set(), set(), set()
+    block_removed, block_added = set(), set()
+    for line in diff.split('\n') + ['']:
+        if line.startswith('-') and not line.startswith('---'):
+            block_removed |= _identifiers(line)
+            continue
+        if line.startswith('+') and not line.startswith('+++'):
+            block_added |= _identifiers(line)
+            continue
+        old, new = block_removed - block_added, block_added - block_removed
+        if len(old) == 1 and len(new) == 1:
+            renames.add((old.pop(), new.pop()))
+        removed |= block_removed
+        added |= block_added
+        block_removed, block_added = set(), set()
+    return removed - added, added - removed, renames
+
+def _position(change: Change) -> Tuple[str, int]:
+    return change.path, change.hunk or 0
+
+def _chunk(items: List[Change], size: int) -> List[List[Change]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def cluster_changes(changes: List[Change], grouping: Dict, language_specific: Dict) -> Tuple[List[List[Change]], List[Change]]:
+    """Pair tests with their sources and join files touched by the same
+    rename or moved symbol.
+
+    Returns the confident clusters and the ambiguous changes worth asking the
+    model about: files with no such link, files that merely share a directory,
+    and clusters too big for one commit, which the model can split by meaning
+    rather than by path order."""
+    max_files = grouping.get('max_files_per_commit', 5)
+    languages = [detect_language(change.path, language_specific) for change in changes]
+    union = _UnionFind(len(changes))
+
+    sources_by_stem = defaultdict(list)
+    tests = []
+    for index, change in enumerate(changes):
+        # Hunks of a multi-hunk file are only joined by shared symbols, so
+        # unrelated edits to one file can land in different commits
+        if change.hunk_count > 1:
+            continue
+        stem, is_test = _split_stem(change.path)
+        if is_test:
+            tests.append((index, stem))
+        else:
+            sources_by_stem[(languages[index], stem)].append(index)
+
+    for index, stem in tests:
+        for source in sources_by_stem.get((languages[index], stem), ()):
+            union.union(index, source)
+
+    # A symbol removed from one file and added to another was moved, and
+    # files making the same one-for-one swap share a rename; a symbol that
+    # is merely deleted in several places links nothing
+    removed_by_symbol, added_by_symbol, files_by_rename = defaultdict(list), defaultdict(list), defaultdict(list)
+    for index, change in enumerate(changes):
+        if not change.diff:
+            continue
+        language = _language(change.path)
+        removed, added, renames = _changed_symbols(change.diff)
+        for symbol in removed:
+            removed_by_symbol[(language, symbol)].append(index)
+        for symbol in added:
+            added_by_symbol[(language, symbol)].append(index)
+        for rename in renames:
+            files_by_rename[(language, rename)].append(index)
+    linked = [files for files in files_by_rename.values() if len(files) > 1]
+    linked += [removed_by_symbol[key] + added_by_symbol[key] for key in removed_by_symbol if key in added_by_symbol]
+    for indices in linked:
+        if len(indices) <= MAX_RENAME_FANOUT:
+            for index in indices[1:]:
+                union.union(indices[0], index)
+
+    members = defaultdict(list)
+    for index in range(len(changes)):
+        members[union.find(index)].append(index)
+
+    clusters, ambiguous = [], []
+    for root in sorted(members):
+        indices = members[root]
+        if len(indices) == 1 or len(indices) > max_files:
+            ambiguous.extend(changes[index] for index in indices)
+            continue
+        clusters.append(sorted((changes[index] for index in indices), key=_position))
+    ambiguous.sort(key=_position)
+    return clusters, ambiguous
+
+def group_leftovers(changes: List[Change], grouping: Dict, language_specific: Dict) -> List[List[Change]]:
+    # Without the model, keep files of one language together by directory, and
+    # files alone in theirs by top-level directory
+    max_files = grouping.get('max_files_per_commit', 5)
+    keys = []
+    for change in changes:
+        language = detect_language(change.path, language_specific) or ''
+        # Hunks of a multi-hunk file do not make their directory look busy
+        directory = os.path.dirname(change.path) if change.hunk_count <= 1 else None
+        keys.append((language, directory))
+    sizes = defaultdict(int)
+    for key in keys:
+        sizes[key] += 1
+    buckets = defaultdict(list)
+    for change, (language, directory) in zip(changes, keys):
+        if directory is not None and sizes[(language, directory)] > 1:
+            buckets[(language, directory, '')].append(change)
+        else:
+            top_level = change.path.split('/', 1)[0] if '/' in change.path else ''
+            buckets[(language, '', top_level)].append(change)
+    groups = []
+    for key in sorted(buckets):
+        groups.extend(_chunk(sorted(buckets[key], key=_position), max_files))
+    return groups
@@ -1,64 +1,171 @@
+import logging
 import sys
-import git
-from rich.console import Console
-from rich.table import Table
-from rich.prompt import Prompt
-from rich.panel import Panel
-from rich.text import Text
-from ai_git_cli.config import load_config
-from ai_git_cli.grouping import group_changes
-from ai_git_cli.commit_message import generate_commit_message
-from ai_git_cli.commit_execution import execute_commits, amend_commit_history
+import threading
+from ai_git_cli.changes import ChangeSet
+from ai_git_cli.diff_analysis import get_unstaged_changes, has_unstaged_changes
+from ai_git_cli.tracing import span, start_tracing, stop_tracing
 import argparse
 
+# git, rich, openai, yaml and dotenv are imported inside the commands that
+# need them so that --help and the no-changes exit stay fast (the tool is
+# often run from a git hook).
+
+class CommitMessageStream:
+    """Collects commit messages while they stream in and renders them as the
+    Proposed Commits table."""
+
+    def __init__(self, commit_messages, changes, finished=False):
+        self.commit_messages = commit_messages
+        self.changes = changes
+        self.generation = None
+        self._finished = [threading.Event() for _ in commit_messages]
+        if finished:
+            for event in self._finished:
+                event.set()
+
+    @classmethod
+    def start(cls, groups, changes, config):
+        from concurrent.futures import ThreadPoolExecutor
+        from ai_git_cli.commit_message import generate_commit_message, make_commit
+
+        stream = cls([make_commit('', group) for group in groups], changes)
+        executor = ThreadPoolExecutor(max_workers=1)
+        stream.generation = executor.submit(generate_commit_message, groups, config, stream.update)
+        # Unblock anyone waiting if generation fails outright
+        stream.generation.add_done_callback(lambda _: stream._finish_all())
+        executor.shutdown(wait=False)
+        return stream
+
+    def update(self, index, message, finished):
+        self.commit_messages[index]['message'] = message
+        if finished:
+            self._finished[index].set()
+
+    def _finish_all(self):
+        for event in self._finished:
+            event.set()
+
+    def is_finished(self, index):
+        return self._finished[index].is_set()
+
+    def wait(self, index, console, live=None):
+        from rich.live import Live
+        from rich.text import Text
+
+        if not self.is_finished(index):
+            if live is not None:
+                # Already inside a Live showing this table, which redraws as
+                # messages arrive; rich before 14 cannot nest a second one
+                self._finished[index].wait()
+            else:
+                with Live(console=console, transient=True, refresh_per_second=10) as live:
+                    while not self._finished[index].wait(0.1):
+                        live.update(Text(f"Generating message for group {index + 1}: {self.commit_messages[index]['message']}"))
+        if self.generation is not None and self.generation.done() and self.generation.exception():
+            raise self.generation.exception()
+
+    def __rich__(self):
+        return build_commit_table(self.commit_messages, self.changes, [event.is_set() for event in self._finished])
+
+def print_error(message):
+    if sys.stdout.isatty():
+        message = f"\033[1;31m{message}\033[0m"
+    print(message)
+
+def request_daemon_analysis(args, config):
+    # A running daemon already has the diff and most messages ready
+    if getattr(args, 'no_cache', False) or getattr(args, 'no_daemon', False):
+        return None
+    from ai_git_cli.daemon import config_digest, request
+    try:
+        return request('analyze', config_digest=config_digest(config))
+    except RuntimeError as e:
+        logging.warning(f"{e}; analyzing locally")
+        return None
+
+def apply_cli_overrides(config, args):
+    if getattr(args, 'no_cache', False):
+        config.setdefault('cache', {})['enabled'] = False
+    return config
+
 def commit_command(args):
+    if not has_unstaged_changes():
+        print_error("No unstaged changes to commit.")
+        return
+
+    import git
+    from rich.console import Console
+    from rich.live import Live
+    from rich.panel import Panel
+    from rich.prompt import Prompt
+    from rich.text import Text
+    from ai_git_cli.config import load_config
+    from ai_git_cli.grouping import group_changes
+    from ai_git_cli.commit_execution import execute_commits, amend_commit_history
+    from ai_git_cli.single_pass import group_and_generate
+    from ai_git_cli.commit_message import format_commit_files
+
     console = Console()
     try:
         config_path = args.config if hasattr(args, 'config') and args.config else 'configs/config.yaml'
-        config = load_config(config_path)
+        config = apply_cli_overrides(load_config(config_path), args)
         repo = git.Repo('.')
         
         # Get unstaged changes
-        diffs = repo.index.diff(None)
-        if not diffs:
+        analysis = request_daemon_analysis(args, config)
+        changes = ChangeSet.from_list(analysis['changes']) if analysis else get_unstaged_changes(config)
+        if not changes:
             console.print("[bold red]No unstaged changes to commit.[/bold red]")
             return
         
         # Display unstaged changes
         console.print("[bold]Unstaged changes for analysis:[/bold]")
-        changes = []
-        for diff in diffs:
-            change_type = 'Modified' if diff.change_type == 'M' else diff.change_type
-            changes.append({'path': diff.a_path, 'change_type': change_type})
-            console.print(Panel(str(diff), title=f"{change_type}: {diff.a_path}", expand=False))
+        with span('render.changes', changes=len(changes)):
+            for change in changes:
+                if change.change_type == 'M':
+                    change.change_type = 'Modified'
+                console.print(Panel(Text(change.diff), title=f"{change.change_type}: {change.id}", expand=False))
 
         if not changes:
             console.print("[yellow]No unstaged changes found.[/yellow]")
             return
 
-        # Analyze and group changes
-        console.print("[bold green]Analyzing and grouping changes...[/bold green]")
-        groups = group_changes(changes, config)
+        commit_messages = analysis['commit_messages'] if analysis else None
+        if commit_messages is None and config.get('advanced', {}).get('single_pass', False):
+            console.print("[bold green]Grouping changes and generating commit messages...[/bold green]")
+            commit_messages = group_and_generate(changes, config)
 
-        # Generate commit messages
-        console.print("[bold green]Generating commit messages...[/bold green]")
-        commit_messages = generate_commit_message(groups, config)
+        if commit_messages is not None:
+            stream = CommitMessageStream(commit_messages, changes, finished=True)
+            display_commit_messages(console, commit_messages, changes)
+        else:
+            # Analyze and group changes
+            console.print("[bold green]Analyzing and grouping changes...[/bold green]")
+            groups = group_changes(changes, config)
 
-        # Display analysis results
-        display_commit_messages(console, commit_messages, diffs)
+            # Generate commit messages, filling in the table as they stream in
+            # until the first one is ready for review
+            console.print("[bold green]Generating commit messages...[/bold green]")
+            stream = CommitMessageStream.start(groups, changes, config)
+            if groups:
+                with Live(stream, console=console, refresh_per_second=10) as live:
+                    stream.wait(0, console, live)
+            commit_messages = stream.commit_messages
 
-        # Interactive Review
-        for commit in commit_messages.copy():
-            console.print(f"\n[bold cyan]Commit for files:[/bold cyan] {', '.join(commit['files'])}")
+        # Interactive Review, starting while later messages are still generating
+        reviewed = []
+        for idx, commit in enumerate(commit_messages):
+            stream.wait(idx, console)
+            console.print(f"\n[bold cyan]Commit for files:[/bold cyan] {format_commit_files(commit)}")
             console.print(f"[bold green]Suggested Message:[/bold green] {commit['message']}")
             action = Prompt.ask("Choose action", choices=["accept", "edit", "skip"], default="accept").lower()
             if action == "accept":
-                continue
+                reviewed.append(commit)
             elif action == "edit":
                 new_message = Prompt.ask("Enter your commit message")
                 commit['message'] = new_message
-            elif action == "skip":
-                commit_messages.remove(commit)
+                reviewed.append(commit)
+        commit_messages = reviewed
 
         # Confirm and execute commits
         proceed = Prompt.ask("\nProceed with these commits?", choices=["y", "n"], default="y").lower()
@@ -71,7 +178,8 @@ def commit_command(args):
             return
 
         try:
-            execute_commits(commit_messages, config)
+            with span('commit.execute', commits=len(commit_messages)):
+                execute_commits(commit_messages, config)
             console.print("[bold green]Commits created successfully.[/bold green]")
         except ValueError as e:
             console.print(f"[bold red]Configuration error: {str(e)}[/bold red]")
@@ -125,28 +233,44 @@ def commit_command(args):
         console.print("[yellow]Please report this issue to the developers.[/yellow]")
 
 def analyze_command(args):
+    if not has_unstaged_changes():
+        print_error("No unstaged changes to analyze.")
+        return
+
+    from rich.console import Console
+    from rich.prompt import Prompt
+    from rich.table import Table
+    from ai_git_cli.config import load_config
+    from ai_git_cli.grouping import group_changes
+    from ai_git_cli.commit_message import format_commit_files, generate_commit_message
+    from ai_git_cli.single_pass import group_and_generate
+
     console = Console()
-    config = load_config('configs/config.yaml')
-    repo = git.Repo('.')
+    config = apply_cli_overrides(load_config('configs/config.yaml'), args)
     
     # Get unstaged changes
-    diffs = repo.index.diff(None)
-    if not diffs:
+    analysis = request_daemon_analysis(args, config)
+    changes = ChangeSet.from_list(analysis['changes']) if analysis else get_unstaged_changes(config)
+    if not changes:
         console.print("[bold red]No unstaged changes to analyze.[/bold red]")
         return
 
     # Display unstaged changes
     console.print("[bold]Unstaged changes for analysis:[/bold]")
-    changes = []
-    for diff in diffs:
-        change_type = 'Modified' if diff.change_type == 'M' else diff.change_type
-        changes.append({'path': diff.a_path, 'change_type': change_type})
-        console.print(f"[cyan]{change_type}[/cyan]: {diff.a_path}")
+    with span('render.changes', changes=len(changes)):
+        for change in changes:
+            if change.change_type == 'M':
+                change.change_type = 'Modified'
+            console.print(f"[cyan]{change.change_type}[/cyan]: {change.id}")
 
     # Group changes and generate commit messages
     with console.status("[bold green]Analyzing changes...[/bold green]"):
-        groups = group_changes(changes, config)
-        commit_messages = generate_commit_message(groups, config)
+        commit_messages = analysis['commit_messages'] if analysis else None
+        if commit_messages is None and config.get('advanced', {}).get('single_pass', False):
+            commit_messages = group_and_generate(changes, config)
+        if commit_messages is None:
+            groups = group_changes(changes, config)
+            commit_messages = generate_commit_message(groups, config)
 
     # Display analysis results
     table = Table(title="Analysis Results", show_lines=True)
@@ -157,11 +281,12 @@ def analyze_command(args):
     for idx, commit in enumerate(commit_messages, 1):
         table.add_row(
             f"[bold blue]{idx}[/bold blue]",
-            ", ".join(commit['files']),
+            format_commit_files(commit),
             commit['message']
         )
 
-    console.print(table)
+    with span('render.table', rows=len(commit_messages)):
+        console.print(table)
 
     # Add confirmation step
     confirm = Prompt.ask("Do you want to proceed with these commits?", choices=["y", "n"], default="y")
@@ -169,7 +294,55 @@ def analyze_command(args):
         console.print("[bold yellow]Commit process cancelled.[/bold yellow]")
         return
 
-def display_commit_messages(console, commit_messages, diffs):
+def daemon_command(args):
+    import os
+    import subprocess
+    import time
+    from ai_git_cli.daemon import default_socket_path, request
+
+    socket_path = default_socket_path()
+    if socket_path is None:
+        print_error("Not a git repository.")
+        return
+
+    if args.action == 'status':
+        status = request('status', socket_path, timeout=5.0)
+        if status is None:
+            print("No daemon is running for this repository.")
+        else:
+            print(f"Daemon running (pid {status['pid']}) with {status['changes']} changes and {status['commits']} proposed commits.")
+    elif args.action == 'stop':
+        if request('stop', socket_path, timeout=5.0) is None:
+            print("No daemon is running for this repository.")
+        else:
+            print("Daemon stopped.")
+    elif args.foreground:
+        from ai_git_cli.config import load_config
+        from ai_git_cli.daemon import AnalysisDaemon
+
+        config = load_config(args.config or 'configs/config.yaml')
+        # Paths from git are relative to the top level of the work tree
+        os.chdir(subprocess.run(['git', 'rev-parse', '--show-toplevel'], capture_output=True, text=True, check=True).stdout.strip())
+        AnalysisDaemon(config, socket_path).serve_forever()
+    else:
+        if request('status', socket_path, timeout=5.0) is not None:
+            print("Daemon is already running.")
+            return
+        command = [sys.executable, '-m', 'ai_git_cli.main', 'daemon', 'start', '--foreground']
+        command += ['--config', os.path.abspath(args.config or 'configs/config.yaml')]
+        subprocess.Popen(command, start_new_session=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(50):
+            time.sleep(0.1)
+            if request('status', socket_path, timeout=5.0) is not None:
+                print(f"Daemon started on {socket_path}")
+                return
+        print_error("Daemon did not start; run 'ai-git-cli daemon start --foreground' to see why.")
+
+def build_commit_table(commit_messages, changes, finished=None):
+    from rich.table import Table
+
+    from ai_git_cli.commit_message import commit_changes, format_commit_files
+
     table = Table(title="Proposed Commits", show_lines=True)
     table.add_column("Group", style="cyan", no_wrap=True)
     table.add_column("Files", style="magenta", overflow="fold")
@@ -177,27 +350,59 @@ def display_commit_messages(console, commit_messages, diffs):
     table.add_column("Diff Summary", style="yellow", overflow="fold")
 
     for idx, commit in enumerate(commit_messages, 1):
-        diff_summary = []
-        for diff in diffs:
-            if diff.a_path in commit['files']:
-                try:
-                    if isinstance(diff.diff, str):
-                        diff_content = diff.diff
-                    else:
-                        diff_content = diff.diff.decode('utf-8')
-                    changes = sum(1 for line in diff_content.split('\n') if line.startswith(('+', '-')))
-                    diff_summary.append(f"{diff.a_path}: {changes} changes")
-                except Exception as e:
-                    diff_summary.append(f"{diff.a_path}: Error processing diff")
-        
+        diff_summary = [
+            f"{change.id}: {change.additions + change.deletions} changes"
+            for change in commit_changes(commit, changes)
+        ]
+
+        message = commit['message']
+        if finished is not None and not finished[idx - 1]:
+            message = f"{message}[dim]▌ generating...[/dim]"
         table.add_row(
             f"[bold blue]{idx}[/bold blue]",
-            ", ".join(commit['files']),
-            commit['message'],
+            format_commit_files(commit),
+            message,
             "\n".join(diff_summary)
         )
 
-    console.print(table)
+    return table
+
+def display_commit_messages(console, commit_messages, changes):
+    with span('render.table', rows=len(commit_messages)):
+        console.print(build_commit_table(commit_messages, changes))
+
+def print_profile(tracer, path):
+    from rich.console import Console
+    from rich.table import Table
+
+    tracer.write(path)
+    table = Table(title=f"Profile ({path})")
+    table.add_column("Span", style="cyan", no_wrap=True)
+    table.add_column("Calls", justify="right")
+    table.add_column("Total (s)", justify="right", style="green")
+    table.add_column("Mean (ms)", justify="right")
+    table.add_column("Max (ms)", justify="right")
+    table.add_column("Counters", style="yellow", overflow="fold")
+    for row in tracer.summary():
+        table.add_row(
+            row['name'],
+            str(row['calls']),
+            f"{row['total']:.3f}",
+            f"{row['mean'] * 1000:.1f}",
+            f"{row['max'] * 1000:.1f}",
+            ", ".join(f"{key}={value:g}" for key, value in sorted(row['counters'].items()))
+        )
+    Console(stderr=True).print(table)
+
+def run_command(args):
+    if not getattr(args, 'profile', None):
+        args.func(args)
+        return
+    start_tracing()
+    try:
+        args.func(args)
+    finally:
+        print_profile(stop_tracing(), args.profile)
 
 def cli_main():
     import argparse
@@ -206,16 +411,28 @@ def cli_main():
     subparsers = parser.add_subparsers(dest='command')
 
     analyze_parser = subparsers.add_parser('analyze', help='Analyze current diffs')
+    analyze_parser.add_argument('--no-cache', action='store_true', help='Ignore cached AI responses for this run')
+    analyze_parser.add_argument('--no-daemon', action='store_true', help='Analyze in-process even if a daemon is running')
+    analyze_parser.add_argument('--profile', type=str, metavar='PATH', help='Trace this run to PATH (.json for Chrome trace format, otherwise JSON lines) and print a summary')
     analyze_parser.set_defaults(func=analyze_command)
 
     commit_parser = subparsers.add_parser('commit', help='Split and commit changes with AI-generated messages')
     commit_parser.add_argument('--dry-run', action='store_true', help='Preview commits without applying them')
     commit_parser.add_argument('--config', type=str, help='Path to the configuration file')
+    commit_parser.add_argument('--no-cache', action='store_true', help='Ignore cached AI responses for this run')
+    commit_parser.add_argument('--no-daemon', action='store_true', help='Analyze in-process even if a daemon is running')
+    commit_parser.add_argument('--profile', type=str, metavar='PATH', help='Trace this run to PATH (.json for Chrome trace format, otherwise JSON lines) and print a summary')
     commit_parser.set_defaults(func=commit_command)
 
+    daemon_parser = subparsers.add_parser('daemon', help='Keep analysis results warm in a background process')
+    daemon_parser.add_argument('action', choices=['start', 'stop', 'status'])
+    daemon_parser.add_argument('--config', type=str, help='Path to the configuration file')
+    daemon_parser.add_argument('--foreground', action='store_true', help='Run the daemon in this process')
+    daemon_parser.set_defaults(func=daemon_command)
+
     args = parser.parse_args()
     if hasattr(args, 'func'):
-        args.func(args)
+        run_command(args)
     else:
         parser.print_help()
 
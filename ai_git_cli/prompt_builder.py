@@ -0,0 +1,92 @@
+import logging
+import os
+from collections import Counter, defaultdict
+from typing import Any, Callable, List, Optional, Tuple
+from ai_git_cli.changes import Change
+from ai_git_cli.tokens import count_tokens
+
+# Room kept for the "+312 files under vendor/" lines once something overflows
+OVERFLOW_RESERVE = 64
+MAX_OVERFLOW_LINES = 5
+
+def _top_level(path: str) -> str:
+    return path.split('/', 1)[0] if '/' in path else ''
+
+def crowded_last(changes: List[Change]) -> Callable[[int], Tuple[int, int]]:
+    """Priority for file listings: files from small top-level directories
+    first, so bulk updates such as vendor/ are the ones summarised."""
+    sizes = Counter(_top_level(change.path) for change in changes)
+    return lambda index: (sizes[_top_level(changes[index].path)], index)
+
+def summarize_overflow(changes: List[Change]) -> List[str]:
+    """Describe changes left out of a prompt by directory, e.g.
+    '+312 files under vendor/'."""
+    by_top_level = defaultdict(set)
+    for change in changes:
+        by_top_level[_top_level(change.path)].add(change.path)
+    buckets = sorted(by_top_level.items(), key=lambda item: (-len(item[1]), item[0]))
+    if len(buckets) > MAX_OVERFLOW_LINES:
+        rest = buckets[MAX_OVERFLOW_LINES - 1:]
+        buckets = buckets[:MAX_OVERFLOW_LINES - 1]
+    else:
+        rest = []
+
+    lines = []
+    for top_level, paths in buckets:
+        noun = "file" if len(paths) == 1 else "files"
+        if not top_level:
+            lines.append(f"+{len(paths)} {noun} in the repository root")
+            continue
+        # Name the deepest directory all of them share
+        directory = os.path.commonpath([os.path.dirname(path) for path in paths]) or top_level
+        lines.append(f"+{len(paths)} {noun} under {directory}/")
+    if rest:
+        lines.append(f"+{sum(len(paths) for _, paths in rest)} files in {len(rest)} other directories")
+    return lines
+
+class PromptBuilder:
+    """Assembles one prompt within a token budget. Fixed text always goes
+    in; per-change entries are packed by priority and the ones that do not
+    fit are reported back so the caller can summarise them."""
+
+    def __init__(self, name: str, token_limit: Optional[int] = None):
+        self.name = name
+        self.token_limit = token_limit
+        self.used = 0
+        self.listed = 0
+        self.omitted = 0
+
+    def fixed(self, *texts: str):
+        for text in texts:
+            self.used += count_tokens(text) + 1
+
+    def pack(self, changes: List[Any], render: Callable[[Any], str],
+             priority: Optional[Callable[[int], object]] = None) -> Tuple[List[str], List[Any]]:
+        """Render changes (or other items, such as groups) and keep the ones
+        that fit, in their original order. Returns the kept entries and the
+        items that were left out."""
+        entries = [render(change) for change in changes]
+        costs = [count_tokens(entry) + 1 for entry in entries]
+        available = None if self.token_limit is None else self.token_limit - self.used
+        if available is None or sum(costs) <= available:
+            self.used += sum(costs)
+            self.listed += len(entries)
+            return entries, []
+
+        available -= OVERFLOW_RESERVE
+        kept = set()
+        # Skip entries that do not fit and keep trying smaller ones after them
+        for index in sorted(range(len(entries)), key=priority or (lambda index: index)):
+            if costs[index] <= available:
+                kept.add(index)
+                available -= costs[index]
+                self.used += costs[index]
+        self.listed += len(kept)
+        self.omitted += len(entries) - len(kept)
+        return [entries[i] for i in sorted(kept)], [changes[i] for i in range(len(changes)) if i not in kept]
+
+    def finish(self, prompt: str) -> str:
+        tokens = count_tokens(prompt)
+        budget = f" of {self.token_limit}" if self.token_limit is not None else ""
+        logging.info(f"{self.name} prompt: {tokens}{budget} tokens, {self.listed} entries packed, {self.omitted} summarized")
+        return prompt
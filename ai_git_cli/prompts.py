@@ -1,7 +1,22 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from ai_git_cli.changes import Change
+from ai_git_cli.prompt_builder import PromptBuilder, crowded_last, summarize_overflow
 
-def create_commit_message_prompt(group: List[Dict], user_feedback: str, commit_style: Dict) -> str:
-    files = "\n".join([f"- {change['change_type'].capitalize()} in {change['path']}" for change in group])
+def _file_line(change: Change) -> str:
+    return f"- {change.change_type.capitalize()} in {change.id}"
+
+def _pack_diffs(builder: PromptBuilder, changes: List[Change]) -> str:
+    # Smaller diffs first so as many files as possible are shown
+    with_diff = [change for change in changes if change.diff]
+    diffs, omitted = builder.pack(with_diff, lambda change: change.diff, lambda index: len(with_diff[index].diff))
+    text = "\n\n".join(diffs)
+    if omitted:
+        text += "\n\nDiffs left out for space: " + "; ".join(summarize_overflow(omitted))
+    return text
+
+def create_commit_message_prompt(group: List[Change], user_feedback: str, commit_style: Dict, token_limit: Optional[int] = None) -> str:
+    builder = PromptBuilder('Commit message', token_limit)
+    files = "\n".join([_file_line(change) for change in group])
     prompt = f"""Generate a concise and descriptive Git commit message based on the following changes that {user_feedback}:
 {files}
 
@@ -9,11 +24,96 @@ Use the {commit_style['format']} format. Provide the commit message in JSON form
     if commit_style['format'] == "conventional":
         prefixes = ", ".join(commit_style['conventional_prefixes'].keys())
         prompt += f" Use one of these prefixes for the 'type' field: {prefixes}."
-    return prompt
+    builder.fixed(prompt, "Diff:")
+    diffs = _pack_diffs(builder, group)
+    if diffs:
+        prompt += f"\n\nDiff:\n{diffs}"
+    return builder.finish(prompt)
+
+def create_batch_commit_message_prompt(batch: List[Tuple[int, List[Change]]], user_feedback: str, commit_style: Dict,
+                                       token_limit: Optional[int] = None) -> str:
+    builder = PromptBuilder('Batch commit message', token_limit)
+    instructions = f"Use the {commit_style['format']} format. Provide the commit messages as a JSON array with one object per group, each with 'group_id', 'type', 'subject' and 'body' fields. Leave 'body' empty when the subject says enough."
+    if commit_style['format'] == "conventional":
+        prefixes = ", ".join(commit_style['conventional_prefixes'].keys())
+        instructions += f" Use one of these prefixes for the 'type' field: {prefixes}."
+    headers = [(group_id, f"Group {group_id}:\n" + "\n".join([_file_line(change) for change in group])) for group_id, group in batch]
+    builder.fixed(f"Generate a concise and descriptive Git commit message for each of the following groups of changes that {user_feedback}:",
+                  instructions, *(header for _, header in headers))
 
-def create_grouping_prompt(changes: List[Dict], user_feedback: str, grouping: Dict) -> str:
-    changes_formatted = "\n".join([f"- {change['change_type'].capitalize()} in {change['path']}" for change in changes])
-    prompt = f"Group the following Git changes into logical commit sets that {user_feedback}:\n{changes_formatted}\n\nProvide the groups in JSON format where each group is a list of file paths. Each group should have no more than {grouping['max_files_per_commit']} files."
+    sections = []
+    for (group_id, group), (_, header) in zip(batch, headers):
+        section = header
+        diffs = _pack_diffs(builder, group)
+        if diffs:
+            section += f"\nDiff:\n{diffs}"
+        sections.append(section)
+    groups_formatted = "\n\n".join(sections)
+    prompt = f"""Generate a concise and descriptive Git commit message for each of the following groups of changes that {user_feedback}:
+
+{groups_formatted}
+
+{instructions}"""
+    return builder.finish(prompt)
+
+def create_grouping_prompt(changes: List[Change], user_feedback: str, grouping: Dict, instructions: List[str] = None,
+                           token_limit: Optional[int] = None) -> str:
+    builder = PromptBuilder('Grouping', token_limit)
+    intro = f"Group the following Git changes into logical commit sets that {user_feedback}:"
+    outro = f"Provide the groups in JSON format where each group is a list of file paths. Each group should have no more than {grouping['max_files_per_commit']} files."
     if grouping['combine_similar_changes']:
-        prompt += " Ensure that similar types of changes are grouped together."
-    return prompt
+        outro += " Ensure that similar types of changes are grouped together."
+    for instruction in instructions or []:
+        outro += f" {instruction}"
+    builder.fixed(intro, outro)
+
+    lines, omitted = builder.pack(changes, _file_line, crowded_last(changes))
+    if omitted:
+        lines += summarize_overflow(omitted)
+        outro += " Only group the files listed by name; the summarized ones are grouped separately."
+    changes_formatted = "\n".join(lines)
+    return builder.finish(f"{intro}\n{changes_formatted}\n\n{outro}")
+
+def create_single_pass_prompt(changes: List[Change], user_feedback: str, grouping: Dict, commit_style: Dict,
+                              token_limit: Optional[int] = None) -> str:
+    builder = PromptBuilder('Single-pass', token_limit)
+    intro = f"Group the following Git changes into logical commits that {user_feedback} and write a concise, descriptive commit message for each commit:"
+    outro = f"""Each commit should have no more than {grouping['max_files_per_commit']} files and every file must appear in exactly one commit. Use the {commit_style['format']} format. Respond with only a JSON object of the form {{"commits": [{{"files": [file paths], "type": "...", "subject": "...", "body": "..."}}]}}. Leave 'body' empty when the subject says enough."""
+    if grouping['combine_similar_changes']:
+        outro += " Ensure that similar types of changes are grouped together."
+    if commit_style['format'] == "conventional":
+        prefixes = ", ".join(commit_style['conventional_prefixes'].keys())
+        outro += f" Use one of these prefixes for the 'type' field: {prefixes}."
+    builder.fixed(intro, outro)
+
+    # File lines first so every listed file can be placed, then diffs in what is left
+    _, omitted = builder.pack(changes, _file_line, crowded_last(changes))
+    omitted_set = set(omitted)
+    listed = [change for change in changes if change not in omitted_set]
+    with_diff = [change for change in listed if change.diff]
+    diffs, without_diff = builder.pack(with_diff, lambda change: change.diff, lambda index: len(with_diff[index].diff))
+    without_diff = set(without_diff)
+    diff_by_change = dict(zip([change for change in with_diff if change not in without_diff], diffs))
+
+    sections = []
+    for change in listed:
+        section = _file_line(change)
+        if change in diff_by_change:
+            section += f"\n{diff_by_change[change]}"
+        sections.append(section)
+    if omitted:
+        sections += summarize_overflow(omitted)
+        outro += " Only place the files listed by name; the summarized ones are handled separately."
+    changes_formatted = "\n".join(sections)
+    return builder.finish(f"{intro}\n{changes_formatted}\n\n{outro}")
+
+def create_merge_prompt(groups: List[Tuple[str, List[Change]]], grouping: Dict, token_limit: Optional[int] = None) -> str:
+    builder = PromptBuilder('Merge', token_limit)
+    intro = "The following groups of Git changes were formed separately for different parts of the repository. Find groups that belong in the same commit because they make one logical change:"
+    outro = f"""Respond with only a JSON array of merges, each a list of two or more group ids, for example [["G1", "G4"]]. A merged group should have no more than {grouping['max_files_per_commit']} files. Leave out groups that stand alone."""
+    builder.fixed(intro, outro)
+
+    # Groups that do not fit simply stay as they are
+    lines, _ = builder.pack(groups, lambda item: f"{item[0]} ({len(item[1])} files): {', '.join(change.id for change in item[1])}")
+    groups_formatted = "\n".join(lines)
+    return builder.finish(f"{intro}\n{groups_formatted}\n\n{outro}")
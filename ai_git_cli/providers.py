@@ -0,0 +1,197 @@
+import openai
+import abc
+import asyncio
+import functools
+import json
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_PROVIDER = 'openai'
+
+class Provider(abc.ABC):
+    """A chat completion backend. AIClient adds caching, retries and rate
+    limiting on top, so providers only make single requests."""
+
+    @abc.abstractmethod
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: float) -> str:
+        """Return the model's full response to messages."""
+
+    def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: float) -> Iterator[str]:
+        # Backends without streaming deliver the whole response as one delta
+        return iter([self.complete(model, messages, temperature, timeout)])
+
+    async def acomplete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: float) -> str:
+        # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.complete, model, messages, temperature, timeout))
+
+    def close(self):
+        pass
+
+class OpenAIProvider(Provider):
+    """The OpenAI API, or any server speaking it (llama.cpp, vLLM, Ollama)
+    when base_url is set."""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, pool_size: int = 10, timeout: float = 60.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        # Retries are handled by AIClient's resilience layer, not the SDK
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=_create_http_client(pool_size, timeout),
+                                    timeout=timeout, max_retries=0)
+        self.async_client = None
+        self._async_lock = threading.Lock()
+
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: float) -> str:
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout
+        )
+        return response.choices[0].message.content.strip()
+
+    def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: float) -> Iterator[str]:
+        # Open the stream here so connection errors surface to the retry layer
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            timeout=timeout
+        )
+        return _stream_deltas(stream)
+
+    async def acomplete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: float) -> str:
+        response = await self._get_async_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout
+        )
+        return response.choices[0].message.content.strip()
+
+    def _get_async_client(self):
+        with self._async_lock:
+            if self.async_client is None:
+                self.async_client = openai.AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=_create_http_client(self.pool_size, self.timeout, asynchronous=True),
+                    timeout=self.timeout,
+                    max_retries=0
+                )
+            return self.async_client
+
+    def close(self):
+        self.client.close()
+        if self.async_client is not None:
+            try:
+                asyncio.run(self.async_client.close())
+            except RuntimeError as e:
+                logging.warning(f"Could not close async AI client: {e}")
+            self.async_client = None
+
+def _stream_deltas(stream) -> Iterator[str]:
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+def _create_http_client(pool_size: int, timeout: float, asynchronous: bool = False):
+    try:
+        import httpx
+    except ImportError:  # Newer openai releases ship the httpx2 fork instead
+        import httpx2 as httpx
+    # One keep-alive pool shared by every request made through this client
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    if asynchronous:
+        return openai.DefaultAsyncHttpxClient(limits=limits, timeout=timeout)
+    return openai.DefaultHttpxClient(limits=limits, timeout=timeout)
+
+FILE_LINE_PATTERN = re.compile(r'^- \w+ in (\S+)$', re.MULTILINE)
+GROUP_HEADER_PATTERN = re.compile(r'^Group (\d+):$', re.MULTILINE)
+MAX_FILES_PATTERN = re.compile(r'no more than (\d+) files')
+
+class FakeProvider(Provider):
+    """Deterministic in-process backend for tests, benchmarks and offline
+    runs: answers every prompt the tool sends with a well-formed response
+    derived from the prompt alone, after an optional fixed latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: float) -> str:
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return respond(messages[0]['content'], messages[-1]['content'])
+
+    async def acomplete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: float) -> str:
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return respond(messages[0]['content'], messages[-1]['content'])
+
+def _fake_groups(prompt: str) -> List[List[str]]:
+    # Consecutive files of one directory, split at the prompt's file limit
+    match = MAX_FILES_PATTERN.search(prompt)
+    max_files = int(match.group(1)) if match else 5
+    groups = []
+    for change_id in FILE_LINE_PATTERN.findall(prompt):
+        directory = change_id.rsplit('/', 1)[0] if '/' in change_id else ''
+        last = groups[-1] if groups else None
+        if last and len(last[1]) < max_files and last[0] == directory:
+            last[1].append(change_id)
+        else:
+            groups.append((directory, [change_id]))
+    return [files for _, files in groups]
+
+def _fake_subject(files: List[str]) -> str:
+    directory = files[0].rsplit('/', 1)[0] if '/' in files[0] else 'the repository root'
+    noun = "file" if len(files) == 1 else "files"
+    return f"update {len(files)} {noun} in {directory}"
+
+def respond(system_prompt: str, prompt: str) -> str:
+    """The fake provider's answer to one prompt, keyed on what kind of
+    request it is."""
+    if 'merges related groups' in system_prompt:
+        return json.dumps([])
+    if '"commits"' in prompt:
+        return json.dumps({'commits': [{'files': files, 'type': 'chore', 'subject': _fake_subject(files), 'body': ''}
+                                       for files in _fake_groups(prompt)]})
+    if 'groups Git changes' in system_prompt:
+        return json.dumps(_fake_groups(prompt))
+    group_ids = GROUP_HEADER_PATTERN.findall(prompt)
+    if group_ids:
+        sections = re.split(GROUP_HEADER_PATTERN, prompt)[1:]
+        return json.dumps([{'group_id': int(group_id), 'type': 'chore', 'subject': _fake_subject(FILE_LINE_PATTERN.findall(section) or ['changes']),
+                            'body': ''} for group_id, section in zip(sections[::2], sections[1::2])])
+    files = FILE_LINE_PATTERN.findall(prompt) or ['changes']
+    return json.dumps({'type': 'chore', 'subject': _fake_subject(files)})
+
+def create_provider(provider_config: Dict) -> Provider:
+    """Build the backend named by ai_provider.name."""
+    name = provider_config.get('name', DEFAULT_PROVIDER)
+    pool_size = provider_config.get('pool_size', 10)
+    timeout = provider_config.get('timeout', 60.0)
+    if name == 'openai':
+        return OpenAIProvider(provider_config.get('api_key', ''), provider_config.get('base_url'), pool_size, timeout)
+    if name == 'openai-compatible':
+        if not provider_config.get('base_url'):
+            raise ValueError("ai_provider.base_url is required for the openai-compatible provider")
+        # Local servers usually ignore the key, but the SDK insists on one
+        return OpenAIProvider(provider_config.get('api_key') or 'not-needed', provider_config['base_url'], pool_size, timeout)
+    if name == 'fake':
+        return FakeProvider(provider_config.get('latency', 0.0))
+    raise ValueError(f"Unknown AI provider: {name}. Options: openai, openai-compatible, fake")
@@ -0,0 +1,246 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class DeadlineExceededError(RuntimeError):
+    pass
+
+class RetryPolicy:
+    def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter keeps concurrent clients from retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """Token bucket over requests and tokens per minute. reserve() books
+    capacity up front and returns how long the caller must wait for it, so
+    the same limiter serves sync and async callers."""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, clock: Callable[[], float] = time.monotonic):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._updated = clock()
+        self._request_allowance = requests_per_minute
+        self._token_allowance = tokens_per_minute
+
+    def reserve(self, tokens: int = 0) -> float:
+        with self._lock:
+            now = self.clock()
+            elapsed = now - self._updated
+            self._updated = now
+            wait = 0.0
+            if self.requests_per_minute:
+                rate = self.requests_per_minute / 60
+                self._request_allowance = min(self.requests_per_minute, self._request_allowance + elapsed * rate) - 1
+                if self._request_allowance < 0:
+                    wait = max(wait, -self._request_allowance / rate)
+            if self.tokens_per_minute:
+                rate = self.tokens_per_minute / 60
+                self._token_allowance = min(self.tokens_per_minute, self._token_allowance + elapsed * rate) - tokens
+                if self._token_allowance < 0:
+                    wait = max(wait, -self._token_allowance / rate)
+            return wait
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+
+    def before_call(self):
+        with self._lock:
+            now = self.clock()
+            if self._probe_started is not None:
+                # One probe at a time; a probe that never reports back expires
+                if now - self._probe_started < self.reset_timeout:
+                    raise CircuitOpenError("Waiting for a probe request to the AI API; not sending more requests for now.")
+            elif self._opened_at is None:
+                return
+            elif now - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("Too many consecutive AI API failures; not sending more requests for now.")
+            # Half-open: let only this request through, as a probe
+            self._opened_at = None
+            self._failures = self.failure_threshold - 1
+            self._probe_started = now
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self.failure_threshold and self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+
+    def release(self):
+        # The call ended without saying anything about the service's health
+        with self._lock:
+            self._probe_started = None
+
+class ResilienceMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens = 0
+        self.retries = 0
+        self.failures = 0
+        self.backoff_seconds = 0.0
+        self.throttle_seconds = 0.0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'tokens': self.tokens,
+                'retries': self.retries,
+                'failures': self.failures,
+                'backoff_seconds': round(self.backoff_seconds, 3),
+                'throttle_seconds': round(self.throttle_seconds, 3),
+            }
+
+class ResilientCaller:
+    """Runs a request with retries, a client-side rate limit, an overall
+    deadline and a circuit breaker. The wrapped callable receives the time
+    left before the deadline so it can pass it on as its own timeout."""
+
+    def __init__(self, policy: RetryPolicy, retryable: Callable[[Exception], bool], rate_limiter: Optional[RateLimiter] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None, deadline: Optional[float] = None,
+                 metrics: Optional[ResilienceMetrics] = None, clock: Callable[[], float] = time.monotonic):
+        self.policy = policy
+        self.retryable = retryable
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.deadline = deadline
+        self.metrics = metrics or ResilienceMetrics()
+        self.clock = clock
+
+    def _remaining(self, started: float) -> Optional[float]:
+        if not self.deadline:
+            return None
+        remaining = self.deadline - (self.clock() - started)
+        if remaining <= 0:
+            raise DeadlineExceededError(f"AI request did not complete within {self.deadline} seconds.")
+        return remaining
+
+    def _throttle(self, tokens: int) -> float:
+        delay = self.rate_limiter.reserve(tokens) if self.rate_limiter else 0.0
+        self.metrics.add(tokens=tokens, throttle_seconds=delay)
+        return delay
+
+    def _before_attempt(self, started: float) -> Optional[float]:
+        if self.circuit_breaker:
+            self.circuit_breaker.before_call()
+        self.metrics.add(requests=1)
+        return self._remaining(started)
+
+    def _after_failure(self, error: Exception, attempt: int, started: float) -> float:
+        self.metrics.add(failures=1)
+        if not self.retryable(error):
+            if self.circuit_breaker:
+                self.circuit_breaker.release()
+            raise error
+        # Only transient failures say anything about the health of the service
+        if self.circuit_breaker:
+            self.circuit_breaker.record_failure()
+        if attempt >= self.policy.max_retries:
+            raise error
+        delay = self.policy.backoff(attempt)
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = retry_after + delay / 4
+        remaining = self._remaining(started)
+        if remaining is not None and delay >= remaining:
+            raise DeadlineExceededError(f"AI request would exceed its {self.deadline} second deadline while retrying.") from error
+        logging.warning(f"AI request failed ({error.__class__.__name__}). Retrying in {delay:.1f} seconds...")
+        self.metrics.add(retries=1, backoff_seconds=delay)
+        return delay
+
+    def _after_success(self):
+        if self.circuit_breaker:
+            self.circuit_breaker.record_success()
+
+    def call(self, func: Callable[[Optional[float]], T], tokens: int = 0, sleep: Callable[[float], None] = time.sleep) -> T:
+        started = self.clock()
+        delay = self._throttle(tokens)
+        if delay:
+            sleep(delay)
+        attempt = 0
+        while True:
+            timeout = self._before_attempt(started)
+            try:
+                result = func(timeout)
+            except Exception as e:
+                sleep(self._after_failure(e, attempt, started))
+                attempt += 1
+                continue
+            self._after_success()
+            return result
+
+    async def acall(self, func: Callable[[Optional[float]], Awaitable[T]], tokens: int = 0,
+                    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep) -> T:
+        started = self.clock()
+        delay = self._throttle(tokens)
+        if delay:
+            await sleep(delay)
+        attempt = 0
+        while True:
+            timeout = self._before_attempt(started)
+            try:
+                result = await func(timeout)
+            except Exception as e:
+                await sleep(self._after_failure(e, attempt, started))
+                attempt += 1
+                continue
+            self._after_success()
+            return result
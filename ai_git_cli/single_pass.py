@@ -0,0 +1,81 @@
+from typing import List, Dict, Optional, Set
+import json
+import logging
+from ai_git_cli.ai_client import get_ai_client
+from ai_git_cli.changes import Change, ChangeSet
+from ai_git_cli.commit_message import format_commit_message, generate_commit_message, make_commit, strip_code_fence
+from ai_git_cli.grouping import group_changes
+from ai_git_cli.prompts import create_single_pass_prompt
+from ai_git_cli.tracing import span
+
+SYSTEM_PROMPT = "You are a helpful assistant that groups Git changes into logical commits and writes their commit messages in JSON format."
+
+def validate_commit_plan(data, paths: Set[str], max_files: int) -> List[Dict]:
+    """Check a single-pass response against the expected schema:
+    {"commits": [{"files": [str], "type": str, "subject": str, "body": str}]}"""
+    if not isinstance(data, dict) or not isinstance(data.get('commits'), list):
+        raise ValueError("Response must be an object with a 'commits' list")
+
+    commits, seen = [], set()
+    for index, entry in enumerate(data['commits'], 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Commit {index} is not an object")
+        files = entry.get('files')
+        if not isinstance(files, list) or not files or not all(isinstance(path, str) for path in files):
+            raise ValueError(f"Commit {index} must list its files")
+        unknown = [path for path in files if path not in paths]
+        if unknown:
+            raise ValueError(f"Commit {index} references unknown files: {unknown}")
+        duplicated = [path for path in files if path in seen]
+        if duplicated or len(set(files)) != len(files):
+            raise ValueError(f"Commit {index} repeats files from another commit")
+        if len(files) > max_files:
+            raise ValueError(f"Commit {index} has more than {max_files} files")
+        if not isinstance(entry.get('type'), str) or not isinstance(entry.get('subject'), str) or not entry['subject'].strip():
+            raise ValueError(f"Commit {index} needs a 'type' and 'subject'")
+        if not isinstance(entry.get('body', ''), str):
+            raise ValueError(f"Commit {index} has a non-string 'body'")
+        seen.update(files)
+        commits.append({'message': format_commit_message(entry), 'files': files})
+    return commits
+
+def group_and_generate(changes: List[Change], config: Dict) -> Optional[List[Dict]]:
+    """Group changes and write their messages in one request.
+
+    Returns None when the response does not match the schema so the caller
+    can fall back to the two-phase path. Files the model leaves out are
+    grouped and described through the two-phase path."""
+    ai_client = get_ai_client(config)
+    temperature = config['commit_style'].get('temperature', 0.7)
+    user_feedback = config['custom_instructions'].get('user_feedback', "")
+    grouping = config['grouping']
+
+    prompt = create_single_pass_prompt(changes, user_feedback, grouping, config['commit_style'], config.get('advanced', {}).get('token_limit', 4000))
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    changes = ChangeSet(changes)
+    try:
+        response = ai_client.get_response(messages, temperature=temperature)
+        with span('parse.response', kind='single_pass', bytes=len(response)):
+            plan = validate_commit_plan(
+                json.loads(strip_code_fence(response)),
+                set(changes.ids()),
+                grouping.get('max_files_per_commit', 5)
+            )
+    except (json.JSONDecodeError, ValueError) as e:
+        logging.warning(f"Single-pass response rejected, falling back to two phases: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Single-pass request failed, falling back to two phases: {e}")
+        return None
+
+    # The model answers in change ids, which are file paths or "path#hunk"
+    commit_messages = [make_commit(commit['message'], [changes.get(i) for i in commit['files']]) for commit in plan]
+    covered = {i for commit in plan for i in commit['files']}
+    leftover = [change for change in changes if change.id not in covered]
+    if leftover:
+        logging.info(f"Single-pass response left out {len(leftover)} files, grouping them separately")
+        commit_messages += generate_commit_message(group_changes(leftover, config), config)
+    return commit_messages
@@ -0,0 +1,48 @@
+import re
+from functools import lru_cache
+
+# Rough token accounting shared by the diff and prompt builders. OpenAI
+# tokenizers average about four characters per token on source code.
+CHARS_PER_TOKEN = 4
+
+# Splits text roughly the way the GPT tokenizers pre-tokenize it: words with
+# their leading space, short digit runs, punctuation runs and whitespace
+TOKEN_PATTERN = re.compile(r"'(?:s|t|re|ve|m|ll|d)\b| ?[A-Za-z]+| ?[0-9]{1,3}| ?[^\sA-Za-z0-9]+|\s+")
+# Long words and identifiers are split into several tokens of about this size
+LETTERS_PER_TOKEN = 6
+# Runs of punctuation merge less often than letters
+SYMBOLS_PER_TOKEN = 2
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def tokens_to_chars(tokens: int) -> int:
+    return tokens * CHARS_PER_TOKEN
+
+@lru_cache(maxsize=None)
+def _encoding():
+    # tiktoken is optional; its vocabulary is downloaded on first use, so an
+    # offline machine without a cached copy falls back to the estimator
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('o200k_base')
+    except Exception:
+        return None
+
+def _estimate_piece(piece: str) -> int:
+    body = piece.lstrip(' ') or piece
+    if body[0].isalpha():
+        return (len(body) + LETTERS_PER_TOKEN - 1) // LETTERS_PER_TOKEN
+    if body[0].isspace() or body[0].isdigit():
+        return 1
+    return (len(body) + SYMBOLS_PER_TOKEN - 1) // SYMBOLS_PER_TOKEN
+
+def count_tokens(text: str) -> int:
+    """Token count of text for prompt budgeting: exact with tiktoken
+    installed, otherwise estimated from the tokenizer's word splitting,
+    which tracks real counts much closer than a flat characters-per-token
+    ratio on code and paths."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(_estimate_piece(piece) for piece in TOKEN_PATTERN.findall(text))
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Kept free of third-party imports: main.py loads this on every run, and
+# with --profile off a span is one global lookup.
+
+class Span:
+    __slots__ = ('name', 'start', 'duration', 'thread', 'attributes')
+
+    def __init__(self, name: str, start: float, thread: int, attributes: Dict):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.thread = thread
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'start': round(self.start, 6), 'duration': round(self.duration, 6),
+                'thread': self.thread, **self.attributes}
+
+class _NullSpan:
+    """Stands in for a span while tracing is off so callers can always set attributes."""
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """Collects finished spans from every thread of one run."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        current = Span(name, time.perf_counter() - self.origin, threading.get_ident(), attributes)
+        try:
+            yield current
+        except BaseException as e:
+            current.set(error=e.__class__.__name__)
+            raise
+        finally:
+            current.duration = time.perf_counter() - self.origin - current.start
+            with self._lock:
+                self.spans.append(current)
+
+    def finished(self) -> List[Span]:
+        with self._lock:
+            return sorted(self.spans, key=lambda span: span.start)
+
+    def write_jsonl(self, path: str):
+        with open(path, 'w') as f:
+            for span in self.finished():
+                f.write(json.dumps(span.to_dict()) + "\n")
+
+    def write_chrome_trace(self, path: str):
+        """Chrome trace event format, for chrome://tracing or ui.perfetto.dev."""
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for span in self.finished():
+            # Small stable thread ids read better than OS thread idents
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({'name': span.name, 'cat': span.name.split('.', 1)[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': round(span.start * 1e6, 1), 'dur': round(span.duration * 1e6, 1), 'args': span.attributes})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def write(self, path: str):
+        # .json gets the Chrome trace format, anything else JSON lines
+        if path.endswith('.json'):
+            self.write_chrome_trace(path)
+        else:
+            self.write_jsonl(path)
+
+    def summary(self) -> List[Dict]:
+        """Per span name: calls, total/mean/max seconds and summed numeric
+        attributes such as tokens, retries and bytes, slowest first."""
+        rows = {}
+        for span in self.finished():
+            row = rows.setdefault(span.name, {'name': span.name, 'calls': 0, 'total': 0.0, 'max': 0.0, 'counters': {}})
+            row['calls'] += 1
+            row['total'] += span.duration
+            row['max'] = max(row['max'], span.duration)
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    row['counters'][key] = row['counters'].get(key, 0) + value
+        for row in rows.values():
+            row['mean'] = row['total'] / row['calls']
+        return sorted(rows.values(), key=lambda row: -row['total'])
+
+_tracer: Optional[Tracer] = None
+
+def start_tracing() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+def stop_tracing() -> Optional[Tracer]:
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+def span(name: str, **attributes):
+    """Time a block as a named span while tracing is on; a no-op otherwise.
+    The span is yielded so counts known only afterwards can be attached."""
+    tracer = _tracer
+    if tracer is None:
+        return _null_span()
+    return tracer.span(name, **attributes)
+
+@contextmanager
+def _null_span() -> Iterator[_NullSpan]:
+    yield NULL_SPAN
@@ -4,13 +4,23 @@ import time
 from openai import OpenAI
 from termcolor import colored
 from prompt_toolkit import prompt
+from prompt_toolkit.patch_stdout import patch_stdout
 from prompt_toolkit.styles import Style
-from prompt_toolkit.completion import WordCompleter
+from prompt_toolkit.completion import Completer, Completion
 from rich import print as rprint
 from rich.markdown import Markdown
 from rich.console import Console
+import codecs
 import difflib
+import hashlib
+import mmap
 import re
+import subprocess
+from bisect import bisect_left
+from itertools import islice
+import threading
+from stat import S_ISREG
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 MODEL = "o1-mini"
@@ -94,39 +104,386 @@ Your review should be detailed but concise, focusing on the most important aspec
 
 # Add this near the top of the file, with other global variables
 last_ai_response = None
-conversation_history = []
+# Earlier turns kept for context, as user/assistant message pairs
+MAX_HISTORY_MESSAGES = 20
+
+class ConversationState:
+    """Chat state laid out for prompt-prefix caching.
+
+    Added files come first in a fixed order (by content hash), then earlier
+    turns as separate messages, then the new request. Only the tail changes
+    from one turn to the next, so the provider can reuse the cached prefix,
+    and file contents are sent once per request instead of being repeated
+    inside every history entry."""
+
+    def __init__(self, max_history=MAX_HISTORY_MESSAGES):
+        self.max_history = max_history
+        self.history = []
+        self.turns = []
+        self._context_key = None
+        self._context_message = None
+
+    def reset(self):
+        self.history = []
+        self.turns = []
+        self._context_key = None
+        self._context_message = None
+
+    def context_message(self, added_files):
+        if not added_files:
+            return None
+        entries = sorted(
+            (file_digest(file_path, content), file_path, content)
+            for file_path, content in added_files.items()
+        )
+        key = tuple((digest, file_path) for digest, file_path, _ in entries)
+        # Rebuild the block only when a file was added, removed or changed
+        if key != self._context_key:
+            file_context = "Added files:\n"
+            for _, file_path, content in entries:
+                file_context += f"File: {file_path}\nContent:\n{content}\n\n"
+            self._context_key = key
+            self._context_message = {"role": "user", "content": file_context}
+        return self._context_message
+
+    def build_messages(self, user_message, added_files=None, include_history=True):
+        messages = []
+        context = self.context_message(added_files)
+        if context:
+            messages.append(context)
+        if include_history:
+            messages.extend(self.history)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def record_turn(self, user_message, response):
+        self.history.append({"role": "user", "content": user_message})
+        self.history.append({"role": "assistant", "content": response})
+        if len(self.history) > self.max_history:
+            # Drop the older half at once rather than one turn per request,
+            # so the cached prefix survives most turns
+            self.history = self.history[-(self.max_history // 2):]
+
+    def record_usage(self, messages, usage):
+        details = getattr(usage, 'prompt_tokens_details', None)
+        turn = {
+            'sent_chars': sum(len(message['content']) for message in messages),
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'cached_tokens': getattr(details, 'cached_tokens', 0) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        }
+        self.turns.append(turn)
+        return turn
+
+    def total_tokens(self):
+        return sum(turn['prompt_tokens'] + turn['completion_tokens'] for turn in self.turns)
+
+conversation = ConversationState()
+# Built when the prompt starts; see FileIndex
+file_index = None
 
 PLANNING_PROMPT = """You are an AI planning assistant. Your task is to create a detailed plan based on the user's request. Consider all aspects of the task, break it down into steps, and provide a comprehensive strategy for accomplishment. Your plan should be clear, actionable, and thorough."""
 
-def is_binary_file(file_path):
-    """Check if a file is binary."""
+# Bytes read to decide whether a file is binary
+BINARY_SNIFF_BYTES = 8192
+# Files larger than this are rejected from their size alone, before any read
+MAX_CONTEXT_FILE_BYTES = 2 * 1024 * 1024
+# Text files from this size on are mapped instead of read into a buffer
+MMAP_THRESHOLD = 256 * 1024
+
+# path -> ((size, mtime_ns, inode), sha256) for files added to the context
+file_digests = {}
+
+def looks_binary(prefix):
+    if b'\0' in prefix:
+        return True
     try:
-        with open(file_path, 'r') as check_file:
-            check_file.read()
-        return False
+        # Incremental so a multi-byte character cut off at the end is fine
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
     except UnicodeDecodeError:
         return True
+    return False
+
+def file_digest(file_path, content):
+    entry = file_digests.get(file_path)
+    if entry is not None:
+        return entry[1]
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def _read_text(file, size):
+    """Digest and decode a file with one pass over its bytes. Raises
+    UnicodeDecodeError for binary content."""
+    if size >= MMAP_THRESHOLD:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if looks_binary(data[:BINARY_SNIFF_BYTES]):
+                raise UnicodeDecodeError('utf-8', b'', 0, 1, 'binary content')
+            digest = hashlib.sha256(data).hexdigest()
+            text = codecs.decode(data, 'utf-8')
+    else:
+        data = file.read()
+        if looks_binary(data[:BINARY_SNIFF_BYTES]):
+            raise UnicodeDecodeError('utf-8', b'', 0, 1, 'binary content')
+        digest = hashlib.sha256(data).hexdigest()
+        text = data.decode('utf-8')
+    # Same newlines as reading in text mode
+    return text.replace('\r\n', '\n').replace('\r', '\n'), digest
 
 def add_file_to_context(file_path, added_files):
-    if not os.path.isfile(file_path):
+    try:
+        info = os.stat(file_path)
+    except OSError:
+        info = None
+    if info is None or not S_ISREG(info.st_mode):
         print(colored(f"Error: {file_path} is not a valid file.", "red"))
         logging.error(f"{file_path} is not a valid file.")
         return
 
-    if is_binary_file(file_path):
-        print(colored(f"Error: {file_path} appears to be a binary file and cannot be added.", "red"))
-        logging.error(f"{file_path} is a binary file and cannot be added.")
+    if info.st_size > MAX_CONTEXT_FILE_BYTES:
+        print(colored(f"Error: {file_path} is {info.st_size // 1024} KB, over the {MAX_CONTEXT_FILE_BYTES // 1024} KB limit for added files.", "red"))
+        logging.error(f"{file_path} is too large to add ({info.st_size} bytes).")
+        return
+
+    # Re-adding a file that has not changed since it was read costs nothing
+    stat_key = (info.st_size, info.st_mtime_ns, info.st_ino)
+    if file_path in added_files and file_digests.get(file_path, (None,))[0] == stat_key:
+        print(colored(f"{file_path} is already in the chat context and unchanged.", "green"))
         return
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            added_files[file_path] = content
-            print(colored(f"Added {file_path} to the chat context.", "green"))
-            logging.info(f"Added {file_path} to the chat context.")
+        with open(file_path, 'rb') as file:
+            content, digest = _read_text(file, info.st_size)
+    except UnicodeDecodeError:
+        print(colored(f"Error: {file_path} appears to be a binary file and cannot be added.", "red"))
+        logging.error(f"{file_path} is a binary file and cannot be added.")
+        return
     except Exception as e:
         print(colored(f"Error reading file {file_path}: {e}", "red"))
         logging.error(f"Error reading file {file_path}: {e}")
+        return
+
+    unchanged = file_path in added_files and file_digests.get(file_path, (None, None))[1] == digest
+    file_digests[file_path] = (stat_key, digest)
+    added_files[file_path] = content
+    if unchanged:
+        print(colored(f"{file_path} is already in the chat context and unchanged.", "green"))
+    else:
+        print(colored(f"Added {file_path} to the chat context.", "green"))
+        logging.info(f"Added {file_path} to the chat context ({info.st_size} bytes, sha256 {digest[:12]}).")
+
+COMMANDS = ['/edit', '/create', '/add', '/quit', '/debug', '/reset', '/review', '/planning']
+# Seconds before the file index checks the repository again
+FILE_INDEX_TTL = 5.0
+MAX_COMPLETIONS = 50
+GLOB_CHARS = re.compile(r'[*?\[]')
+
+class FileIndex:
+    """Paths in the working tree for completion and globbing: tracked and
+    untracked files from git, which honours .gitignore, or a directory walk
+    outside a repository. Files created here are added as they are written,
+    and a stale index is refreshed in the background so completion never
+    waits on git."""
+
+    def __init__(self, root='.'):
+        self.root = root
+        self.paths = []
+        self.lowered = []
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._checked_at = 0.0
+        self.refresh()
+
+    def _list_files(self):
+        try:
+            result = subprocess.run(['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                                    cwd=self.root, capture_output=True, check=True)
+            return [path for path in result.stdout.decode('utf-8', errors='surrogateescape').split('\0') if path]
+        except (OSError, subprocess.CalledProcessError):
+            pass
+        paths = []
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            relative = os.path.relpath(directory, self.root)
+            for name in filenames:
+                paths.append(name if relative == '.' else os.path.join(relative, name))
+        return paths
+
+    def refresh(self):
+        paths = sorted(set(self._list_files()))
+        with self._lock:
+            # Swap whole lists so readers never see them half built
+            self.paths, self.lowered = paths, [path.lower() for path in paths]
+            self._checked_at = time.monotonic()
+            self._refreshing = False
+        logging.info(f"Indexed {len(paths)} files for completion.")
+
+    def refresh_if_stale(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._checked_at < FILE_INDEX_TTL:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.warning(f"File index refresh failed: {e}")
+            with self._lock:
+                self._refreshing = False
+                self._checked_at = time.monotonic()
+
+    def add(self, path):
+        path = os.path.normpath(path)
+        with self._lock:
+            position = bisect_left(self.paths, path)
+            if position == len(self.paths) or self.paths[position] != path:
+                self.paths, self.lowered = (self.paths[:position] + [path] + self.paths[position:],
+                                            self.lowered[:position] + [path.lower()] + self.lowered[position:])
+
+    def snapshot(self):
+        with self._lock:
+            return self.paths, self.lowered
+
+    def glob(self, pattern):
+        """Indexed paths matching a shell pattern where * and ? stay within
+        one directory and ** spans any number of them."""
+        regex = glob_to_regex(pattern)
+        return [path for path in self.paths if regex.match(path)]
+
+def glob_to_regex(pattern):
+    """Translate a shell pattern: [...] and [!...] are character classes,
+    and a backslash makes the next character literal, so '\\*.py' or
+    '[*].py' name a file called '*.py'."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif char == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif char == '?':
+            parts.append('[^/]')
+            i += 1
+        elif char == '\\' and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        elif char == '[':
+            negate = pattern[i + 1:i + 2] in ('!', '^')
+            body_start = i + 1 + negate
+            # A ']' right after the opening bracket is part of the class
+            end = pattern.find(']', body_start + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+                i += 1
+                continue
+            body = ''.join('\\' + c if c in '\\[]^&~|' else c for c in pattern[body_start:end])
+            parts.append('[^/' + body + ']' if negate else '[' + body + ']')
+            i = end + 1
+        else:
+            parts.append(re.escape(char))
+            i += 1
+    return re.compile(''.join(parts) + r'\Z')
+
+def expand_paths(args, file_index):
+    """Expand glob patterns in /add, /edit and /review arguments against the
+    file index, so ignored files stay out. Plain paths pass through."""
+    paths = []
+    for arg in args:
+        if not GLOB_CHARS.search(arg):
+            paths.append(arg)
+            continue
+        matches = file_index.glob(os.path.normpath(arg))
+        if not matches:
+            print(colored(f"No files match {arg}.", "red"))
+            logging.warning(f"No files match {arg}.")
+        paths.extend(matches)
+    # Keep the first mention of each path
+    return list(dict.fromkeys(paths))
+
+class FuzzyPathCompleter(Completer):
+    """Completes commands at the start of the line and indexed paths
+    everywhere else, matching the typed characters in order anywhere in
+    the path. Each keystroke only filters the previous matches when the
+    query grew, and scattered matches are only searched for when closer
+    ones run out, so large repositories stay responsive."""
+
+    def __init__(self, file_index, commands):
+        self.file_index = file_index
+        self.commands = commands
+        # (index list, positions shortest path first) for the current index
+        self._order = (None, [])
+        # (query, index list, substring matches, scattered matches or None)
+        # from the last keystroke
+        self._cache = (None, None, [], None)
+
+    def _by_length(self, paths, lowered):
+        if self._order[0] is not paths:
+            self._order = (paths, sorted(range(len(lowered)), key=lambda i: len(lowered[i])))
+        return self._order[1]
+
+    def _matches(self, query):
+        paths, lowered = self.file_index.snapshot()
+        order = self._by_length(paths, lowered)
+        last_query, last_paths, last_matches, last_scattered = self._cache
+        # Typing extends the query, and a path matching it matched the
+        # shorter query too, so only the previous matches need checking
+        narrowing = last_paths is paths and last_query is not None and query.startswith(last_query)
+        if narrowing:
+            matches = [i for i in last_matches if query in lowered[i]]
+        else:
+            matches = [i for i in order if query in lowered[i]]
+        scattered = None
+        if narrowing and last_scattered is not None:
+            scattered = self._scattered(query, lowered, last_scattered)
+
+        # Best first: path prefix, then in the file name, then anywhere in
+        # the path. Matches are kept shortest first, so each tier stops as
+        # soon as the list is full
+        results = list(islice((i for i in matches if lowered[i].startswith(query)), MAX_COMPLETIONS))
+        if len(results) < MAX_COMPLETIONS:
+            chosen = set(results)
+            # In the file name when its last occurrence starts after the last '/'
+            results += islice((i for i in matches if i not in chosen and lowered[i].rfind(query) > lowered[i].rfind('/')),
+                              MAX_COMPLETIONS - len(results))
+        if len(results) < MAX_COMPLETIONS:
+            chosen = set(results)
+            results += islice((i for i in matches if i not in chosen), MAX_COMPLETIONS - len(results))
+        if len(results) < MAX_COMPLETIONS:
+            # Characters scattered through the path are the slowest to find,
+            # so only look once the closer matches run out
+            if scattered is None:
+                scattered = self._scattered(query, lowered, order)
+            chosen = set(matches)
+            results += islice((i for i in scattered if i not in chosen), MAX_COMPLETIONS - len(results))
+        self._cache = (query, paths, matches, scattered)
+        return [paths[i] for i in results]
+
+    @staticmethod
+    def _scattered(query, lowered, candidates):
+        # "a[^b]*b[^c]*c" finds the characters in order without backtracking
+        pattern = re.escape(query[0]) + ''.join(f'[^{re.escape(c)}]*{re.escape(c)}' for c in query[1:])
+        search = re.compile(pattern).search
+        return [i for i in candidates if search(lowered[i])]
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        word = document.get_word_before_cursor(WORD=True)
+        if word.startswith('/') and not text[:len(text) - len(word)].strip():
+            for command in self.commands:
+                if command.startswith(word.lower()):
+                    yield Completion(command, start_position=-len(word))
+            return
+        if not word:
+            return
+        self.file_index.refresh_if_stale()
+        for path in self._matches(word.lower()):
+            yield Completion(path, start_position=-len(word))
 
 # Keep the new edit instruction prompts
 EDIT_INSTRUCTION_PROMPT = """You are an advanced ai engineer designed to analyze files and provide edit instructions based on user requests. Your task is to:
@@ -163,48 +520,181 @@ APPLY_EDITS_PROMPT = """You are an advanced ai engineer designed to apply edit i
 
 Your response must contain only the complete, updated content of the file. Do not include any explanations or additional text."""
 
+SEARCH_REPLACE_PROMPT = """You are an advanced ai engineer designed to apply edit instructions to files. Your task is to:
+
+1. Understand the Edit Instructions: Carefully interpret the provided edit instructions.
+2. Return Only the Changes: Express every change as a search/replace block instead of rewriting the file.
+
+Each block must look exactly like this:
+
+<<<<<<< SEARCH
+[lines copied exactly from the original file, including indentation]
+=======
+[the lines that replace them]
+>>>>>>> REPLACE
+
+Include just enough lines in SEARCH to identify the location uniquely, usually the changed lines plus one or two lines around them. Use several small blocks for changes in different places, in file order. To delete lines, leave the replacement empty. To add lines at the end of the file, leave SEARCH empty. Do not include any explanations, additional text, or code block markers."""
+
+SEARCH_REPLACE_BLOCK = re.compile(r'^<{7} SEARCH\n(.*?)^={7}\n(.*?)^>{7} REPLACE$', re.DOTALL | re.MULTILINE)
+# How closely a SEARCH text that is not in the file must match the lines it
+# is anchored to (difflib ratio)
+FUZZY_MATCH_THRESHOLD = 0.85
+
+def parse_search_replace_blocks(response):
+    text = response.replace('\r\n', '\n')
+    blocks = [(search, replace) for search, replace in SEARCH_REPLACE_BLOCK.findall(text)]
+    if not blocks:
+        raise ValueError("No search/replace blocks found in the AI response.")
+    if text.count('<<<<<<< SEARCH') != len(blocks):
+        raise ValueError("Malformed search/replace block in the AI response.")
+    return blocks
+
+def _pick(matches, start, search_lines):
+    # Blocks come in file order, so a repeated text is taken to mean the
+    # first occurrence after the previous block
+    if len(matches) > 1:
+        after = [i for i in matches if i >= start]
+        if not after:
+            raise ValueError(f"SEARCH text matches {len(matches)} places:\n" + "\n".join(search_lines[:3]))
+        return after[0]
+    return matches[0] if matches else None
+
+def _find_block(lines, search_lines, start=0):
+    """Line index where search_lines occur in lines: exact first, then
+    ignoring surrounding whitespace, then the most similar window above
+    FUZZY_MATCH_THRESHOLD. Raises ValueError if there is none."""
+    size = len(search_lines)
+    windows = range(len(lines) - size + 1)
+    index = _pick([i for i in windows if lines[i:i + size] == search_lines], start, search_lines)
+    if index is not None:
+        return index
+
+    stripped = [line.strip() for line in lines]
+    search_stripped = [line.strip() for line in search_lines]
+    index = _pick([i for i in windows if stripped[i:i + size] == search_stripped], start, search_lines)
+    if index is not None:
+        return index
+
+    # Fuzzy anchoring for SEARCH text the model copied slightly wrong
+    best, best_ratio = None, FUZZY_MATCH_THRESHOLD
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2("\n".join(search_stripped))
+    for i in windows:
+        matcher.set_seq1("\n".join(stripped[i:i + size]))
+        # Cheap upper bounds first; full ratio only for promising windows
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio:
+            best, best_ratio = i, ratio
+    if best is None:
+        raise ValueError("SEARCH text not found in the file:\n" + "\n".join(search_lines[:3]))
+    logging.info(f"Anchored SEARCH text at line {best + 1} with similarity {best_ratio:.2f}")
+    return best
+
+def apply_search_replace_blocks(content, blocks):
+    """Apply the blocks in order and return the new content. Raises
+    ValueError if any block cannot be placed, leaving nothing half applied."""
+    lines = content.split('\n')
+    start = 0
+    for search, replace in blocks:
+        search_lines = search.split('\n')[:-1]
+        replace_lines = replace.split('\n')[:-1]
+        if not search_lines:
+            # Empty SEARCH appends, before the final newline if there is one
+            end = len(lines) - 1 if lines and lines[-1] == '' else len(lines)
+            lines[end:end] = replace_lines
+            start = end + len(replace_lines)
+            continue
+        index = _find_block(lines, search_lines, start)
+        lines[index:index + len(search_lines)] = replace_lines
+        start = index + len(replace_lines)
+    return '\n'.join(lines)
+
+# Files rewritten at the same time after edit instructions are accepted
+MAX_EDIT_WORKERS = 4
+
+def apply_edits_to_file(file_path, content, instructions):
+    """Ask for search/replace blocks, so output scales with the size of the
+    change, and fall back to a full rewrite if they cannot be applied."""
+    request = f"Original File: {file_path}\nContent:\n{content}\n\nEdit Instructions:\n{instructions}\n\nSearch/replace blocks:"
+    response = chat_with_ai(request, is_edit_request=True, instructions=SEARCH_REPLACE_PROMPT)
+    if response:
+        try:
+            return apply_search_replace_blocks(content, parse_search_replace_blocks(response))
+        except ValueError as e:
+            print(colored(f"Could not apply the edit blocks for {file_path}, requesting the full file: {e}", "yellow"))
+            logging.warning(f"Search/replace edit of {file_path} failed, falling back to a full rewrite: {e}")
+
+    request = f"Original File: {file_path}\nContent:\n{content}\n\nEdit Instructions:\n{instructions}\n\nUpdated File Content:"
+    response = chat_with_ai(request, is_edit_request=True, instructions=APPLY_EDITS_PROMPT)
+    return response.strip() if response else None
+
+def iter_edited_files(edit_instructions, original_files, max_workers=MAX_EDIT_WORKERS):
+    """Rewrite the files concurrently and yield (file_path, new_content) as
+    each one finishes, so the first result can be reviewed while the rest
+    are still being generated. new_content is None for a file that failed."""
+    pending = {file_path: content for file_path, content in original_files.items() if file_path in edit_instructions}
+    for file_path, content in original_files.items():
+        if file_path not in pending:
+            yield file_path, content  # No changes for this file
+    if not pending:
+        return
+
+    workers = max(1, min(max_workers, len(pending)))
+    print(colored(f"Applying edits to {len(pending)} files with {workers} workers...", "magenta"))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {}
+    try:
+        futures = {
+            executor.submit(apply_edits_to_file, file_path, content, edit_instructions[file_path]): file_path
+            for file_path, content in pending.items()
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            file_path = futures[future]
+            # One file's failure must not stop the others
+            try:
+                new_content = future.result()
+            except Exception as e:
+                logging.error(f"Error applying edits to {file_path}: {e}")
+                new_content = None
+            if new_content is None:
+                print(colored(f"[{done}/{len(futures)}] Could not generate edits for {file_path}.", "red"))
+            else:
+                print(colored(f"[{done}/{len(futures)}] Edits ready for {file_path}.", "cyan"))
+            yield file_path, new_content
+    finally:
+        # Stop queued requests if the review is abandoned; requests already
+        # running finish in the background
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
 def apply_edit_instructions(edit_instructions, original_files):
     modified_files = {}
-    for file_path, content in original_files.items():
-        if file_path in edit_instructions:
-            instructions = edit_instructions[file_path]
-            prompt = f"{APPLY_EDITS_PROMPT}\n\nOriginal File: {file_path}\nContent:\n{content}\n\nEdit Instructions:\n{instructions}\n\nUpdated File Content:"
-            response = chat_with_ai(prompt, is_edit_request=True)
-            if response:
-                modified_files[file_path] = response.strip()
-        else:
-            modified_files[file_path] = content  # No changes for this file
+    for file_path, new_content in iter_edited_files(edit_instructions, original_files):
+        if new_content is not None:
+            modified_files[file_path] = new_content
     return modified_files
 
 # Update the chat_with_ai function
-def chat_with_ai(user_message, is_edit_request=False, retry_count=0, added_files=None):
-    global last_ai_response, conversation_history
+def chat_with_ai(user_message, is_edit_request=False, retry_count=0, added_files=None, instructions=None):
+    global last_ai_response
     try:
-        # Include added file contents and conversation history in the user message
-        if added_files:
-            file_context = "Added files:\n"
-            for file_path, content in added_files.items():
-                file_context += f"File: {file_path}\nContent:\n{content}\n\n"
-            user_message = f"{file_context}\n{user_message}"
-
-        # Include conversation history
-        if not is_edit_request:
-            history = "\n".join([f"User: {msg}" if i % 2 == 0 else f"AI: {msg}" for i, msg in enumerate(conversation_history)])
-            if history:
-                user_message = f"{history}\nUser: {user_message}"
-
         # Prepare the message content based on the request type
-        if is_edit_request:
+        if instructions:
+            message_content = f"{instructions}\n\n{user_message}"
+        elif is_edit_request:
             prompt = EDIT_INSTRUCTION_PROMPT if retry_count == 0 else APPLY_EDITS_PROMPT
             message_content = f"{prompt}\n\nUser request: {user_message}"
         else:
             message_content = user_message
 
-        messages = [
-            {"role": "user", "content": message_content}
-        ]
+        # Added files go first and history as separate messages, so neither
+        # is nested inside the request text
+        messages = conversation.build_messages(message_content, added_files, include_history=not is_edit_request)
 
-        if is_edit_request and retry_count == 0:
+        if is_edit_request and retry_count == 0 and not instructions:
             print(colored("Analyzing files and generating modifications...", "magenta"))
             logging.info("Sending edit request to AI.")
         elif not is_edit_request:
@@ -217,16 +707,20 @@ def chat_with_ai(user_message, is_edit_request=False, retry_count=0, added_files
             max_completion_tokens=60000
         )
         logging.info("Received response from AI.")
-        last_ai_response = response.choices[0].message.content
+        # Return the local copy; concurrent edit requests share the global
+        content = response.choices[0].message.content
+        last_ai_response = content
+
+        turn = conversation.record_usage(messages, response.usage)
+        print(colored(f"Tokens: {turn['prompt_tokens']} prompt ({turn['cached_tokens']} cached), "
+                      f"{turn['completion_tokens']} completion, {conversation.total_tokens()} this session", "dark_grey"))
+        logging.info(f"Turn usage: {turn}")
 
         if not is_edit_request:
             # Update conversation history
-            conversation_history.append(user_message)
-            conversation_history.append(last_ai_response)
-            if len(conversation_history) > 20:  # 10 interactions (user + AI each)
-                conversation_history = conversation_history[-20:]
+            conversation.record_turn(user_message, content)
 
-        return last_ai_response
+        return content
     except Exception as e:
         print(colored(f"Error while communicating with OpenAI: {e}", "red"))
         logging.error(f"Error while communicating with OpenAI: {e}")
@@ -328,6 +822,8 @@ def apply_creation_steps(creation_response, added_files, retry_count=0):
                     # Write content to the file
                     with open(path, 'w', encoding='utf-8') as f:
                         f.write(file_content)
+                    if file_index is not None:
+                        file_index.add(path)
                     print(colored(f"File created: {path}", "green"))
                     logging.info(f"File created: {path}")
             else:
@@ -361,7 +857,7 @@ def apply_creation_steps(creation_response, added_files, retry_count=0):
 
 # Step 4: Modify the main function
 def main():
-    global last_ai_response, conversation_history
+    global last_ai_response, file_index
 
 
 
@@ -380,20 +876,15 @@ def main():
         'prompt': 'cyan',
     })
 
-    # Get the list of files in the current directory
-    files = [f for f in os.listdir('.') if os.path.isfile(f)]
-
-    # Create a WordCompleter with available commands and files
-    completer = WordCompleter(
-    ['/edit', '/create', '/add', '/quit', '/debug', '/reset', '/review', '/planning'] + files,
-    ignore_case=True
-    )
+    # Repository-wide index behind path completion and glob expansion
+    file_index = FileIndex()
+    completer = FuzzyPathCompleter(file_index, COMMANDS)
 
     added_files = {}
 
     while True:
         print()  # Add a newline before the prompt
-        user_input = prompt("You: ", style=style, completer=completer).strip()
+        user_input = prompt("You: ", style=style, completer=completer, complete_in_thread=True).strip()
 
         if user_input.lower() == '/quit':
             print("Goodbye!")
@@ -408,14 +899,15 @@ def main():
                 print(colored("No AI response available yet.", "red"))
 
         elif user_input.lower() == '/reset':
-            conversation_history = []
+            conversation.reset()
             added_files.clear()
+            file_digests.clear()
             last_ai_response = None
             print(colored("Chat context and added files have been reset.", "green"))
             logging.info("Chat context and added files have been reset by the user.")
 
         elif user_input.startswith('/add'):
-            file_paths = user_input.split()[1:]
+            file_paths = expand_paths(user_input.split()[1:], file_index)
             if not file_paths:
                 print(colored("Please provide at least one file path.", "red"))
                 logging.warning("User issued /add without file paths.")
@@ -430,7 +922,7 @@ def main():
                 logging.warning("Total size of added files exceeds 100KB.")
 
         elif user_input.startswith('/edit'):
-            file_paths = user_input.split()[1:]
+            file_paths = expand_paths(user_input.split()[1:], file_index)
             if not file_paths:
                 print(colored("Please provide at least one file path.", "red"))
                 logging.warning("User issued /edit without file paths.")
@@ -468,9 +960,13 @@ Files to modify:
                 confirm = prompt("Do you want to apply these edit instructions? (yes/no): ", style=style).strip().lower()
                 if confirm == 'yes':
                     edit_instructions = parse_edit_instructions(ai_response)
-                    modified_files = apply_edit_instructions(edit_instructions, file_contents)
-                    for file_path, new_content in modified_files.items():
-                        apply_modifications(new_content, file_path)
+                    # Review each file as soon as its rewrite arrives. Workers
+                    # still print while a review prompt is open, so their
+                    # output goes above the prompt instead of through it
+                    with patch_stdout(raw=True):
+                        for file_path, new_content in iter_edited_files(edit_instructions, file_contents):
+                            if new_content is not None:
+                                apply_modifications(new_content, file_path)
                 else:
                     print(colored("Edit instructions not applied.", "red"))
                     logging.info("User chose not to apply edit instructions.")
@@ -506,7 +1002,7 @@ Files to modify:
                         break
 
         elif user_input.startswith('/review'):
-            file_paths = user_input.split()[1:]
+            file_paths = expand_paths(user_input.split()[1:], file_index)
             if not file_paths:
                 print(colored("Please provide at least one file path to review.", "red"))
                 logging.warning("User issued /review without file paths.")
@@ -0,0 +1,25 @@
+import unittest
+from ai_git_cli.ai_client import get_ai_client, close_ai_clients
+
+def make_config(model='gpt-4o-mini', api_key='test_key'):
+    return {'ai_provider': {'name': 'openai', 'model': model, 'api_key': api_key, 'pool_size': 4, 'timeout': 5}}
+
+class TestClientRegistry(unittest.TestCase):
+    def tearDown(self):
+        close_ai_clients()
+
+    def test_same_settings_share_one_client(self):
+        self.assertIs(get_ai_client(make_config()), get_ai_client(make_config()))
+
+    def test_different_model_or_key_gets_own_client(self):
+        client = get_ai_client(make_config())
+        self.assertIsNot(client, get_ai_client(make_config(model='gpt-4')))
+        self.assertIsNot(client, get_ai_client(make_config(api_key='other_key')))
+
+    def test_close_clears_registry(self):
+        client = get_ai_client(make_config())
+        close_ai_clients()
+        self.assertIsNot(client, get_ai_client(make_config()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import json
+import os
+import tempfile
+import unittest
+from ai_git_cli.benchmark import benchmark_config, main, run_benchmark
+
+class TestBenchmark(unittest.TestCase):
+    def test_every_phase_is_measured(self):
+        result = run_benchmark(files=6, hunks=2, lines=3, directories=2, mode='commit', config=benchmark_config(strategy='ai'))
+
+        self.assertEqual(result['changes'], 6)
+        self.assertEqual(list(result['phases']), ['diff_extraction', 'grouping', 'generation', 'rendering', 'commit_execution'])
+        self.assertEqual(result['phases']['grouping']['api_calls'], 1)
+        self.assertEqual(result['phases']['generation']['api_calls'], result['commits'])
+        self.assertGreater(result['phases']['generation']['prompt_tokens'], 0)
+        self.assertEqual(result['phases']['diff_extraction']['api_calls'], 0)
+
+    def test_hunk_granularity_splits_files(self):
+        result = run_benchmark(files=2, hunks=3, lines=2, config=benchmark_config(granularity='hunk'))
+        self.assertEqual(result['changes'], 6)
+        self.assertNotIn('commit_execution', result['phases'])
+
+    def test_results_are_written_as_json(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, 'results.json')
+            main(['--files', '4', '--repeat', '2', '--output', output])
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual(len(results['scenarios']['custom']['runs']), 2)
+        self.assertIn('version', results)
+
+if __name__ == '__main__':
+    unittest.main()
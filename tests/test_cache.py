@@ -0,0 +1,95 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from ai_git_cli.ai_client import AIClient
+from ai_git_cli.cache import ResponseCache
+from ai_git_cli.providers import FakeProvider
+
+MESSAGES = [{"role": "user", "content": "Group these changes"}]
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.tmpdir.name, ttl_seconds=60, max_entries=2)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_depends_on_backend_model_temperature_and_messages(self):
+        key = ResponseCache.make_key('openai', None, 'gpt-4', 0.7, MESSAGES)
+        self.assertEqual(key, ResponseCache.make_key('openai', None, 'gpt-4', 0.7, list(MESSAGES)))
+        self.assertNotEqual(key, ResponseCache.make_key('fake', None, 'gpt-4', 0.7, MESSAGES))
+        self.assertNotEqual(key, ResponseCache.make_key('openai', 'http://localhost:8080/v1', 'gpt-4', 0.7, MESSAGES))
+        self.assertNotEqual(key, ResponseCache.make_key('openai', None, 'gpt-4o', 0.7, MESSAGES))
+        self.assertNotEqual(key, ResponseCache.make_key('openai', None, 'gpt-4', 0.2, MESSAGES))
+
+    def test_expired_entries_are_dropped(self):
+        self.cache.set('a', 'response')
+        self.assertEqual(self.cache.get('a'), 'response')
+        self.cache.ttl_seconds = -1
+        self.assertIsNone(self.cache.get('a'))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, 'a.json')))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('a', '1')
+        self.cache.set('b', '2')
+        past = time.time() - 10
+        os.utime(os.path.join(self.tmpdir.name, 'b.json'), (past, past))
+        os.utime(os.path.join(self.tmpdir.name, 'a.json'), (past - 10, past - 10))
+        self.cache.get('a')
+        self.cache.set('c', '3')
+        self.assertEqual(self.cache.get('a'), '1')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), '3')
+
+    def test_client_serves_repeat_prompts_from_cache(self):
+        client = AIClient(api_key='test_key', model='gpt-4')
+        client.provider.client = MagicMock()
+        client.provider.client.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content='[["a.py"]]'))]
+        client.cache = self.cache
+
+        self.assertEqual(client.get_response(MESSAGES), '[["a.py"]]')
+        self.assertEqual(client.get_response(MESSAGES), '[["a.py"]]')
+        self.assertEqual(client.provider.client.chat.completions.create.call_count, 1)
+
+    def test_concurrent_writes_of_one_key_leave_no_temp_files(self):
+        barrier = threading.Barrier(8)
+
+        def write(value):
+            barrier.wait()
+            self.cache.set('a', value)
+
+        threads = [threading.Thread(target=write, args=(str(i),)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn(self.cache.get('a'), [str(i) for i in range(8)])
+        self.assertEqual(os.listdir(self.tmpdir.name), ['a.json'])
+
+    def test_client_returns_response_when_cache_write_fails(self):
+        client = AIClient(api_key='test_key', model='gpt-4')
+        client.provider.client = MagicMock()
+        client.provider.client.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content='[["a.py"]]'))]
+        client.cache = self.cache
+
+        with patch.object(self.cache, 'set', side_effect=OSError('disk full')), self.assertLogs(level='WARNING'):
+            self.assertEqual(client.get_response(MESSAGES), '[["a.py"]]')
+
+    def test_backends_with_the_same_model_name_do_not_share_responses(self):
+        fake = AIClient(api_key='', model='gpt-4', provider=FakeProvider(), provider_name='fake')
+        fake.cache = self.cache
+        local = AIClient(api_key='', model='gpt-4', provider=MagicMock(), provider_name='openai-compatible',
+                         base_url='http://localhost:8080/v1')
+        local.provider.complete.return_value = 'from the local server'
+        local.cache = self.cache
+
+        fake.get_response(MESSAGES)
+        self.assertEqual(local.get_response(MESSAGES), 'from the local server')
+        local.provider.complete.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
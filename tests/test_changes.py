@@ -0,0 +1,47 @@
+import unittest
+from ai_git_cli.changes import Change, ChangeSet, group_files, group_hunks
+
+DIFF = "--- a/app.py\n+++ b/app.py\n@@ -1,2 +1,2 @@\n-old = 1\n+new = 1\n+added = 2\n context"
+
+class TestChange(unittest.TestCase):
+    def test_line_stats_are_counted_when_not_given(self):
+        change = Change('app.py', 'M', DIFF)
+        self.assertEqual((change.additions, change.deletions), (2, 1))
+        self.assertEqual(Change('app.py', 'M', DIFF, 10, 20).additions, 10)
+
+    def test_ids_and_compact_round_trip(self):
+        whole = Change('app.py', 'M', DIFF)
+        hunk = Change('app.py', 'A', DIFF, 2, 1, truncated=True, hunk=1, hunk_count=3)
+
+        self.assertEqual((whole.id, hunk.id), ('app.py', 'app.py#2'))
+        self.assertEqual(set(whole.to_dict()), {'path', 'diff', 'additions', 'deletions'})
+        restored = Change.from_dict(hunk.to_dict())
+        self.assertEqual(
+            (restored.id, restored.change_type, restored.truncated, restored.hunk_count, restored.additions),
+            ('app.py#2', 'A', True, 3, 2)
+        )
+
+    def test_changes_use_slots(self):
+        with self.assertRaises(AttributeError):
+            Change('app.py').extra = 1
+
+class TestChangeSet(unittest.TestCase):
+    def test_lookups_by_id_and_path(self):
+        changes = ChangeSet([
+            Change('a.py', hunk=0, hunk_count=2),
+            Change('b.py'),
+            Change('a.py', hunk=1, hunk_count=2),
+        ])
+
+        self.assertEqual(changes.ids(), ['a.py#1', 'b.py', 'a.py#2'])
+        self.assertIs(changes.get('a.py#2'), changes[2])
+        self.assertEqual([c.id for c in changes.for_path('a.py')], ['a.py#1', 'a.py#2'])
+        self.assertEqual(ChangeSet.from_list(changes.to_list()).ids(), changes.ids())
+
+    def test_group_files_and_partial_hunks(self):
+        group = [Change('a.py', hunk=1, hunk_count=2), Change('b.py'), Change('c.py', hunk=0, hunk_count=1)]
+        self.assertEqual(group_files(group), ['a.py', 'b.py', 'c.py'])
+        self.assertEqual(group_hunks(group), {'a.py': [1]})
+
+if __name__ == '__main__':
+    unittest.main()
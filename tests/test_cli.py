@@ -1,37 +1,61 @@
+import io
 import unittest
-from unittest.mock import patch, MagicMock
-from ai_git_cli.cli import main
+from contextlib import redirect_stdout
+from unittest.mock import patch
+from ai_git_cli.changes import Change, ChangeSet
+from ai_git_cli.main import cli_main
 
 class TestCLI(unittest.TestCase):
-    @patch('ai_git_cli.cli.execute_commits')
-    @patch('ai_git_cli.cli.generate_commit_message')
-    @patch('ai_git_cli.cli.group_changes')
-    @patch('ai_git_cli.cli.get_unstaged_changes')
-    @patch('ai_git_cli.cli.load_config')
-    def test_main_dry_run(self, mock_load_config, mock_get_unstaged_changes, mock_group_changes, mock_generate_commit_message, mock_execute_commits):
+    @patch('ai_git_cli.commit_execution.execute_commits')
+    @patch('rich.prompt.Prompt.ask')
+    @patch('ai_git_cli.single_pass.group_and_generate')
+    @patch('ai_git_cli.main.get_unstaged_changes')
+    @patch('ai_git_cli.main.has_unstaged_changes')
+    @patch('ai_git_cli.config.load_config')
+    @patch('git.Repo')
+    def test_commit_dry_run(self, mock_repo, mock_load_config, mock_has_unstaged_changes, mock_get_unstaged_changes,
+                            mock_group_and_generate, mock_ask, mock_execute_commits):
         mock_load_config.return_value = {
-            'openai': {'api_key': 'test_key', 'model': 'gpt-4'},
+            'ai_provider': {'api_key': 'test_key', 'model': 'gpt-4'},
             'git': {'user_name': 'Test User', 'user_email': 'test@example.com'},
-            'commit_message': {'template': '{type}: {subject}', 'types': ['Feature']}
+            'advanced': {'single_pass': True},
         }
-        mock_get_unstaged_changes.return_value = [
-            {'path': 'test.py', 'change_type': 'modified', 'diff': 'diff content'}
-        ]
-        mock_group_changes.return_value = [
-            [{'path': 'test.py', 'change_type': 'modified', 'diff': 'diff content'}]
-        ]
-        mock_generate_commit_message.return_value = [
-            {'message': 'Feature: Update test.py functionality', 'files': ['test.py']}
-        ]
+        mock_has_unstaged_changes.return_value = True
+        mock_get_unstaged_changes.return_value = ChangeSet([Change('test.py', 'M', 'diff content', 1, 0)])
+        mock_group_and_generate.return_value = [{'message': 'feat: update test.py functionality', 'files': ['test.py']}]
+        mock_ask.side_effect = ['accept', 'y']
 
-        test_args = ['ai-git-cli', '--dry-run']
-        with patch('sys.argv', test_args):
-            with patch('builtins.print') as mock_print:
-                main()
-                mock_print.assert_any_call("Dry run mode enabled. The following commits would be executed:")
-                mock_print.assert_any_call("Message: Feature: Update test.py functionality")
-                mock_print.assert_any_call("Files: test.py\n")
-                mock_execute_commits.assert_not_called()
+        output = io.StringIO()
+        with patch('sys.argv', ['ai-git-cli', 'commit', '--dry-run', '--no-daemon']), redirect_stdout(output):
+            cli_main()
+
+        self.assertIn('feat: update test.py functionality', output.getvalue())
+        self.assertIn('Dry run enabled. No commits were created.', output.getvalue())
+        mock_execute_commits.assert_not_called()
+
+    @patch('rich.prompt.Prompt.ask')
+    @patch('ai_git_cli.commit_message.generate_commit_message')
+    @patch('ai_git_cli.grouping.group_changes')
+    @patch('ai_git_cli.daemon.request')
+    @patch('ai_git_cli.main.get_unstaged_changes')
+    @patch('ai_git_cli.main.has_unstaged_changes')
+    @patch('ai_git_cli.config.load_config')
+    def test_analyze_falls_back_when_the_daemon_fails(self, mock_load_config, mock_has_unstaged_changes, mock_get_unstaged_changes,
+                                                      mock_request, mock_group_changes, mock_generate_commit_message, mock_ask):
+        mock_load_config.return_value = {'grouping': {'strategy': 'local'}}
+        mock_has_unstaged_changes.return_value = True
+        mock_get_unstaged_changes.return_value = ChangeSet([Change('test.py', 'M', 'diff content', 1, 0)])
+        mock_request.side_effect = RuntimeError("Daemon error: daemon was started with a different configuration")
+        mock_generate_commit_message.return_value = [{'message': 'fix: analyze locally', 'files': ['test.py']}]
+        mock_ask.return_value = 'n'
+
+        output = io.StringIO()
+        with patch('sys.argv', ['ai-git-cli', 'analyze']), redirect_stdout(output), self.assertLogs(level='WARNING') as logs:
+            cli_main()
+
+        self.assertIn('fix: analyze locally', output.getvalue())
+        self.assertIn('analyzing locally', logs.output[0])
+        mock_get_unstaged_changes.assert_called_once()
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
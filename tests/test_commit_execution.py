@@ -0,0 +1,195 @@
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from ai_git_cli import commit_execution
+from ai_git_cli.commit_execution import execute_commits
+
+CONFIG = {'git': {'user_name': 'Test User', 'user_email': 'test@example.com'}}
+
+def git(*args):
+    return subprocess.run(['git'] + list(args), check=True, capture_output=True, text=True).stdout.strip()
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+class TestExecuteCommits(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        git('init', '-q')
+        for name in ('a.py', 'b.py', 'old.py'):
+            write(name, f"{name}\n")
+        git('add', '.')
+        git('-c', 'user.name=Setup', '-c', 'user.email=setup@example.com', 'commit', '-q', '-m', 'initial')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_each_group_becomes_one_commit(self):
+        write('a.py', "a.py changed\n")
+        write('b.py', "b.py changed\n")
+        write('new.py', "new\n")
+        os.remove('old.py')
+
+        created = execute_commits([
+            {'message': 'feat: change a', 'files': ['a.py']},
+            {'message': 'refactor: replace old with new', 'files': ['old.py', 'new.py']},
+        ], CONFIG)
+
+        self.assertEqual(len(created), 2)
+        self.assertEqual(git('log', '--format=%s|%an|%ae', '-n', '2').splitlines(), [
+            'refactor: replace old with new|Test User|test@example.com',
+            'feat: change a|Test User|test@example.com',
+        ])
+        self.assertEqual(git('show', '--name-status', '--format=', 'HEAD').splitlines(), ['A\tnew.py', 'D\told.py'])
+        self.assertEqual(git('status', '--porcelain'), 'M b.py')
+        self.assertEqual(subprocess.run(['git', 'config', 'user.name'], capture_output=True).returncode, 1)
+
+    def test_failed_group_is_skipped_without_partial_changes(self):
+        write('a.py', "a.py changed\n")
+        write('b.py', "b.py changed\n")
+
+        with self.assertRaises(RuntimeError):
+            execute_commits([
+                {'message': 'feat: change a', 'files': ['a.py']},
+                {'message': 'broken', 'files': ['b.py', 'dir/../../outside.py']},
+                {'message': 'feat: change b', 'files': ['b.py']},
+            ], CONFIG)
+
+        self.assertEqual(git('log', '--format=%s', '-n', '2').splitlines(), ['feat: change b', 'feat: change a'])
+        self.assertEqual(git('show', '--name-only', '--format=', 'HEAD'), 'b.py')
+        self.assertEqual(git('status', '--porcelain'), '')
+
+    def test_hunks_of_one_file_go_to_separate_commits(self):
+        lines = [f"line {i}\n" for i in range(1, 31)]
+        write('a.py', "".join(lines))
+        git('add', 'a.py')
+        git('-c', 'user.name=Setup', '-c', 'user.email=setup@example.com', 'commit', '-q', '-m', 'long a')
+        lines[0] = "first changed\n"
+        lines[29] = "last changed\n"
+        write('a.py', "".join(lines))
+        write('b.py', "b.py changed\n")
+
+        execute_commits([
+            {'message': 'fix: last line', 'files': ['a.py', 'b.py'], 'hunks': {'a.py': [1]}},
+            {'message': 'fix: first line', 'files': ['a.py'], 'hunks': {'a.py': [0]}},
+        ], CONFIG)
+
+        self.assertIn('+last changed', git('show', 'HEAD~1'))
+        self.assertNotIn('first changed', git('show', 'HEAD~1'))
+        self.assertIn('+first changed', git('show', 'HEAD'))
+        self.assertEqual(git('show', 'HEAD:a.py') + "\n", "".join(lines))
+        self.assertEqual(git('status', '--porcelain'), '')
+
+    def test_commit_hooks_run_when_configured(self):
+        write('.git/hooks/commit-msg', "#!/bin/sh\nprintf '\\nHooked: yes\\n' >> \"$1\"\n")
+        os.chmod('.git/hooks/commit-msg', 0o755)
+        write('.git/hooks/pre-commit', "#!/bin/sh\ngit diff --cached --name-only >> pre-commit.log\n")
+        os.chmod('.git/hooks/pre-commit', 0o755)
+        write('a.py', "a.py changed\n")
+        write('b.py', "b.py changed\n")
+
+        created = execute_commits([
+            {'message': 'feat: change a', 'files': ['a.py']},
+            {'message': 'feat: change b', 'files': ['b.py']},
+        ], CONFIG)
+
+        self.assertEqual(git('rev-parse', 'HEAD'), created[-1])
+        self.assertEqual(git('log', '--format=%B', '-n', '1').splitlines()[-1], 'Hooked: yes')
+        self.assertEqual(git('log', '--format=%s|%an', '-n', '2').splitlines(), ['feat: change b|Test User', 'feat: change a|Test User'])
+        with open('pre-commit.log') as f:
+            self.assertEqual(f.read().split(), ['a.py', 'b.py'])
+
+    def test_rejected_group_is_skipped_with_hooks(self):
+        write('.git/hooks/pre-commit', "#!/bin/sh\n! git diff --cached --name-only | grep -q b.py\n")
+        os.chmod('.git/hooks/pre-commit', 0o755)
+        write('a.py', "a.py changed\n")
+        write('b.py', "b.py changed\n")
+
+        with self.assertRaises(RuntimeError):
+            execute_commits([
+                {'message': 'feat: change b', 'files': ['b.py']},
+                {'message': 'feat: change a', 'files': ['a.py']},
+            ], CONFIG)
+
+        self.assertEqual(git('log', '--format=%s', '-n', '2').splitlines(), ['feat: change a', 'initial'])
+        self.assertEqual(git('status', '--porcelain'), 'M b.py')
+
+    def test_gpgsign_requires_git_commit(self):
+        self.assertFalse(commit_execution._porcelain_required())
+        git('config', 'commit.gpgsign', 'true')
+        self.assertTrue(commit_execution._porcelain_required())
+
+    def test_glob_characters_in_file_names_are_literal(self):
+        write('*.py', "star\n")
+        write('new.py', "new\n")
+        git('add', '--intent-to-add', 'new.py')
+
+        execute_commits([{'message': 'feat: add star', 'files': ['*.py']}], CONFIG)
+
+        self.assertEqual(git('show', '--name-only', '--format=', 'HEAD'), '*.py')
+        # A '*.py' pathspec would have reset new.py out of the index
+        self.assertEqual(git('status', '--porcelain'), 'A new.py')
+
+    def test_failed_rollback_is_reported_with_the_commit_failure(self):
+        write('a.py', "a.py changed\n")
+        write('b.py', "b.py changed\n")
+        run_git = commit_execution._run_git
+
+        def failing_read_tree(args, env=None, input=None):
+            if args[0] == 'read-tree':
+                raise subprocess.CalledProcessError(128, ['git'] + args, stderr='fatal: index locked')
+            return run_git(args, env, input)
+
+        with patch('ai_git_cli.commit_execution._run_git', side_effect=failing_read_tree):
+            with self.assertRaises(RuntimeError) as raised:
+                execute_commits([
+                    {'message': 'feat: change a', 'files': ['a.py']},
+                    {'message': 'broken', 'files': ['dir/../../outside.py']},
+                    {'message': 'feat: change b', 'files': ['b.py']},
+                ], CONFIG)
+
+        self.assertIn('2 of 3 commits failed', str(raised.exception))
+        self.assertIn('outside.py', str(raised.exception))
+        self.assertIn('fatal: index locked', str(raised.exception))
+        self.assertEqual(git('log', '--format=%s', '-n', '1'), 'feat: change a')
+
+    def test_same_size_edit_right_after_indexing_is_committed(self):
+        write('g.txt', "x\n")
+        git('add', 'g.txt')
+        # Same size and, on second-granularity stat data, the same mtime as the
+        # indexed entry, so only git's racy-clean check can notice the edit
+        write('g.txt', "y\n")
+        edited = os.stat('g.txt')
+        os.utime('.git/index', ns=(edited.st_atime_ns, edited.st_mtime_ns))
+        time.sleep(1.05 - time.time() % 1)
+
+        execute_commits([{'message': 'fix: g', 'files': ['g.txt']}], CONFIG)
+
+        self.assertEqual(git('show', 'HEAD:g.txt'), 'y')
+        self.assertEqual(git('status', '--porcelain'), '')
+
+    def test_group_without_changes_creates_no_commit(self):
+        write('b.py', "b.py changed\n")
+
+        with self.assertRaises(RuntimeError) as raised:
+            execute_commits([
+                {'message': 'feat: nothing', 'files': ['a.py']},
+                {'message': 'feat: change b', 'files': ['b.py']},
+            ], CONFIG)
+
+        self.assertIn('no changes to commit', str(raised.exception))
+        self.assertEqual(git('log', '--format=%s', '-n', '2').splitlines(), ['feat: change b', 'initial'])
+
+    def test_missing_identity_is_a_configuration_error(self):
+        with self.assertRaises(ValueError):
+            execute_commits([{'message': 'x', 'files': ['a.py']}], {})
+
+if __name__ == '__main__':
+    unittest.main()
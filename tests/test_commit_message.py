@@ -0,0 +1,131 @@
+import io
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+from ai_git_cli.changes import Change, ChangeSet
+from ai_git_cli.commit_message import generate_commit_message, preview_commit_message, split_batches
+
+CONFIG = {
+    'commit_style': {'format': 'conventional', 'conventional_prefixes': {'feat': 'Features', 'fix': 'Bug Fixes'}, 'temperature': 0.7},
+    'custom_instructions': {'user_feedback': ''},
+    'advanced': {'max_concurrency': 8},
+}
+
+def slow_response(messages, temperature=0.7):
+    time.sleep(0.2)
+    path = messages[1]['content'].split(' in ')[1].split('\n')[0]
+    if path == 'broken.py':
+        raise RuntimeError("boom")
+    return f'{{"type": "feat", "subject": "update {path}"}}'
+
+class TestGenerateCommitMessage(unittest.TestCase):
+    @patch('ai_git_cli.commit_message.get_ai_client')
+    def test_groups_are_generated_concurrently_in_order(self, mock_get_ai_client):
+        mock_get_ai_client.return_value = MagicMock(get_response=MagicMock(side_effect=slow_response))
+        groups = [[Change(f'file{i}.py', 'M')] for i in range(6)]
+
+        start = time.perf_counter()
+        commit_messages = generate_commit_message(groups, CONFIG)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual([c['message'] for c in commit_messages], [f'feat: update file{i}.py' for i in range(6)])
+
+    @patch('ai_git_cli.commit_message.get_ai_client')
+    def test_failed_group_does_not_affect_others(self, mock_get_ai_client):
+        mock_get_ai_client.return_value = MagicMock(get_response=MagicMock(side_effect=slow_response))
+        groups = [
+            [Change('a.py', 'M')],
+            [Change('broken.py', 'M')],
+            [Change('b.py', 'M')],
+        ]
+
+        commit_messages = generate_commit_message(groups, CONFIG)
+
+        self.assertEqual(commit_messages[0]['message'], 'feat: update a.py')
+        self.assertEqual(commit_messages[1], {'message': 'chore: update broken.py', 'files': ['broken.py']})
+        self.assertEqual(commit_messages[2]['message'], 'feat: update b.py')
+
+class TestStreamingGeneration(unittest.TestCase):
+    @patch('ai_git_cli.commit_message.get_ai_client')
+    def test_updates_arrive_while_messages_stream(self, mock_get_ai_client):
+        chunks = ['{"type": "fe', 'at", "subj', 'ect": "add parser"}']
+        mock_get_ai_client.return_value = MagicMock(stream_response=MagicMock(return_value=iter(chunks)))
+        updates = []
+
+        commit_messages = generate_commit_message(
+            [[Change('parser.py', 'M')]], CONFIG, on_update=lambda *update: updates.append(update)
+        )
+
+        self.assertEqual(updates, [
+            (0, 'fe: ', False),
+            (0, 'feat: ', False),
+            (0, 'feat: add parser', False),
+            (0, 'feat: add parser', True),
+        ])
+        self.assertEqual(commit_messages[0]['message'], 'feat: add parser')
+
+    def test_preview_reads_incomplete_json(self):
+        self.assertEqual(preview_commit_message('{"type": "fix", "subject": "handle empty'), 'fix: handle empty')
+
+    @patch('ai_git_cli.commit_message.get_ai_client')
+    def test_wait_inside_the_table_display_opens_no_second_live(self, mock_get_ai_client):
+        from rich.console import Console
+        from rich.live import Live
+        from ai_git_cli.main import CommitMessageStream
+
+        def stream_response(messages, temperature=0.7):
+            time.sleep(0.2)
+            return iter(['{"type": "feat", "subject": "add parser"}'])
+
+        mock_get_ai_client.return_value = MagicMock(stream_response=stream_response)
+        groups = [[Change('parser.py', 'M')]]
+        stream = CommitMessageStream.start(groups, ChangeSet(groups[0]), CONFIG)
+        console = Console(file=io.StringIO())
+
+        with Live(stream, console=console) as live, patch('rich.live.Live', side_effect=AssertionError("nested Live")):
+            stream.wait(0, console, live)
+        self.assertEqual(stream.commit_messages[0]['message'], 'feat: add parser')
+
+class TestBatchGeneration(unittest.TestCase):
+    config = dict(CONFIG, advanced={'max_concurrency': 8, 'generation_mode': 'batch', 'token_limit': 4000, 'batch_size': 20})
+
+    @patch('ai_git_cli.commit_message.get_ai_client')
+    def test_groups_share_one_request(self, mock_get_ai_client):
+        batch_response = json.dumps([
+            {'group_id': 1, 'type': 'feat', 'subject': 'add parser', 'body': ''},
+            {'group_id': 2, 'type': 'docs', 'subject': 'describe parser', 'body': 'Explain the new options.'},
+        ])
+        ai_client = MagicMock(get_response=MagicMock(return_value=batch_response))
+        mock_get_ai_client.return_value = ai_client
+        groups = [[Change('parser.py', 'M')], [Change('README.md', 'M')]]
+
+        commit_messages = generate_commit_message(groups, self.config)
+
+        self.assertEqual(ai_client.get_response.call_count, 1)
+        self.assertEqual(commit_messages[0]['message'], 'feat: add parser')
+        self.assertEqual(commit_messages[1]['message'], 'docs: describe parser\n\nExplain the new options.')
+
+    @patch('ai_git_cli.commit_message.get_ai_client')
+    def test_missing_entries_fall_back_to_single_requests(self, mock_get_ai_client):
+        responses = [
+            json.dumps([{'group_id': 1, 'type': 'feat', 'subject': 'add parser'}, {'group_id': 2, 'subject': ''}]),
+            '{"type": "docs", "subject": "describe parser"}',
+        ]
+        ai_client = MagicMock(get_response=MagicMock(side_effect=responses))
+        mock_get_ai_client.return_value = ai_client
+        groups = [[Change('parser.py', 'M')], [Change('README.md', 'M')]]
+
+        commit_messages = generate_commit_message(groups, self.config)
+
+        self.assertEqual(ai_client.get_response.call_count, 2)
+        self.assertEqual([c['message'] for c in commit_messages], ['feat: add parser', 'docs: describe parser'])
+
+    def test_batches_split_by_token_budget(self):
+        groups = [[Change(f'file{i}.py', 'M', 'x' * 400)] for i in range(5)]
+        batches = split_batches(groups, token_limit=180, max_groups=20)
+        self.assertEqual([[group_id for group_id, _ in batch] for batch in batches], [[1, 2], [3, 4], [5]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import subprocess
+import tempfile
+import threading
+import unittest
+from ai_git_cli.changes import Change
+from ai_git_cli.daemon import AnalysisDaemon, ChangeIndex, config_digest, request
+
+def git(*args):
+    subprocess.run(['git'] + list(args), check=True, capture_output=True)
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+def change(path, diff):
+    return Change(path, 'M', diff, 1, 1)
+
+class RecordingPlanner:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, changes, config):
+        self.calls.append([c.path for c in changes])
+        return [{'message': f"update {c.path}", 'files': [c.path]} for c in changes]
+
+class TestChangeIndex(unittest.TestCase):
+    def test_only_changed_files_are_planned_again(self):
+        planner = RecordingPlanner()
+        index = ChangeIndex(planner)
+
+        first = index.plan([change('a.py', '+a'), change('b.py', '+b')], {})
+        second = index.plan([change('a.py', '+a'), change('b.py', '+b2'), change('c.py', '+c')], {})
+
+        self.assertEqual(planner.calls, [['a.py', 'b.py'], ['b.py', 'c.py']])
+        self.assertEqual([c['files'] for c in first], [['a.py'], ['b.py']])
+        self.assertEqual([c['files'] for c in second], [['a.py'], ['b.py'], ['c.py']])
+
+    def test_reused_commits_follow_current_hunks(self):
+        index = ChangeIndex(RecordingPlanner())
+        index.plan([Change('a.py', 'M', '@@ one', 1, 1, hunk=0, hunk_count=1)], {})
+
+        # A second hunk appears; the unchanged first one keeps its message but is now partial
+        commits = index.plan([Change('a.py', 'M', '@@ one', 1, 1, hunk=0, hunk_count=2), Change('a.py', 'M', '@@ two', 1, 1, hunk=1, hunk_count=2)], {})
+
+        self.assertEqual(commits[0], {'message': 'update a.py', 'files': ['a.py'], 'hunks': {'a.py': [0]}})
+
+class TestAnalysisDaemon(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        git('init', '-q')
+        write('a.py', "a\n")
+        write('b.py', "b\n")
+        git('add', '.')
+        git('-c', 'user.name=Test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'initial')
+        self.socket_path = os.path.join(self.tmpdir.name, 'daemon.sock')
+        self.planner = RecordingPlanner()
+        self.daemon = AnalysisDaemon({'daemon': {'poll_interval': 60}}, self.socket_path, self.planner)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        for _ in range(50):
+            if request('status', self.socket_path) is not None:
+                break
+            self.daemon.stopped.wait(0.05)
+
+    def tearDown(self):
+        request('stop', self.socket_path)
+        self.thread.join(5)
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_repeated_analysis_reuses_results(self):
+        write('a.py', "a changed\n")
+        write('b.py', "b changed\n")
+        first = request('analyze', self.socket_path)
+        second = request('analyze', self.socket_path)
+        write('b.py', "b changed again, longer\n")
+        third = request('analyze', self.socket_path)
+
+        self.assertEqual([c['path'] for c in first['changes']], ['a.py', 'b.py'])
+        self.assertEqual(first['commit_messages'], second['commit_messages'])
+        self.assertIn('+b changed again, longer', third['changes'][1]['diff'])
+        self.assertEqual(self.planner.calls, [['a.py', 'b.py'], ['b.py']])
+
+    def test_analysis_for_another_configuration_is_refused(self):
+        write('a.py', "a changed\n")
+        self.assertIsNotNone(request('analyze', self.socket_path, config_digest=config_digest({'daemon': {'poll_interval': 60}})))
+        with self.assertRaises(RuntimeError) as raised:
+            request('analyze', self.socket_path, config_digest=config_digest({'grouping': {'strategy': 'ai'}}))
+        self.assertIn('different configuration', str(raised.exception))
+
+    def test_no_daemon_means_no_response(self):
+        self.assertIsNone(request('status', os.path.join(self.tmpdir.name, 'missing.sock')))
+
+if __name__ == '__main__':
+    unittest.main()
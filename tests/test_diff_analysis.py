@@ -0,0 +1,98 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from ai_git_cli.diff_analysis import allocate_budgets, get_unstaged_changes
+from ai_git_cli.tokens import estimate_tokens
+
+def git(*args):
+    subprocess.run(['git'] + list(args), check=True, capture_output=True)
+
+class TestGetUnstagedChanges(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        git('init', '-q')
+        git('config', 'user.name', 'Test User')
+        git('config', 'user.email', 'test@example.com')
+        with open('small.py', 'w') as f:
+            f.write("def greet():\n    return 'hi'\n")
+        with open('generated.js', 'w') as f:
+            f.write("".join(f"var value{i} = {i};\n" for i in range(20000)))
+        git('add', '.')
+        git('commit', '-q', '-m', 'initial')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_diffs_stay_within_token_limit(self):
+        with open('small.py', 'w') as f:
+            f.write("def greet(name):\n    return f'hi {name}'\n")
+        with open('generated.js', 'w') as f:
+            f.write("".join(f"var value{i} = {i * 2};\n" if i % 50 == 0 else f"var value{i} = {i};\n" for i in range(20000)))
+            f.write("x" * 100000 + "\n")
+
+        changes = get_unstaged_changes({'advanced': {'token_limit': 1000}})
+        by_path = {change.path: change for change in changes}
+
+        self.assertEqual(set(by_path), {'small.py', 'generated.js'})
+        self.assertIn("+def greet(name):", by_path['small.py'].diff)
+        self.assertFalse(by_path['small.py'].truncated)
+        self.assertTrue(by_path['generated.js'].truncated)
+        self.assertEqual(by_path['generated.js'].additions, 400)
+        self.assertLessEqual(sum(estimate_tokens(change.diff) for change in changes), 1100)
+
+    def test_new_and_deleted_files_report_change_type(self):
+        os.remove('small.py')
+        with open('new.py', 'w') as f:
+            f.write("print('new')\n")
+        git('add', '--intent-to-add', 'new.py')
+
+        changes = get_unstaged_changes()
+
+        self.assertEqual({change.path: change.change_type for change in changes}, {'new.py': 'A', 'small.py': 'D'})
+
+    def test_hunk_granularity_splits_multi_hunk_files(self):
+        with open('small.py', 'w') as f:
+            f.write("def greet(name):\n    return 'hi'\n")
+        with open('generated.js', 'w') as f:
+            f.write("".join(f"var value{i} = {-i};\n" if i in (10, 5000) else f"var value{i} = {i};\n" for i in range(20000)))
+
+        changes = get_unstaged_changes({'grouping': {'granularity': 'hunk'}})
+        ids = [change.id for change in changes]
+
+        self.assertEqual(ids, ['generated.js#1', 'generated.js#2', 'small.py'])
+        self.assertEqual([(c.additions, c.deletions) for c in changes[:2]], [(1, 1), (1, 1)])
+        self.assertIn('value5000 = -5000', changes[1].diff)
+        self.assertNotIn('value10 = -10', changes[1].diff)
+
+    def test_conflicted_files_are_skipped_during_a_merge(self):
+        git('checkout', '-q', '-b', 'other')
+        with open('small.py', 'w') as f:
+            f.write("def greet():\n    return 'other'\n")
+        git('commit', '-q', '-am', 'other')
+        git('checkout', '-q', '-')
+        with open('small.py', 'w') as f:
+            f.write("def greet():\n    return 'main'\n")
+        git('commit', '-q', '-am', 'main')
+        self.assertNotEqual(subprocess.run(['git', 'merge', 'other'], capture_output=True).returncode, 0)
+        with open('generated.js', 'a') as f:
+            f.write("var extra = 1;\n")
+
+        with self.assertLogs(level='WARNING'):
+            changes = get_unstaged_changes()
+
+        self.assertEqual([change.path for change in changes], ['generated.js'])
+        self.assertEqual((changes[0].additions, changes[0].deletions), (1, 0))
+        self.assertIn('+var extra = 1;', changes[0].diff)
+
+class TestAllocateBudgets(unittest.TestCase):
+    def test_small_files_get_what_they_need(self):
+        budgets = allocate_budgets([100, 100, 50000, 90000], 4000)
+        self.assertEqual(budgets[:2], [100, 100])
+        self.assertEqual(budgets[2:], [1900, 1900])
+
+if __name__ == '__main__':
+    unittest.main()
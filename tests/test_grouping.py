@@ -0,0 +1,98 @@
+import json
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+from ai_git_cli.changes import Change, ChangeSet
+from ai_git_cli.grouping import group_changes, shard_by_directory
+from ai_git_cli.main import build_commit_table
+
+CONFIG = {
+    'commit_style': {'temperature': 0.7},
+    'custom_instructions': {'user_feedback': ''},
+    'grouping': {'strategy': 'ai', 'max_files_per_commit': 5, 'combine_similar_changes': True},
+}
+
+def make_changes(count):
+    return [
+        Change(f"vendor/pkg{i // 50}/file{i}.js", 'M', f"+line {i}", 1, 0)
+        for i in range(count)
+    ]
+
+def model_groups(changes, size=5):
+    return [[change.path for change in changes[i:i + size]] for i in range(0, len(changes), size)]
+
+class TestGroupWithModel(unittest.TestCase):
+    @patch('ai_git_cli.grouping.get_ai_client')
+    def test_files_left_out_by_the_model_are_still_grouped(self, mock_get_ai_client):
+        changes = make_changes(4)
+        mock_get_ai_client.return_value.get_response.return_value = json.dumps([
+            [changes[1].path, changes[0].path],
+            [changes[0].path, 'not/a/change.py'],
+        ])
+
+        with self.assertLogs(level='WARNING') as logs:
+            groups = group_changes(changes, CONFIG)
+
+        self.assertEqual(groups, [changes[:2], changes[2:]])
+        self.assertIn('left 2 changes out of every group', logs.output[0])
+
+    @patch('ai_git_cli.grouping.get_ai_client')
+    def test_unexpected_response_falls_back_to_one_group(self, mock_get_ai_client):
+        changes = make_changes(3)
+        mock_get_ai_client.return_value.get_response.return_value = json.dumps({'groups': []})
+        self.assertEqual(group_changes(changes, CONFIG), [changes])
+
+class TestShardedGrouping(unittest.TestCase):
+    def test_shards_stay_within_size_and_keep_directories_together(self):
+        changes = [Change(f"src/a/f{i}.py") for i in range(30)] + [Change(f"src/b/f{i}.py") for i in range(8)] \
+            + [Change(f"docs/f{i}.md") for i in range(4)] + [Change(f"f{i}.txt") for i in range(25)]
+        shards = shard_by_directory(changes, 10)
+
+        self.assertTrue(all(len(shard) <= 10 for shard in shards))
+        self.assertCountEqual([change for shard in shards for change in shard], changes)
+        for directory in ('src/b/', 'docs/'):
+            self.assertEqual(sum(any(change.path.startswith(directory) for change in shard) for shard in shards), 1)
+
+    def test_groups_merge_across_shards_within_the_file_limit(self):
+        changes = [Change(f"api/f{i}.py") for i in range(4)] + [Change(f"web/f{i}.js") for i in range(4)]
+        config = dict(CONFIG, grouping=dict(CONFIG['grouping'], shard_size=4, max_files_per_commit=5))
+
+        def respond(messages, temperature):
+            prompt = messages[1]['content']
+            if 'formed separately' in prompt:
+                return json.dumps([["G1", "G3", "G2"], ["G4", "G1"]])
+            listed = [change.path for change in changes if f"in {change.path}" in prompt]
+            return json.dumps([listed[:2], listed[2:]])
+
+        client = MagicMock()
+        client.get_response.side_effect = respond
+        with patch('ai_git_cli.grouping.get_ai_client', return_value=client):
+            groups = group_changes(changes, config)
+
+        paths = [[change.path for change in group] for group in groups]
+        self.assertEqual(paths, [['api/f0.py', 'api/f1.py', 'web/f0.js', 'web/f1.js'],
+                                 ['api/f2.py', 'api/f3.py'], ['web/f2.js', 'web/f3.js']])
+        self.assertEqual(client.get_response.call_count, 3)
+
+class TestScaling(unittest.TestCase):
+    def measure(self, count):
+        changes = make_changes(count)
+        client = MagicMock()
+        client.get_response.return_value = json.dumps(model_groups(changes))
+        with patch('ai_git_cli.grouping.get_ai_client', return_value=client):
+            best = float('inf')
+            for _ in range(3):
+                start = time.perf_counter()
+                groups = group_changes(changes, CONFIG)
+                commits = [{'message': 'update', 'files': [change.path for change in group]} for group in groups]
+                build_commit_table(commits, ChangeSet(changes))
+                best = min(best, time.perf_counter() - start)
+        return best
+
+    def test_grouping_and_display_scale_linearly(self):
+        # Quadratic bookkeeping would make 4x the files take about 16x as long
+        small, large = self.measure(1000), self.measure(4000)
+        self.assertLess(large / small, 8)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from ai_git_cli.hunks import apply_hunks, parse_patch
+
+ORIGINAL = b"".join(f"line {i}\n".encode() for i in range(1, 21))
+
+PATCH = b"""diff --git a/notes.txt b/notes.txt
+index 1111111..2222222 100644
+--- a/notes.txt
++++ b/notes.txt
+@@ -1,4 +1,4 @@
+-line 1
++line one
+ line 2
+ line 3
+ line 4
+@@ -10,0 +11,2 @@ line 10
++inserted a
++inserted b
+@@ -18,3 +20,3 @@ line 17
+ line 18
+ line 19
+-line 20
++line twenty
+\\ No newline at end of file
+"""
+
+class TestHunks(unittest.TestCase):
+    def test_parse_patch_numbers_hunks_by_position(self):
+        hunks = parse_patch(PATCH)['notes.txt']
+        self.assertEqual([(h.old_start, h.old_count) for h in hunks], [(1, 4), (10, 0), (18, 3)])
+        self.assertEqual(hunks[1].lines, [b"+inserted a\n", b"+inserted b\n"])
+
+    def test_apply_selected_hunks_only(self):
+        hunks = parse_patch(PATCH)['notes.txt']
+        result = apply_hunks(ORIGINAL, [hunks[1]], 'notes.txt').decode()
+        self.assertIn("line 1\n", result)
+        self.assertIn("line 10\ninserted a\ninserted b\nline 11\n", result)
+
+        result = apply_hunks(ORIGINAL, hunks, 'notes.txt').decode()
+        self.assertTrue(result.startswith("line one\n"))
+        self.assertTrue(result.endswith("line 19\nline twenty"))
+
+    def test_stale_content_is_rejected(self):
+        hunks = parse_patch(PATCH)['notes.txt']
+        with self.assertRaises(ValueError):
+            apply_hunks(ORIGINAL.replace(b"line 1\n", b"changed\n"), [hunks[0]], 'notes.txt')
+
+    def test_quoted_paths(self):
+        patch = PATCH.replace(b"a/notes.txt", b'"a/caf\\303\\251.txt"').replace(b"b/notes.txt", b'"b/caf\\303\\251.txt"')
+        self.assertEqual(list(parse_patch(patch)), ['café.txt'])
+
+if __name__ == '__main__':
+    unittest.main()
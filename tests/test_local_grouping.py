@@ -0,0 +1,127 @@
+import json
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+from ai_git_cli.changes import Change
+from ai_git_cli.grouping import group_changes
+from ai_git_cli.local_grouping import cluster_changes, group_leftovers
+
+LANGUAGE_SPECIFIC = {
+    'python': {'grouping_instructions': 'Consider Python best practices.'},
+    'javascript': {'grouping_instructions': 'Group by JavaScript module.'},
+}
+
+def change(path, diff=''):
+    return Change(path, 'M', diff)
+
+def paths(groups):
+    return [[c.path for c in group] for group in groups]
+
+class TestClusterChanges(unittest.TestCase):
+    def test_tests_pair_with_their_sources(self):
+        changes = [change('src/app/parser.py'), change('tests/test_parser.py'), change('README.md')]
+        clusters, ambiguous = cluster_changes(changes, {'max_files_per_commit': 5}, LANGUAGE_SPECIFIC)
+        self.assertEqual(paths(clusters), [['src/app/parser.py', 'tests/test_parser.py']])
+        self.assertEqual([c.path for c in ambiguous], ['README.md'])
+
+    def test_sharing_a_directory_is_not_confident(self):
+        changes = [change('web/a.js'), change('web/b.js'), change('web/c.py')]
+        clusters, ambiguous = cluster_changes(changes, {'max_files_per_commit': 5}, LANGUAGE_SPECIFIC)
+        self.assertEqual(clusters, [])
+        self.assertEqual([c.path for c in ambiguous], ['web/a.js', 'web/b.js', 'web/c.py'])
+
+    def test_files_sharing_a_renamed_symbol_are_joined(self):
+        rename = "-    return load_settings()\n+    return read_settings()\n"
+        changes = [change('api/views.py', rename), change('cli/main.py', rename), change('docs/index.md', '+Hello\n')]
+        clusters, ambiguous = cluster_changes(changes, {'max_files_per_commit': 5}, LANGUAGE_SPECIFIC)
+        self.assertEqual(paths(clusters), [['api/views.py', 'cli/main.py']])
+        self.assertEqual(len(ambiguous), 1)
+
+    def test_symbol_moved_between_files_joins_them(self):
+        changes = [change('billing/invoice.py', "-def compute_tax(amount):\n-    pass\n"),
+                   change('billing/tax/rates.py', "+def compute_tax(amount):\n+    pass\n"),
+                   change('docs/index.md', '+Hello\n')]
+        clusters, _ = cluster_changes(changes, {'max_files_per_commit': 5}, LANGUAGE_SPECIFIC)
+        self.assertEqual(paths(clusters), [['billing/invoice.py', 'billing/tax/rates.py']])
+
+    def test_common_deleted_words_do_not_join_files(self):
+        changes = [change('billing/invoice.py', "-    return total\n"),
+                   change('docs/build/sphinx_ext.py', "-        return self.node\n"),
+                   change('web/views.js', "-  return this.render(function () {});\n")]
+        clusters, ambiguous = cluster_changes(changes, {'max_files_per_commit': 5}, LANGUAGE_SPECIFIC)
+        self.assertEqual(clusters, [])
+        self.assertEqual(len(ambiguous), 3)
+
+    def test_symbols_do_not_join_files_across_languages(self):
+        changes = [change('api/client.py', "-def fetch_orders():\n"), change('web/client.js', "+function fetch_orders() {\n")]
+        clusters, _ = cluster_changes(changes, {'max_files_per_commit': 5}, LANGUAGE_SPECIFIC)
+        self.assertEqual(clusters, [])
+
+    def test_clusters_over_max_files_per_commit_are_ambiguous(self):
+        moved = [change('pkg/old.py', "-def shared_helper():\n")]
+        moved += [change(f'pkg/user{i}.py', "+def shared_helper():\n") for i in range(3)]
+        clusters, ambiguous = cluster_changes(moved, {'max_files_per_commit': 3}, LANGUAGE_SPECIFIC)
+        self.assertEqual(clusters, [])
+        self.assertEqual(len(ambiguous), 4)
+
+    def test_leftovers_keep_directories_together_without_the_model(self):
+        changes = [change(f'pkg/module{i}.py') for i in range(7)] + [change('README.md'), change('docs/a/x.md')]
+        groups = group_leftovers(changes, {'max_files_per_commit': 3}, LANGUAGE_SPECIFIC)
+        self.assertEqual(paths(groups), [['README.md'], ['docs/a/x.md'], ['pkg/module0.py', 'pkg/module1.py', 'pkg/module2.py'],
+                                         ['pkg/module3.py', 'pkg/module4.py', 'pkg/module5.py'], ['pkg/module6.py']])
+
+    def test_large_change_sets_cluster_quickly(self):
+        changes = [change(f'pkg{i % 100}/module{i}.py', f"-old_name_{i % 10}\n+new_name\n") for i in range(5000)]
+        start = time.perf_counter()
+        cluster_changes(changes, {'max_files_per_commit': 5}, LANGUAGE_SPECIFIC)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+class TestGroupChanges(unittest.TestCase):
+    config = {
+        'commit_style': {'temperature': 0.7},
+        'custom_instructions': {'user_feedback': ''},
+        'grouping': {'strategy': 'hybrid', 'max_files_per_commit': 5, 'combine_similar_changes': True},
+        'language_specific': LANGUAGE_SPECIFIC,
+    }
+
+    @patch('ai_git_cli.grouping.get_ai_client')
+    def test_only_ambiguous_changes_reach_the_model(self, mock_get_ai_client):
+        ai_client = MagicMock()
+        ai_client.get_response.return_value = '[["README.md", "setup.py"]]'
+        mock_get_ai_client.return_value = ai_client
+        changes = [change('app/parser.py'), change('tests/test_parser.py'), change('README.md'), change('setup.py')]
+
+        groups = group_changes(changes, self.config)
+
+        self.assertEqual(paths(groups), [['app/parser.py', 'tests/test_parser.py'], ['README.md', 'setup.py']])
+        prompt = ai_client.get_response.call_args[0][0][1]['content']
+        self.assertNotIn('app/parser.py', prompt)
+        self.assertIn('Consider Python best practices.', prompt)
+
+    @patch('ai_git_cli.grouping.get_ai_client')
+    def test_confident_clusters_skip_the_model(self, mock_get_ai_client):
+        groups = group_changes([change('app/parser.py'), change('tests/test_parser.py')], self.config)
+        self.assertEqual(paths(groups), [['app/parser.py', 'tests/test_parser.py']])
+        mock_get_ai_client.assert_not_called()
+
+    @patch('ai_git_cli.grouping.get_ai_client')
+    def test_large_directory_is_split_by_the_model(self, mock_get_ai_client):
+        ai_client = MagicMock()
+        ai_client.get_response.return_value = json.dumps([['app/m0.py', 'app/m2.py', 'app/m4.py'], ['app/m1.py', 'app/m3.py', 'app/m5.py']])
+        mock_get_ai_client.return_value = ai_client
+        config = dict(self.config, grouping=dict(self.config['grouping'], max_files_per_commit=3))
+
+        groups = group_changes([change(f'app/m{i}.py') for i in range(6)], config)
+
+        self.assertEqual(paths(groups), [['app/m0.py', 'app/m2.py', 'app/m4.py'], ['app/m1.py', 'app/m3.py', 'app/m5.py']])
+        ai_client.get_response.assert_called_once()
+
+    @patch('ai_git_cli.grouping.get_ai_client')
+    def test_local_strategy_groups_a_directory_without_the_model(self, mock_get_ai_client):
+        config = dict(self.config, grouping=dict(self.config['grouping'], strategy='local'))
+        groups = group_changes([change('app/a.py'), change('app/b.py'), change('README.md')], config)
+        self.assertEqual(paths(groups), [['README.md'], ['app/a.py', 'app/b.py']])
+        mock_get_ai_client.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
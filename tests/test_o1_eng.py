@@ -0,0 +1,435 @@
+import difflib
+import hashlib
+import importlib.util
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_o1_eng():
+    # o1-eng.py is a script, not a module, and builds its OpenAI client on import
+    os.environ.setdefault('OPENAI_API_KEY', 'test_key')
+    spec = importlib.util.spec_from_file_location('o1_eng', os.path.join(REPO_ROOT, 'o1-eng.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+try:
+    o1_eng = load_o1_eng()
+except ImportError as e:  # termcolor and prompt_toolkit are the script's own dependencies
+    raise unittest.SkipTest(f"o1-eng.py dependencies are not installed: {e}")
+
+def sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class TestConversationState(unittest.TestCase):
+    def setUp(self):
+        self.conversation = o1_eng.ConversationState(max_history=4)
+
+    def test_files_are_ordered_by_content_hash(self):
+        files = {'b.py': 'print("b")\n', 'a.py': 'print("a")\n', 'c.py': 'print("c")\n'}
+        content = self.conversation.context_message(files)['content']
+        positions = {path: content.index(f"File: {path}\n") for path in files}
+        self.assertEqual(sorted(files, key=positions.get), sorted(files, key=lambda path: sha256(files[path])))
+
+    def test_file_message_is_rebuilt_only_when_files_change(self):
+        files = {'a.py': 'a = 1\n'}
+        first = self.conversation.context_message(files)
+        self.assertIs(self.conversation.context_message(dict(files)), first)
+
+        files['b.py'] = 'b = 2\n'
+        second = self.conversation.context_message(files)
+        self.assertIsNot(second, first)
+        self.assertIn('b = 2', second['content'])
+
+        files['a.py'] = 'a = 3\n'
+        self.assertIn('a = 3', self.conversation.context_message(files)['content'])
+        self.assertIsNone(self.conversation.context_message({}))
+
+    def test_messages_put_files_before_history_and_request(self):
+        self.conversation.record_turn('hello', 'hi')
+        messages = self.conversation.build_messages('next', {'a.py': 'a = 1\n'})
+        self.assertEqual([message['role'] for message in messages], ['user', 'user', 'assistant', 'user'])
+        self.assertIn('File: a.py', messages[0]['content'])
+        self.assertEqual(messages[-1]['content'], 'next')
+        self.assertEqual(len(self.conversation.build_messages('edit', include_history=False)), 1)
+
+    def test_history_is_trimmed_by_half(self):
+        for turn in range(2):
+            self.conversation.record_turn(f'question {turn}', f'answer {turn}')
+        self.assertEqual(len(self.conversation.history), 4)
+
+        self.conversation.record_turn('question 2', 'answer 2')
+        self.assertEqual([message['content'] for message in self.conversation.history], ['question 2', 'answer 2'])
+
+    def test_usage_without_prompt_token_details(self):
+        usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30)
+        turn = self.conversation.record_usage([{'role': 'user', 'content': 'abcd'}], usage)
+        self.assertEqual(turn, {'sent_chars': 4, 'prompt_tokens': 120, 'cached_tokens': 0, 'completion_tokens': 30})
+
+        details = SimpleNamespace(cached_tokens=64)
+        self.conversation.record_usage([], SimpleNamespace(prompt_tokens=100, completion_tokens=10, prompt_tokens_details=details))
+        self.assertEqual(self.conversation.turns[-1]['cached_tokens'], 64)
+        self.assertEqual(self.conversation.record_usage([], None)['prompt_tokens'], 0)
+        self.assertEqual(self.conversation.total_tokens(), 260)
+
+class TestIterEditedFiles(unittest.TestCase):
+    FILES = {'slow.py': 'slow\n', 'fast.py': 'fast\n', 'same.py': 'same\n'}
+    INSTRUCTIONS = {'slow.py': 'edit slow', 'fast.py': 'edit fast'}
+
+    def run_edits(self, edit, files=None, instructions=None, max_workers=4):
+        with patch.object(o1_eng, 'apply_edits_to_file', side_effect=edit), patch('builtins.print'):
+            return list(o1_eng.iter_edited_files(instructions or self.INSTRUCTIONS, files or self.FILES, max_workers))
+
+    def test_unchanged_files_first_then_in_completion_order(self):
+        def edit(file_path, content, instructions):
+            time.sleep(0.2 if file_path == 'slow.py' else 0.01)
+            return content.upper()
+
+        self.assertEqual(self.run_edits(edit), [('same.py', 'same\n'), ('fast.py', 'FAST\n'), ('slow.py', 'SLOW\n')])
+
+    def test_failed_file_yields_none_without_stopping_the_others(self):
+        def edit(file_path, content, instructions):
+            if file_path == 'fast.py':
+                raise RuntimeError("boom")
+            return content.upper()
+
+        with self.assertLogs(level='ERROR'):
+            results = dict(self.run_edits(edit))
+        self.assertEqual(results, {'same.py': 'same\n', 'fast.py': None, 'slow.py': 'SLOW\n'})
+        with patch.object(o1_eng, 'apply_edits_to_file', side_effect=edit), patch('builtins.print'), self.assertLogs(level='ERROR'):
+            self.assertEqual(o1_eng.apply_edit_instructions(self.INSTRUCTIONS, self.FILES), {'same.py': 'same\n', 'slow.py': 'SLOW\n'})
+
+    def test_abandoned_review_cancels_queued_files(self):
+        release = threading.Event()
+        started = []
+
+        def edit(file_path, content, instructions):
+            started.append(file_path)
+            if file_path != 'a.py':
+                release.wait(5)
+            return content
+
+        files = {'a.py': 'a\n', 'b.py': 'b\n', 'c.py': 'c\n'}
+        with patch.object(o1_eng, 'apply_edits_to_file', side_effect=edit), patch('builtins.print'):
+            edits = o1_eng.iter_edited_files({path: 'edit' for path in files}, files, max_workers=1)
+            self.assertEqual(next(edits), ('a.py', 'a\n'))
+            edits.close()
+            release.set()
+            time.sleep(0.1)
+        # b.py may already have been running; c.py was still queued and never starts
+        self.assertEqual(started[0], 'a.py')
+        self.assertNotIn('c.py', started)
+
+class TestAddFileToContext(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.added_files = {}
+        o1_eng.file_digests.clear()
+        self.print = patch('builtins.print').start()
+        self.addCleanup(patch.stopall)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_looks_binary(self):
+        self.assertFalse(o1_eng.looks_binary("héllo wörld\n".encode('utf-8')))
+        # A multi-byte character cut off by the sniff window is still text
+        self.assertFalse(o1_eng.looks_binary("héllo".encode('utf-8')[:2]))
+        self.assertTrue(o1_eng.looks_binary(b"PK\x03\x04\x00\x00"))
+        self.assertTrue(o1_eng.looks_binary(b"\xff\xfe\xfa text"))
+
+    def test_binary_files_are_rejected(self):
+        path = self.write('image.png', b"\x89PNG\r\n\x1a\n\x00\x00")
+        with self.assertLogs(level='ERROR'):
+            o1_eng.add_file_to_context(path, self.added_files)
+        self.assertEqual(self.added_files, {})
+
+    def test_files_over_the_size_limit_are_rejected_before_reading(self):
+        path = self.write('big.txt', b"x" * (o1_eng.MAX_CONTEXT_FILE_BYTES + 1))
+        with patch.object(o1_eng, '_read_text') as read_text, self.assertLogs(level='ERROR'):
+            o1_eng.add_file_to_context(path, self.added_files)
+        read_text.assert_not_called()
+        self.assertEqual(self.added_files, {})
+
+        path = self.write('limit.txt', b"x" * o1_eng.MAX_CONTEXT_FILE_BYTES)
+        o1_eng.add_file_to_context(path, self.added_files)
+        self.assertEqual(len(self.added_files[path]), o1_eng.MAX_CONTEXT_FILE_BYTES)
+
+    def test_large_files_are_mapped_and_small_ones_read(self):
+        mapped = []
+        real_mmap = o1_eng.mmap.mmap
+
+        def spy(*args, **kwargs):
+            mapped.append(args)
+            return real_mmap(*args, **kwargs)
+
+        small = self.write('small.py', b"a" * (o1_eng.MMAP_THRESHOLD - 1))
+        large = self.write('large.py', "é\r\n".encode('utf-8') * (o1_eng.MMAP_THRESHOLD // 3))
+        with patch.object(o1_eng.mmap, 'mmap', side_effect=spy):
+            o1_eng.add_file_to_context(small, self.added_files)
+            self.assertEqual(mapped, [])
+            o1_eng.add_file_to_context(large, self.added_files)
+        self.assertEqual(len(mapped), 1)
+        self.assertEqual(self.added_files[large], "é\n" * (o1_eng.MMAP_THRESHOLD // 3))
+        with open(large, 'rb') as f:
+            self.assertEqual(o1_eng.file_digests[large][1], hashlib.sha256(f.read()).hexdigest())
+
+    def test_newlines_are_normalized(self):
+        path = self.write('mixed.py', b"one\r\ntwo\rthree\n")
+        o1_eng.add_file_to_context(path, self.added_files)
+        self.assertEqual(self.added_files[path], "one\ntwo\nthree\n")
+
+    def test_unchanged_file_is_not_read_again(self):
+        path = self.write('a.py', b"a = 1\n")
+        o1_eng.add_file_to_context(path, self.added_files)
+        digest = o1_eng.file_digests[path][1]
+        self.assertEqual(o1_eng.file_digest(path, 'ignored'), digest)
+
+        with patch.object(o1_eng, '_read_text') as read_text:
+            o1_eng.add_file_to_context(path, self.added_files)
+        read_text.assert_not_called()
+
+        # Rewriting the file changes its stat key, so it is read again
+        self.write('a.py', b"a = 22\n")
+        o1_eng.add_file_to_context(path, self.added_files)
+        self.assertEqual(self.added_files[path], "a = 22\n")
+        self.assertNotEqual(o1_eng.file_digests[path][1], digest)
+
+    def test_directories_are_rejected(self):
+        with self.assertLogs(level='ERROR'):
+            o1_eng.add_file_to_context(self.tmpdir.name, self.added_files)
+        self.assertEqual(self.added_files, {})
+
+def make_index(paths):
+    with patch.object(o1_eng.FileIndex, '_list_files', return_value=paths):
+        return o1_eng.FileIndex()
+
+class CountingList(list):
+    """Counts paths looked at so tests can tell narrowing from a rescan."""
+    reads = 0
+
+    def __getitem__(self, index):
+        CountingList.reads += 1
+        return super().__getitem__(index)
+
+class TestFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        self.print = patch('builtins.print').start()
+        self.addCleanup(patch.stopall)
+        # Never pick up a repository the temporary directory happens to be inside
+        patch.dict(os.environ, {'GIT_CEILING_DIRECTORIES': os.path.dirname(self.root)}).start()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def touch(self, *paths):
+        for path in paths:
+            full = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+            with open(full, 'w') as f:
+                f.write(path)
+
+    def test_git_listing_includes_untracked_files_and_honours_gitignore(self):
+        subprocess.run(['git', 'init', '-q', self.root], check=True)
+        self.touch('.gitignore', 'src/app.py', 'build/out.py', 'notes.txt')
+        with open(os.path.join(self.root, '.gitignore'), 'w') as f:
+            f.write("build/\n")
+        subprocess.run(['git', 'add', 'src/app.py'], cwd=self.root, check=True)
+        self.assertEqual(o1_eng.FileIndex(self.root).paths, ['.gitignore', 'notes.txt', 'src/app.py'])
+
+    def test_directory_walk_outside_a_git_checkout(self):
+        self.touch('README.md', 'pkg/mod.py', 'pkg/sub/deep.py', '.venv/lib/site.py', '.hidden/x.py')
+        index = o1_eng.FileIndex(self.root)
+        self.assertEqual(index.paths, ['README.md', 'pkg/mod.py', 'pkg/sub/deep.py'])
+        self.assertEqual(index.lowered, ['readme.md', 'pkg/mod.py', 'pkg/sub/deep.py'])
+
+    def test_add_inserts_in_sorted_order_once(self):
+        index = make_index(['a.py', 'c/Main.py', 'd.txt'])
+        before = index.snapshot()
+        index.add('c/./B.py')
+        index.add('c/B.py')
+        self.assertEqual(index.paths, ['a.py', 'c/B.py', 'c/Main.py', 'd.txt'])
+        self.assertEqual(index.lowered, ['a.py', 'c/b.py', 'c/main.py', 'd.txt'])
+        # Readers holding the old lists never see them change
+        self.assertEqual(before[0], ['a.py', 'c/Main.py', 'd.txt'])
+
+    def test_created_files_are_indexed(self):
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        patch.object(o1_eng, 'file_index', make_index(['z.py'])).start()
+
+        response = "```python\n### FILE: app/new_module.py\nprint('new')\n```"
+        self.assertTrue(o1_eng.apply_creation_steps(response, {}))
+        self.assertEqual(o1_eng.file_index.paths, ['app/new_module.py', 'z.py'])
+
+    def test_glob_translation(self):
+        cases = [
+            ('src/*.py', ['src/a.py'], ['src/sub/b.py', 'src/a.pyc']),
+            ('src/**/*.py', ['src/a.py', 'src/sub/deep/b.py'], ['lib/a.py']),
+            ('**/test_?.py', ['test_a.py', 'pkg/tests/test_b.py'], ['test_ab.py']),
+            ('data/[ab]?.csv', ['data/a1.csv', 'data/b2.csv'], ['data/c1.csv', 'data/a/.csv']),
+            ('[!a]*.md', ['b.md', 'README.md'], ['a.md', 'x/y.md']),
+            ('\\*.py', ['*.py'], ['a.py']),
+            ('[*]x[?].txt', ['*x?.txt'], ['axb.txt']),
+            ('weird[\\].txt', ['weird\\.txt'], ['weirdx.txt']),
+            ('a+b(c).txt', ['a+b(c).txt'], ['aab(c).txt']),
+            ('[unclosed.txt', ['[unclosed.txt'], ['u.txt']),
+        ]
+        for pattern, matching, other in cases:
+            regex = o1_eng.glob_to_regex(pattern)
+            for path in matching:
+                self.assertTrue(regex.match(path), f"{pattern} should match {path}")
+            for path in other:
+                self.assertFalse(regex.match(path), f"{pattern} should not match {path}")
+
+    def test_expand_paths(self):
+        index = make_index(['README.md', 'src/a.py', 'src/b.py', 'src/sub/c.py'])
+        self.assertEqual(o1_eng.expand_paths(['src/b.py', 'src/*.py', 'other.txt'], index), ['src/b.py', 'src/a.py', 'other.txt'])
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(o1_eng.expand_paths(['docs/*.md'], index), [])
+
+class TestFuzzyPathCompleter(unittest.TestCase):
+    def complete(self, completer, text):
+        from prompt_toolkit.document import Document
+        return [completion.text for completion in completer.get_completions(Document(text), None)]
+
+    def test_ranking_tiers(self):
+        index = make_index(['README.md', 'lib/mapping/util.py', 'src/a/pkg/p.py', 'src/app.py', 'app/main.py', 'application.py'])
+        completer = o1_eng.FuzzyPathCompleter(index, o1_eng.COMMANDS)
+        self.assertEqual(self.complete(completer, '/add APP'), [
+            'app/main.py', 'application.py',   # prefix, shorter first
+            'src/app.py',                      # in the file name
+            'lib/mapping/util.py',             # anywhere in the path
+            'src/a/pkg/p.py',                  # characters in order
+        ])
+
+    def test_commands_complete_only_at_the_start(self):
+        completer = o1_eng.FuzzyPathCompleter(make_index(['review.md']), o1_eng.COMMANDS)
+        self.assertEqual(self.complete(completer, '/re'), ['/reset', '/review'])
+        self.assertEqual(self.complete(completer, '/add /re'), [])
+        self.assertEqual(self.complete(completer, '/add '), [])
+
+    def test_growing_query_narrows_previous_matches(self):
+        paths = sorted(f"pkg{i}/module_{j}.py" for i in range(20) for j in range(20))
+        index = make_index(paths)
+        index.lowered = CountingList(index.lowered)
+        completer = o1_eng.FuzzyPathCompleter(index, o1_eng.COMMANDS)
+        completer._matches('pkg1/')
+
+        CountingList.reads = 0
+        narrowed = completer._matches('pkg1/module_1')
+        # Only the 20 paths under pkg1/ are looked at again
+        self.assertLess(CountingList.reads, len(paths))
+        self.assertEqual(narrowed, o1_eng.FuzzyPathCompleter(make_index(paths), o1_eng.COMMANDS)._matches('pkg1/module_1'))
+        self.assertEqual(narrowed[:2], ['pkg1/module_1.py', 'pkg1/module_10.py'])
+
+        # A query that is not an extension of the last one starts over
+        CountingList.reads = 0
+        completer._matches('module_3')
+        self.assertGreaterEqual(CountingList.reads, len(paths))
+
+    def test_index_change_forces_a_rescan(self):
+        index = make_index(['apps/a.py', 'apps/b.py'])
+        completer = o1_eng.FuzzyPathCompleter(index, o1_eng.COMMANDS)
+        self.assertEqual(completer._matches('app'), ['apps/a.py', 'apps/b.py'])
+        index.add('apple.py')
+        self.assertEqual(completer._matches('appl'), ['apple.py'])
+
+    def test_keystrokes_stay_fast_on_200k_paths(self):
+        paths = [f"pkg{i % 200}/sub{i % 7}/module_{i}.py" for i in range(200000)]
+        index = make_index(paths)
+        queries = ['p', 'pk', 'pkg', 'pkg1', 'pkg12', 'pkg12s', 'pkg12su', 'pkg12sub', 'pkg12sub3', 'pkg12sub3m',
+                   'pkg12sub3mod', 'pkg12sub3mod7', 'm', 'mo', 'mod', 'modu', 'module_1', 'module_19']
+        # Best of a few runs to keep a busy machine from failing the benchmark
+        runs = []
+        for _ in range(3):
+            completer = o1_eng.FuzzyPathCompleter(index, o1_eng.COMMANDS)
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                completer._matches(query)
+                timings.append(time.perf_counter() - start)
+            runs.append(timings)
+        best = [min(run[i] for run in runs) for i in range(len(queries))]
+        self.assertLess(statistics.median(best), 0.1)
+        # The first keystrokes and the first scattered search scan every path
+        self.assertLess(max(best), 0.25)
+
+def block(search, replace):
+    return f"<<<<<<< SEARCH\n{search}=======\n{replace}>>>>>>> REPLACE"
+
+class TestSearchReplace(unittest.TestCase):
+    CONTENT = "def first():\n    pass\n\ndef second():\n    pass\n"
+
+    def apply(self, content, *blocks):
+        return o1_eng.apply_search_replace_blocks(content, o1_eng.parse_search_replace_blocks("\n".join(blocks)))
+
+    def test_exact_match(self):
+        result = self.apply(self.CONTENT, block("def second():\n", "def second(value):\n"))
+        self.assertEqual(result, "def first():\n    pass\n\ndef second(value):\n    pass\n")
+
+    def test_match_ignoring_whitespace(self):
+        result = self.apply(self.CONTENT, block("def first():  \n  pass\n", "def first():\n    return 1\n"))
+        self.assertEqual(result, "def first():\n    return 1\n\ndef second():\n    pass\n")
+
+    def test_fuzzy_match_threshold(self):
+        line = "abcdefghijklmnopqrstuvwxyz0123456789ABCDEFGHIJKLMN"
+        content = f"x = 1\n{line}\ny = 2\n"
+        # Every '#' costs one matching character out of fifty
+        close, far = "#" * 7 + line[7:], "#" * 8 + line[8:]
+        self.assertGreater(difflib.SequenceMatcher(None, line, close).ratio(), o1_eng.FUZZY_MATCH_THRESHOLD)
+        self.assertLess(difflib.SequenceMatcher(None, line, far).ratio(), o1_eng.FUZZY_MATCH_THRESHOLD)
+
+        self.assertEqual(self.apply(content, block(f"{close}\n", "replaced\n")), "x = 1\nreplaced\ny = 2\n")
+        with self.assertRaises(ValueError):
+            self.apply(content, block(f"{far}\n", "replaced\n"))
+
+    def test_repeated_anchors_resolve_in_order(self):
+        result = self.apply(self.CONTENT, block("    pass\n", "    return 1\n"), block("    pass\n", "    return 2\n"))
+        self.assertEqual(result, "def first():\n    return 1\n\ndef second():\n    return 2\n")
+        # A repeated SEARCH text means its first occurrence after the previous block
+        result = self.apply("a\nx\nb\nx\nc\nx\n", block("b\n", "B\n"), block("x\n", "X\n"))
+        self.assertEqual(result, "a\nx\nB\nX\nc\nx\n")
+
+    def test_empty_search_appends(self):
+        result = self.apply(self.CONTENT, block("", "\ndef third():\n    pass\n"))
+        self.assertEqual(result, self.CONTENT + "\ndef third():\n    pass\n")
+
+    def test_malformed_blocks_are_rejected(self):
+        with self.assertRaises(ValueError):
+            o1_eng.parse_search_replace_blocks("Here is the new file:\nprint('hi')\n")
+        with self.assertRaises(ValueError):
+            o1_eng.parse_search_replace_blocks(block("a\n", "b\n") + "\n<<<<<<< SEARCH\nc\n")
+
+    def test_falls_back_to_full_rewrite_when_a_block_cannot_be_placed(self):
+        responses = iter([
+            block("def first():\n", "def first(value):\n") + "\n" + block("def missing():\n", "def other():\n"),
+            "def rewritten():\n    pass\n",
+        ])
+        with patch.object(o1_eng, 'chat_with_ai', side_effect=lambda *args, **kwargs: next(responses)) as chat, \
+                patch('builtins.print'), self.assertLogs(level='WARNING'):
+            result = o1_eng.apply_edits_to_file('a.py', self.CONTENT, 'rename')
+        # Nothing from the placeable first block leaks into the result
+        self.assertEqual(result, "def rewritten():\n    pass")
+        self.assertEqual([call.kwargs['instructions'] for call in chat.call_args_list],
+                         [o1_eng.SEARCH_REPLACE_PROMPT, o1_eng.APPLY_EDITS_PROMPT])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from ai_git_cli.changes import Change
+from ai_git_cli.prompt_builder import summarize_overflow
+from ai_git_cli.prompts import create_commit_message_prompt, create_grouping_prompt
+from ai_git_cli.tokens import count_tokens
+
+GROUPING = {'max_files_per_commit': 5, 'combine_similar_changes': True}
+COMMIT_STYLE = {'format': 'conventional', 'conventional_prefixes': {'feat': 'Features', 'fix': 'Bug Fixes'}}
+
+class TestCountTokens(unittest.TestCase):
+    def test_estimate_follows_word_splitting(self):
+        self.assertEqual(count_tokens("hello world"), 2)
+        self.assertGreater(count_tokens("getUnstagedChangesFromRepository"), 3)
+        self.assertEqual(count_tokens(""), 0)
+
+class TestPromptPacking(unittest.TestCase):
+    def test_grouping_prompt_summarizes_bulk_directories(self):
+        changes = [Change(f"vendor/lib/module{i}/index.js") for i in range(2000)]
+        changes += [Change("src/app.py"), Change("src/util.py"), Change("README.md")]
+
+        with self.assertLogs(level='INFO') as logs:
+            prompt = create_grouping_prompt(changes, "", GROUPING, token_limit=800)
+
+        self.assertLessEqual(count_tokens(prompt), 800)
+        for path in ("src/app.py", "src/util.py", "README.md"):
+            self.assertIn(f"in {path}\n", prompt)
+        self.assertRegex(prompt, r"\+\d+ files under vendor/lib/\n")
+        self.assertIn("Only group the files listed by name", prompt)
+        self.assertRegex(logs.output[-1], r"Grouping prompt: \d+ of 800 tokens")
+
+    def test_small_prompts_are_unchanged(self):
+        changes = [Change("src/app.py", 'M', "+print('hi')")]
+        prompt = create_commit_message_prompt(changes, "", COMMIT_STYLE, token_limit=4000)
+        self.assertTrue(prompt.endswith("Diff:\n+print('hi')"))
+        self.assertNotIn("left out", prompt)
+
+    def test_diffs_that_do_not_fit_are_named(self):
+        changes = [Change("src/small.py", 'M', "+x = 1"), Change("vendor/big.js", 'M', "+" + "var a = 1;\n+" * 2000)]
+        prompt = create_commit_message_prompt(changes, "", COMMIT_STYLE, token_limit=500)
+        self.assertIn("+x = 1", prompt)
+        self.assertIn("Diffs left out for space: +1 file under vendor/", prompt)
+        self.assertLessEqual(count_tokens(prompt), 500)
+
+class TestSummarizeOverflow(unittest.TestCase):
+    def test_lines_per_top_level_directory(self):
+        changes = [Change(f"vendor/pkg/{i}.js") for i in range(3)] + [Change("setup.py")]
+        changes += [Change(f"dir{i}/a.py") for i in range(6)]
+        self.assertEqual(summarize_overflow(changes), [
+            "+3 files under vendor/pkg/",
+            "+1 file in the repository root",
+            "+1 file under dir0/",
+            "+1 file under dir1/",
+            "+4 files in 4 other directories",
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
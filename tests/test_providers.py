@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+from ai_git_cli.ai_client import close_ai_clients, get_ai_client
+from ai_git_cli.changes import Change
+from ai_git_cli.commit_message import generate_commit_message
+from ai_git_cli.grouping import group_changes
+from ai_git_cli.providers import FakeProvider, OpenAIProvider, Provider, create_provider
+from ai_git_cli.single_pass import group_and_generate
+
+CONFIG = {
+    'ai_provider': {'name': 'fake', 'model': 'fake-model'},
+    'commit_style': {'format': 'conventional', 'conventional_prefixes': {'chore': 'Chores'}, 'temperature': 0.7},
+    'custom_instructions': {'user_feedback': ''},
+    'grouping': {'strategy': 'ai', 'max_files_per_commit': 2, 'combine_similar_changes': True},
+    'advanced': {'max_concurrency': 4},
+    'cache': {'enabled': False},
+}
+
+CHANGES = [Change('src/a.py', 'M', '+a'), Change('src/b.py', 'M', '+b'), Change('src/c.py', 'M', '+c'), Change('README.md', 'M', '+d')]
+
+class TestCreateProvider(unittest.TestCase):
+    def test_backend_is_chosen_by_name(self):
+        self.assertIsInstance(create_provider({'name': 'fake'}), FakeProvider)
+        provider = create_provider({'name': 'openai-compatible', 'base_url': 'http://localhost:8080/v1'})
+        self.assertIsInstance(provider, OpenAIProvider)
+        self.assertEqual(str(provider.client.base_url), 'http://localhost:8080/v1/')
+        provider.close()
+
+    @patch('ai_git_cli.providers.OpenAIProvider')
+    def test_missing_api_key_defaults_to_empty(self, mock_provider):
+        create_provider({'name': 'openai'})
+        mock_provider.assert_called_once_with('', None, 10, 60.0)
+
+    def test_compatible_provider_requires_base_url(self):
+        with self.assertRaises(ValueError):
+            create_provider({'name': 'openai-compatible'})
+
+    def test_unknown_provider_is_rejected(self):
+        with self.assertRaises(ValueError):
+            create_provider({'name': 'nope'})
+
+class TestProvider(unittest.TestCase):
+    def test_async_completion_defaults_to_a_worker_thread(self):
+        class BlockingProvider(Provider):
+            def complete(self, model, messages, temperature, timeout):
+                return f"{model} from {threading.current_thread() is threading.main_thread()}"
+
+        response = asyncio.run(BlockingProvider().acomplete('fake', [], 0.7, 1.0))
+        self.assertEqual(response, 'fake from False')
+
+    def test_provider_without_complete_cannot_be_created(self):
+        class IncompleteProvider(Provider):
+            def stream(self, model, messages, temperature, timeout):
+                return iter(['partial'])
+
+        with self.assertRaises(TypeError):
+            IncompleteProvider()
+
+class TestFakeProvider(unittest.TestCase):
+    def tearDown(self):
+        close_ai_clients()
+
+    def test_grouping_and_messages_run_end_to_end(self):
+        groups = group_changes(CHANGES, CONFIG)
+        self.assertEqual([[change.path for change in group] for group in groups],
+                         [['src/a.py', 'src/b.py'], ['src/c.py'], ['README.md']])
+
+        commits = generate_commit_message(groups, CONFIG)
+        self.assertEqual([commit['message'] for commit in commits],
+                         ['chore: update 2 files in src', 'chore: update 1 file in src', 'chore: update 1 file in the repository root'])
+        batched = generate_commit_message(groups, dict(CONFIG, advanced={'generation_mode': 'batch'}))
+        self.assertEqual(batched, commits)
+        self.assertEqual(get_ai_client(CONFIG).provider.requests, 5)
+
+    def test_single_pass_plan_covers_every_file(self):
+        commits = group_and_generate(CHANGES, CONFIG)
+        self.assertEqual(sorted(path for commit in commits for path in commit['files']), sorted(change.path for change in CHANGES))
+
+if __name__ == '__main__':
+    unittest.main()
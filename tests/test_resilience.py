@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock
+from ai_git_cli.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceededError, RateLimiter, ResilientCaller, RetryPolicy, retry_after_seconds
+)
+
+class TransientError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("transient")
+        self.response = MagicMock(headers={'retry-after': retry_after} if retry_after else {})
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def is_transient(error):
+    return isinstance(error, TransientError)
+
+class TestResilientCaller(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def make_caller(self, **kwargs):
+        kwargs.setdefault('policy', RetryPolicy(max_retries=3, base_delay=1.0, max_delay=8.0))
+        return ResilientCaller(retryable=is_transient, clock=self.clock, **kwargs)
+
+    def test_transient_errors_are_retried_with_jittered_backoff(self):
+        caller = self.make_caller()
+        func = MagicMock(side_effect=[TransientError(), TransientError(), 'ok'])
+
+        self.assertEqual(caller.call(func, sleep=self.clock.sleep), 'ok')
+
+        self.assertEqual(func.call_count, 3)
+        metrics = caller.metrics.snapshot()
+        self.assertEqual(metrics['retries'], 2)
+        self.assertLessEqual(metrics['backoff_seconds'], 1.0 + 2.0)
+
+    def test_permanent_errors_are_not_retried(self):
+        caller = self.make_caller()
+        func = MagicMock(side_effect=ValueError("bad request"))
+        with self.assertRaises(ValueError):
+            caller.call(func, sleep=self.clock.sleep)
+        self.assertEqual(func.call_count, 1)
+
+    def test_retry_after_header_is_honoured(self):
+        caller = self.make_caller()
+        func = MagicMock(side_effect=[TransientError(retry_after='7'), 'ok'])
+        caller.call(func, sleep=self.clock.sleep)
+        self.assertGreaterEqual(self.clock.now, 7)
+
+    def test_deadline_stops_retries_and_bounds_timeout(self):
+        caller = self.make_caller(deadline=5.0)
+        timeouts = []
+
+        def func(remaining):
+            timeouts.append(remaining)
+            raise TransientError(retry_after='10')
+
+        with self.assertRaises(DeadlineExceededError):
+            caller.call(func, sleep=self.clock.sleep)
+        self.assertEqual(timeouts, [5.0])
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=self.clock)
+        caller = self.make_caller(policy=RetryPolicy(max_retries=0), circuit_breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(TransientError):
+                caller.call(MagicMock(side_effect=TransientError()), sleep=self.clock.sleep)
+
+        func = MagicMock(return_value='ok')
+        with self.assertRaises(CircuitOpenError):
+            caller.call(func, sleep=self.clock.sleep)
+        func.assert_not_called()
+
+        self.clock.now += 31
+        self.assertEqual(caller.call(func, sleep=self.clock.sleep), 'ok')
+
+    def test_half_open_circuit_lets_one_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=self.clock)
+        breaker.record_failure()
+        self.clock.now += 31
+
+        breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        self.clock.now += 31
+        breaker.before_call()
+        breaker.record_success()
+        breaker.before_call()
+        breaker.before_call()
+
+    def test_probe_ending_in_a_permanent_error_frees_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=self.clock)
+        caller = self.make_caller(policy=RetryPolicy(max_retries=0), circuit_breaker=breaker)
+        breaker.record_failure()
+        self.clock.now += 31
+
+        with self.assertRaises(ValueError):
+            caller.call(MagicMock(side_effect=ValueError('bad request')), sleep=self.clock.sleep)
+        self.assertEqual(caller.call(MagicMock(return_value='ok'), sleep=self.clock.sleep), 'ok')
+
+    def test_concurrent_callers_send_one_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=self.clock)
+        breaker.record_failure()
+        self.clock.now += 31
+        barrier = threading.Barrier(8)
+        admitted = []
+
+        def attempt():
+            barrier.wait()
+            try:
+                breaker.before_call()
+                admitted.append(True)
+            except CircuitOpenError:
+                pass
+
+        threads = [threading.Thread(target=attempt) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(admitted), 1)
+
+    def test_async_calls_share_the_retry_logic(self):
+        caller = self.make_caller()
+        attempts = []
+
+        async def func(remaining):
+            attempts.append(remaining)
+            if len(attempts) == 1:
+                raise TransientError()
+            return 'ok'
+
+        async def sleep(seconds):
+            self.clock.sleep(seconds)
+
+        self.assertEqual(asyncio.run(caller.acall(func, sleep=sleep)), 'ok')
+        self.assertEqual(len(attempts), 2)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_requests_beyond_the_rate_wait(self):
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, clock=clock)
+        self.assertEqual(limiter.reserve(100), 0)
+        self.assertEqual(limiter.reserve(500), 0)
+        self.assertAlmostEqual(limiter.reserve(300), 30.0)
+
+class TestRetryAfter(unittest.TestCase):
+    def test_milliseconds_header_takes_precedence(self):
+        error = MagicMock(response=MagicMock(headers={'retry-after-ms': '1500', 'retry-after': '9'}))
+        self.assertEqual(retry_after_seconds(error), 1.5)
+
+if __name__ == '__main__':
+    unittest.main()
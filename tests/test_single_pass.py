@@ -0,0 +1,74 @@
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+from ai_git_cli.changes import Change
+from ai_git_cli.single_pass import group_and_generate, validate_commit_plan
+
+CONFIG = {
+    'commit_style': {'format': 'conventional', 'conventional_prefixes': {'feat': 'Features', 'docs': 'Documentation'}, 'temperature': 0.7},
+    'custom_instructions': {'user_feedback': ''},
+    'grouping': {'strategy': 'local', 'max_files_per_commit': 2, 'combine_similar_changes': True},
+    'advanced': {'single_pass': True},
+}
+
+CHANGES = [
+    Change('app/parser.py', 'M', '+def parse(): pass'),
+    Change('tests/test_parser.py', 'M', '+def test_parse(): pass'),
+    Change('README.md', 'M', '+Parser docs'),
+]
+
+class TestValidateCommitPlan(unittest.TestCase):
+    paths = {'a.py', 'b.py', 'c.py'}
+
+    def test_valid_plan_becomes_commit_messages(self):
+        plan = {'commits': [{'files': ['a.py', 'b.py'], 'type': 'feat', 'subject': 'add a', 'body': ''}]}
+        self.assertEqual(validate_commit_plan(plan, self.paths, 2), [{'message': 'feat: add a', 'files': ['a.py', 'b.py']}])
+
+    def test_invalid_plans_are_rejected(self):
+        invalid_plans = [
+            [{'files': ['a.py'], 'type': 'feat', 'subject': 'add a'}],
+            {'commits': [{'files': ['z.py'], 'type': 'feat', 'subject': 'add z'}]},
+            {'commits': [{'files': ['a.py'], 'type': 'feat', 'subject': 'x'}, {'files': ['a.py'], 'type': 'fix', 'subject': 'y'}]},
+            {'commits': [{'files': ['a.py', 'b.py', 'c.py'], 'type': 'feat', 'subject': 'all'}]},
+            {'commits': [{'files': ['a.py'], 'type': 'feat'}]},
+        ]
+        for plan in invalid_plans:
+            with self.assertRaises(ValueError):
+                validate_commit_plan(plan, self.paths, 2)
+
+class TestGroupAndGenerate(unittest.TestCase):
+    @patch('ai_git_cli.single_pass.get_ai_client')
+    def test_one_request_returns_groups_and_messages(self, mock_get_ai_client):
+        ai_client = MagicMock()
+        ai_client.get_response.return_value = json.dumps({'commits': [
+            {'files': ['app/parser.py', 'tests/test_parser.py'], 'type': 'feat', 'subject': 'add parser', 'body': ''},
+            {'files': ['README.md'], 'type': 'docs', 'subject': 'document parser', 'body': ''},
+        ]})
+        mock_get_ai_client.return_value = ai_client
+
+        commit_messages = group_and_generate(CHANGES, CONFIG)
+
+        self.assertEqual(ai_client.get_response.call_count, 1)
+        self.assertEqual([c['message'] for c in commit_messages], ['feat: add parser', 'docs: document parser'])
+
+    @patch('ai_git_cli.single_pass.get_ai_client')
+    def test_malformed_response_falls_back(self, mock_get_ai_client):
+        mock_get_ai_client.return_value = MagicMock(get_response=MagicMock(return_value='not json'))
+        self.assertIsNone(group_and_generate(CHANGES, CONFIG))
+
+    @patch('ai_git_cli.single_pass.generate_commit_message')
+    @patch('ai_git_cli.single_pass.get_ai_client')
+    def test_files_left_out_go_through_two_phases(self, mock_get_ai_client, mock_generate_commit_message):
+        mock_get_ai_client.return_value = MagicMock(get_response=MagicMock(return_value=json.dumps({'commits': [
+            {'files': ['app/parser.py', 'tests/test_parser.py'], 'type': 'feat', 'subject': 'add parser'},
+        ]})))
+        mock_generate_commit_message.return_value = [{'message': 'docs: document parser', 'files': ['README.md']}]
+
+        commit_messages = group_and_generate(CHANGES, CONFIG)
+
+        self.assertEqual([c['files'] for c in commit_messages], [['app/parser.py', 'tests/test_parser.py'], ['README.md']])
+        groups = mock_generate_commit_message.call_args[0][0]
+        self.assertEqual([[c.path for c in group] for group in groups], [['README.md']])
+
+if __name__ == '__main__':
+    unittest.main()
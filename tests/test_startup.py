@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('git', 'rich', 'openai', 'httpx', 'yaml', 'dotenv')
+
+def run_cli(args, cwd):
+    # Report wall time and any heavy modules pulled in by running the CLI
+    code = f"""
+import json, sys, time
+start = time.perf_counter()
+sys.argv = ['ai-git-cli'] + {args!r}
+from ai_git_cli.main import cli_main
+try:
+    cli_main()
+except SystemExit:
+    pass
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'heavy': sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)}}))
+"""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    result = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        subprocess.run(['git', 'init', '-q', self.tmpdir.name], check=True)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_help_does_not_import_dependencies(self):
+        self.assertEqual(run_cli(['--help'], self.tmpdir.name)['heavy'], [])
+
+    def test_no_changes_exit_is_fast(self):
+        # Best of a few runs to keep a busy machine from failing the benchmark
+        runs = [run_cli(['commit'], self.tmpdir.name) for _ in range(3)]
+        self.assertEqual(runs[0]['heavy'], [])
+        self.assertLess(min(run['elapsed'] for run in runs), 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
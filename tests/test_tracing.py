@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+from ai_git_cli import tracing
+from ai_git_cli.ai_client import close_ai_clients, get_ai_client
+from ai_git_cli.tracing import span, start_tracing, stop_tracing
+
+CONFIG = {'ai_provider': {'name': 'fake', 'model': 'fake'}, 'cache': {'enabled': False}}
+MESSAGES = [{'role': 'system', 'content': 'system'}, {'role': 'user', 'content': 'Describe:\n- Modified in a.py'}]
+
+class TestTracing(unittest.TestCase):
+    def tearDown(self):
+        stop_tracing()
+        close_ai_clients()
+
+    def test_spans_are_no_ops_while_tracing_is_off(self):
+        with span('diff.collect') as current:
+            current.set(changes=3)
+        self.assertIsNone(tracing._tracer)
+
+    def test_spans_record_attributes_and_errors(self):
+        tracer = start_tracing()
+        with span('outer', files=2) as current:
+            with span('inner'):
+                pass
+            current.set(bytes=10)
+        with self.assertRaises(ValueError):
+            with span('failing'):
+                raise ValueError("boom")
+
+        spans = tracer.finished()
+        self.assertEqual([s.name for s in spans], ['outer', 'inner', 'failing'])
+        self.assertEqual(spans[0].attributes, {'files': 2, 'bytes': 10})
+        self.assertGreaterEqual(spans[0].duration, spans[1].duration)
+        self.assertEqual(spans[2].attributes['error'], 'ValueError')
+
+    def test_ai_requests_carry_token_and_retry_counts(self):
+        tracer = start_tracing()
+        get_ai_client(CONFIG).get_response(MESSAGES)
+
+        summary = {row['name']: row for row in tracer.summary()}
+        counters = summary['ai.request']['counters']
+        self.assertEqual(summary['ai.request']['calls'], 1)
+        self.assertGreater(counters['prompt_tokens'], 0)
+        self.assertGreater(counters['response_bytes'], 0)
+        self.assertEqual(counters['retries'], 0)
+
+    def test_export_formats(self):
+        tracer = start_tracing()
+        with span('git.write-tree', output_bytes=41):
+            pass
+        with span('git.write-tree', output_bytes=41):
+            pass
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            jsonl = os.path.join(tmpdir, 'trace.jsonl')
+            chrome = os.path.join(tmpdir, 'trace.json')
+            tracer.write(jsonl)
+            tracer.write(chrome)
+            with open(jsonl) as f:
+                lines = [json.loads(line) for line in f]
+            with open(chrome) as f:
+                events = json.load(f)['traceEvents']
+
+        self.assertEqual([line['output_bytes'] for line in lines], [41, 41])
+        self.assertEqual({event['ph'] for event in events}, {'X'})
+        self.assertEqual(events[0]['cat'], 'git')
+        self.assertEqual(events[0]['args'], {'output_bytes': 41})
+        self.assertEqual(tracer.summary()[0]['counters'], {'output_bytes': 82})
+
+if __name__ == '__main__':
+    unittest.main()